@@ -2,39 +2,85 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from config import Config
+from app.db_routing import RoutingSession
 
-db = SQLAlchemy()
+# RoutingSession sends GET requests' reads to READ_REPLICA_URI when one is set
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 login_manager = LoginManager()
 
-def create_app():
+def create_app(config_class=Config):
     app = Flask(__name__)
-    app.config.from_object(Config)
+    app.config.from_object(config_class)
+
+    # environment (and .env, when python-dotenv is installed) is read here,
+    # not when config.py is imported
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+    app.config.update(config_class.from_env())
+
+    from app import sqlite_profile, db_routing
+    sqlite_profile.configure_engine_options(app)
     db.init_app(app)
+    db_routing.init_app(app)
+    sqlite_profile.init_app(app)
+    # create_all() stamps new databases with the current schema version
+    from app import migrations  # noqa: F401
     login_manager.init_app(app)
 
      # redirect for @login_required
     login_manager.login_view = 'auth.login'
     login_manager.login_message_category = 'info'
 
+    from app import passwords
+    passwords.init_app(app)
+
+    # current_user comes from a cached snapshot, not a User query per request
+    from app import identity
+    identity.init_app(app, login_manager)
+
     # register markdown filter (import here to avoid circular imports)
-    from app.markdown_utils import markdown_to_html, markdown_title
+    from app.markdown_utils import markdown_to_html, markdown_title, markdown_excerpt, warm_up
     app.jinja_env.filters['markdown_to_html'] = markdown_to_html
     app.jinja_env.filters['markdown_title'] = markdown_title
+    app.jinja_env.filters['markdown_excerpt'] = markdown_excerpt
+    if app.config['MARKDOWN_WARMUP']:
+        warm_up()
+
+    # {% cache %} fragments and the on-disk bytecode cache
+    from app import template_cache
+    template_cache.init_app(app)
+
+    from app.render_cache import render_cache
+    render_cache.init_app(app)
+
+    from app.render_pool import render_pool
+    render_pool.init_app(app)
+
+    from app.comment_queue import comment_queue
+    comment_queue.init_app(app)
+
+    from app import http_cache
+    http_cache.init_app(app)
+
+    from app.page_cache import page_cache
+    page_cache.init_app(app)
+
+    from app.instrumentation import instrumentation
+    instrumentation.init_app(app)
+
+    from app.commands import register_commands
+    register_commands(app)
 
     from app.routes import main
     from app.auth.routes import auth
+    from app.api import api
+    from app.feeds import feeds
     app.register_blueprint(main)
     app.register_blueprint(auth)
+    app.register_blueprint(api)
+    app.register_blueprint(feeds)
 
     return app
-
-# optional: register user loader if models.User exists
-try:
-    from app.models import User
-
-    @login_manager.user_loader
-    def load_user(user_id):
-        return User.query.get(int(user_id))
-except Exception:
-    # models may not be ready yet while editing - ignore for now
-    pass
\ No newline at end of file
@@ -0,0 +1 @@
+from app.api.routes import api  # noqa: F401
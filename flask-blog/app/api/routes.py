@@ -0,0 +1,205 @@
+import base64
+import binascii
+
+from flask import Blueprint, Response, abort, current_app, jsonify, request, stream_with_context, url_for
+from flask_login import current_user
+from werkzeug.exceptions import HTTPException
+
+from app import db, login_manager
+from app.markdown_utils import markdown_excerpt, markdown_title, markdown_to_html
+from app.models import Post, Comment, User
+from app.pagination import InvalidCursor, decode_cursor, encode_cursor
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+# app/api/routes.py
+#
+# Read-only JSON API. Collections are keyset-paginated with the same cursors
+# as the HTML feeds (forward only) and streamed: rows are fetched in chunks
+# and written out as they are serialized, so a 1000-row page never sits in
+# memory as one list or one string. `fields=` picks the keys to return; the
+# query then only loads the columns those keys need, so leaving out
+# `content` also keeps post bodies out of the SELECT.
+#
+# Visibility is the HTML site's: private posts (and their comments) exist only
+# for their author. Clients authenticate with the session cookie or with
+# HTTP Basic credentials.
+
+
+def _iso(dt):
+    return dt.isoformat() if dt is not None else None
+
+
+# the body, read only for rows whose excerpt hasn't been backfilled yet
+_EXCERPT_FALLBACK = db.with_expression(
+    Post.content_if_no_excerpt, db.case((Post.excerpt.is_(None), Post.content)))
+
+# field name -> (columns it needs, serializer[, extra loader options])
+POST_FIELDS = {
+    'id': ((Post.id,), lambda p: p.id),
+    'title': ((Post.title,), lambda p: p.title),
+    'title_html': ((Post.title,), lambda p: str(markdown_title(p.title))),
+    'content': ((Post.content,), lambda p: p.content),
+    'content_html': ((Post.content,), lambda p: str(markdown_to_html(p.content))),
+    'excerpt_html': ((Post.excerpt,),
+                     lambda p: p.excerpt if p.excerpt is not None else str(markdown_excerpt(p.content_if_no_excerpt)),
+                     (_EXCERPT_FALLBACK,)),
+    'timestamp': ((Post.timestamp,), lambda p: _iso(p.timestamp)),
+    'author': ((Post.author_id,), lambda p: p.author.username),
+    'is_private': ((Post.is_private,), lambda p: p.is_private),
+    'comment_count': ((Post.comment_count,), lambda p: p.comment_count),
+    'url': ((Post.id,), lambda p: url_for('api.post', post_id=p.id, _external=True)),
+}
+POST_DEFAULT_FIELDS = ('id', 'title', 'content', 'excerpt_html', 'timestamp', 'author',
+                       'is_private', 'comment_count', 'url')
+
+COMMENT_FIELDS = {
+    'id': ((Comment.id,), lambda c: c.id),
+    'post_id': ((Comment.post_id,), lambda c: c.post_id),
+    'content': ((Comment.content,), lambda c: c.content),
+    'content_html': ((Comment.content,), lambda c: str(markdown_to_html(c.content))),
+    'timestamp': ((Comment.timestamp,), lambda c: _iso(c.timestamp)),
+    'author': ((Comment.author_id,), lambda c: c.author.username if c.author else None),
+}
+COMMENT_DEFAULT_FIELDS = ('id', 'post_id', 'content', 'timestamp', 'author')
+
+
+@login_manager.request_loader
+def _basic_auth(req):
+    # only the API accepts credentials on the request itself
+    if not req.path.startswith(api.url_prefix + '/'):
+        return None
+    header = req.headers.get('Authorization', '')
+    if not header.startswith('Basic '):
+        return None
+    try:
+        username, _, password = base64.b64decode(header[6:]).decode().partition(':')
+    except (binascii.Error, UnicodeDecodeError):
+        return None
+    from app.identity import load_user
+    from app.passwords import verify_login
+    user = User.query.filter_by(username=username).first()
+    if not verify_login(user, password):
+        return None
+    # verify_login may have upgraded an outdated hash
+    db.session.commit()
+    return load_user(user.id)
+
+
+@api.errorhandler(HTTPException)
+def _json_error(exc):
+    response = jsonify(error=exc.name, message=exc.description)
+    response.status_code = exc.code
+    return response
+
+
+def _viewer_id():
+    return current_user.id if current_user.is_authenticated else None
+
+
+def _visible_posts():
+    viewer = _viewer_id()
+    if viewer is None:
+        return Post.query.filter(Post.is_private == False)  # noqa: E712
+    return Post.query.filter(db.or_(Post.is_private == False, Post.author_id == viewer))  # noqa: E712
+
+
+def _select_fields(available, default):
+    raw = request.args.get('fields')
+    if not raw:
+        return list(default)
+    names = [name.strip() for name in raw.split(',') if name.strip()]
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        abort(400, f'unknown field(s): {", ".join(unknown)}; available: {", ".join(available)}')
+    return names
+
+
+def _load_options(model, available, names, sort_columns, author):
+    columns = {c for name in names for c in available[name][0]} | set(sort_columns)
+    options = [db.load_only(*columns)]
+    for name in names:
+        if len(available[name]) > 2:
+            options.extend(available[name][2])
+    if 'author' in names:
+        options.append(db.joinedload(author).load_only(User.username))
+    return options
+
+
+def _limit():
+    try:
+        limit = int(request.args.get('limit', current_app.config['API_PAGE_SIZE']))
+    except ValueError:
+        abort(400, 'limit must be an integer')
+    return max(1, min(limit, current_app.config['API_MAX_PAGE_SIZE']))
+
+
+def _stream_page(query, columns, descending, names, fields):
+    """Stream one keyset page of ``query`` as {"items": [...], "next_cursor": ...}."""
+    cursor = request.args.get('cursor')
+    limit = _limit()
+    if cursor:
+        try:
+            direction, values = decode_cursor(cursor)
+        except InvalidCursor:
+            abort(400, 'invalid cursor')
+        if direction != 'next':
+            abort(400, 'the API only pages forward')
+        key = db.tuple_(*columns)
+        query = query.filter(key < values if descending else key > values)
+    order = [c.desc() if descending else c.asc() for c in columns]
+    rows = query.order_by(*order).limit(limit + 1).yield_per(current_app.config['API_FETCH_SIZE'])
+    dumps = current_app.json.dumps
+    serializers = [(name, fields[name][1]) for name in names]
+
+    def generate():
+        yield '{"items":['
+        last = None
+        # runs after the view's app context is gone; see StreamedKeysetPage
+        for n, row in enumerate(rows.with_session(db.session())):
+            if n == limit:
+                # the extra row only tells us there is another page
+                next_cursor = encode_cursor('next', [getattr(last, c.key) for c in columns])
+                break
+            yield (',' if n else '') + dumps({name: serialize(row) for name, serialize in serializers})
+            last = row
+        else:
+            next_cursor = None
+        yield '],"next_cursor":' + dumps(next_cursor) + '}'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+
+@api.route('/posts')
+def posts():
+    names = _select_fields(POST_FIELDS, POST_DEFAULT_FIELDS)
+    query = _visible_posts()
+    if request.args.get('author'):
+        query = query.join(Post.author).filter(User.username == request.args['author'])
+    columns = (Post.timestamp, Post.id)
+    query = query.options(*_load_options(Post, POST_FIELDS, names, columns, Post.author))
+    return _stream_page(query, columns, True, names, POST_FIELDS)
+
+
+def _visible_post_or_404(post_id, options=()):
+    post = _visible_posts().filter(Post.id == post_id).options(*options).first()
+    if post is None:
+        abort(404, 'no such post')
+    return post
+
+
+@api.route('/posts/<int:post_id>')
+def post(post_id):
+    names = _select_fields(POST_FIELDS, POST_DEFAULT_FIELDS)
+    post = _visible_post_or_404(post_id, _load_options(Post, POST_FIELDS, names, (Post.id,), Post.author))
+    return jsonify({name: POST_FIELDS[name][1](post) for name in names})
+
+
+@api.route('/posts/<int:post_id>/comments')
+def comments(post_id):
+    _visible_post_or_404(post_id, [db.load_only(Post.id)])
+    names = _select_fields(COMMENT_FIELDS, COMMENT_DEFAULT_FIELDS)
+    columns = (Comment.timestamp, Comment.id)
+    query = Comment.query.filter(Comment.post_id == post_id) \
+        .options(*_load_options(Comment, COMMENT_FIELDS, names, columns, Comment.author))
+    return _stream_page(query, columns, False, names, COMMENT_FIELDS)
@@ -2,6 +2,7 @@ from flask import Blueprint, render_template, redirect, url_for, flash, request,
 from flask_login import login_user, logout_user, login_required
 from app import db
 from app.models import User
+from app.passwords import verify_login
 from app.forms import RegistrationForm, LoginForm
 
 auth = Blueprint('auth', __name__, url_prefix='/auth')
@@ -36,7 +37,9 @@ def login():
     form = LoginForm()
     if form.validate_on_submit():
         user = User.query.filter_by(username=form.username.data).first()
-        if user and user.check_password(form.password.data):
+        if verify_login(user, form.password.data):
+            # verify_login may have upgraded an outdated hash
+            db.session.commit()
             login_user(user)
             flash('Login successful!', 'success')
             next_page = request.args.get('next') or url_for('main.index')
@@ -0,0 +1,244 @@
+import os
+import time
+
+import click
+from flask.cli import AppGroup, with_appcontext
+
+# app/commands.py
+#
+# `flask ...` maintenance commands, registered by create_app().
+
+render_cache_cli = AppGroup('render-cache', help='Manage the rendered Markdown cache.')
+
+
+@render_cache_cli.command('clear')
+@click.option('--stale-only', is_flag=True, help='Only drop renders made with old renderer settings.')
+def render_cache_clear(stale_only):
+    """Invalidate cached Markdown renders.
+
+    Run this after changing ALLOWED_TAGS or the Markdown extension list.
+    """
+    from app.render_cache import render_cache
+    removed = render_cache.clear(stale_only=stale_only)
+    click.echo(f'Removed {removed} render cache generation(s).')
+
+
+@render_cache_cli.command('warm')
+def render_cache_warm():
+    """Render every post and comment into the cache."""
+    from app import db
+    from app.models import Post, Comment
+    from app.markdown_utils import markdown_to_html_many
+    from app.render_cache import render_cache
+    count = 0
+    for batch in db.session.execute(db.select(Post.title, Post.content)).partitions(500):
+        markdown_to_html_many([row.title for row in batch], kind='title')
+        markdown_to_html_many([row.content for row in batch])
+        count += len(batch)
+    for batch in db.session.execute(db.select(Comment.content)).partitions(500):
+        markdown_to_html_many([row.content for row in batch])
+        count += len(batch)
+    click.echo(f'Warmed {count} rows; {render_cache.stats()}')
+
+
+@render_cache_cli.command('rerender')
+@click.option('--workers', type=int, default=None, help='Worker processes [default: one per core].')
+@click.option('--batch-size', default=100, show_default=True, help='Documents per task.')
+def render_cache_rerender(workers, batch_size):
+    """Re-render every post and comment into the cache, in parallel.
+
+    Unlike `warm`, existing entries are overwritten.
+    """
+    from concurrent.futures import FIRST_COMPLETED, wait
+    from app import db
+    from app.models import Post, Comment
+    from app.render_cache import render_cache
+    from app.render_pool import make_executor, render_batch
+
+    workers = workers or os.cpu_count() or 1
+    total = 2 * db.session.scalar(db.select(db.func.count(Post.id))) \
+        + db.session.scalar(db.select(db.func.count(Comment.id)))
+
+    def batches():
+        for batch in db.session.execute(db.select(Post.title, Post.content)).partitions(batch_size):
+            yield 'title', [row.title or '' for row in batch]
+            yield 'html', [row.content or '' for row in batch]
+        for batch in db.session.execute(db.select(Comment.content)).partitions(batch_size):
+            yield 'html', [row.content or '' for row in batch]
+
+    done = source_bytes = 0
+    started = time.perf_counter()
+    with make_executor('process', workers) as executor, \
+            click.progressbar(length=total, label='Rendering') as bar:
+        in_flight = {}
+
+        def collect(futures):
+            nonlocal done, source_bytes
+            for future in futures:
+                kind, texts = in_flight.pop(future)
+                for text, html in zip(texts, future.result()):
+                    render_cache.set(render_cache.key(kind, text), html)
+                done += len(texts)
+                source_bytes += sum(len(text.encode()) for text in texts)
+                bar.update(len(texts))
+
+        # keep a few batches per worker queued, not the whole corpus
+        for kind, texts in batches():
+            in_flight[executor.submit(render_batch, kind, texts)] = (kind, texts)
+            if len(in_flight) >= workers * 4:
+                collect(wait(in_flight, return_when=FIRST_COMPLETED).done)
+        while in_flight:
+            collect(wait(in_flight, return_when=FIRST_COMPLETED).done)
+
+    elapsed = max(time.perf_counter() - started, 1e-6)
+    click.echo(f'Rendered {done} documents ({source_bytes / 1e6:.1f} MB of Markdown) '
+               f'in {elapsed:.1f}s with {workers} workers: '
+               f'{done / elapsed:.0f} docs/s, {source_bytes / 1e6 / elapsed:.2f} MB/s.')
+
+
+@click.command('upgrade-db')
+@with_appcontext
+def upgrade_db():
+    """Bring a database from an older version up to the current schema."""
+    from app import db
+    from app.migrations import MIGRATIONS, upgrade
+
+    applied = upgrade(db.engine)
+    for name in applied:
+        click.echo(f'Applied: {name}')
+    click.echo(f'Schema is at version {len(MIGRATIONS)} ({len(applied)} migration(s) applied).')
+
+
+@click.command('backfill-excerpts')
+@with_appcontext
+@click.option('--all', 'rebuild_all', is_flag=True, help='Rebuild every excerpt, not just missing ones.')
+@click.option('--batch-size', default=500, show_default=True)
+def backfill_excerpts(rebuild_all, batch_size):
+    """Build the stored listing excerpt for existing posts."""
+    from app import db
+    from app.models import Post
+    from app.markdown_utils import markdown_excerpts
+
+    done, last_id = 0, 0
+    while True:
+        q = db.session.query(Post.id, Post.content).filter(Post.id > last_id)
+        if not rebuild_all:
+            q = q.filter(Post.excerpt.is_(None))
+        rows = q.order_by(Post.id).limit(batch_size).all()
+        if not rows:
+            break
+        excerpts = markdown_excerpts([row.content for row in rows])
+        db.session.execute(db.update(Post), [
+            {'id': row.id, 'excerpt': str(excerpt)} for row, excerpt in zip(rows, excerpts)
+        ])
+        db.session.commit()
+        done += len(rows)
+        last_id = rows[-1].id
+        click.echo(f'{done} posts done')
+    click.echo(f'Backfilled {done} excerpts.')
+
+
+@click.command('repair-counts')
+@with_appcontext
+def repair_counts():
+    """Recompute Post.comment_count/last_comment_at and User.post_count."""
+    from app import db
+    from app.migrations import recount
+
+    posts, users = recount(db.session.connection())
+    db.session.commit()
+    click.echo(f'Fixed counts on {posts} posts and {users} users.')
+
+
+@click.command('seed')
+@with_appcontext
+@click.option('--users', default=100, show_default=True)
+@click.option('--posts', default=1000, show_default=True)
+@click.option('--comments', default=10000, show_default=True)
+@click.option('--batch-size', default=2000, show_default=True)
+@click.option('--private-ratio', default=0.1, show_default=True, help='Share of posts marked private.')
+@click.option('--excerpts/--no-excerpts', default=True, show_default=True,
+              help='Render listing excerpts while seeding (else run backfill-excerpts later).')
+@click.option('--seed', 'random_seed', default=0, show_default=True, help='Random seed; same seed, same data.')
+def seed_command(users, posts, comments, batch_size, private_ratio, excerpts, random_seed):
+    """Bulk-insert synthetic users, posts and comments.
+
+    Every seeded user (user<id>) has the password "password".
+    """
+    from app import db
+    from app.seed import seed
+
+    db.create_all()
+    started = time.perf_counter()
+
+    def progress(table, done):
+        click.echo(f'\r{table}: {done}', nl=False)
+        if done == {'user': users, 'post': posts, 'comment': comments}[table]:
+            click.echo()
+
+    counts = seed(users, posts, comments, batch_size=batch_size, private_ratio=private_ratio,
+                  excerpts=excerpts, random_seed=random_seed, progress=progress)
+    elapsed = max(time.perf_counter() - started, 1e-6)
+    rows = sum(counts.values())
+    click.echo(f'Seeded {counts["users"]} users, {counts["posts"]} posts and '
+               f'{counts["comments"]} comments in {elapsed:.1f}s ({rows / elapsed:.0f} rows/s).')
+
+
+search_cli = AppGroup('search', help='Manage the full-text search index.')
+
+
+@search_cli.command('rebuild')
+def search_rebuild():
+    """Create the FTS5 index if needed and reindex all posts and comments."""
+    from app.search import rebuild_search_index
+    rebuild_search_index()
+    click.echo('Search index rebuilt.')
+
+
+timeline_cli = AppGroup('timeline', help='Manage the materialized public timeline.')
+
+
+@timeline_cli.command('check')
+def timeline_check():
+    """Compare the public timeline with the post table; exits 1 on drift."""
+    from app import db
+    from app.timeline import check
+    result = check(db.session.connection())
+    click.echo(f'{result["missing"]} public post(s) missing, {result["stale"]} stale row(s).')
+    if result['missing'] or result['stale']:
+        raise SystemExit(1)
+
+
+@timeline_cli.command('rebuild')
+def timeline_rebuild():
+    """Recreate the public timeline from the post table."""
+    from app import db
+    from app.timeline import rebuild
+    rows = rebuild(db.session.connection())
+    db.session.commit()
+    click.echo(f'Public timeline rebuilt with {rows} post(s).')
+
+
+replica_cli = AppGroup('replica', help='Manage the read replica.')
+
+
+@replica_cli.command('sync')
+def replica_sync():
+    """Copy the primary SQLite database over the READ_REPLICA_URI file."""
+    from flask import current_app
+    from app.db_routing import sync_replica
+    if not current_app.config['READ_REPLICA_URI']:
+        raise click.ClickException('READ_REPLICA_URI is not set.')
+    sync_replica()
+    click.echo('Replica synced.')
+
+
+def register_commands(app):
+    app.cli.add_command(render_cache_cli)
+    app.cli.add_command(upgrade_db)
+    app.cli.add_command(backfill_excerpts)
+    app.cli.add_command(repair_counts)
+    app.cli.add_command(seed_command)
+    app.cli.add_command(search_cli)
+    app.cli.add_command(timeline_cli)
+    app.cli.add_command(replica_cli)
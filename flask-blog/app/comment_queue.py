@@ -0,0 +1,154 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+
+# app/comment_queue.py
+#
+# Group commit for comments. With COMMENT_GROUP_COMMIT on, post_detail hands
+# a new comment to a per-process writer thread instead of committing it
+# itself. The writer takes the first waiting comment, gathers whatever else
+# arrives within COMMENT_BATCH_WINDOW_MS (up to COMMENT_BATCH_SIZE), and
+# inserts them all in one transaction: one write lock and one journal sync
+# per batch instead of per comment. Each request waits for its own result
+# and redirects only once its batch has committed. If a batch fails, its
+# comments are retried one transaction each, so only the bad ones fail.
+#
+# The queue is bounded by COMMENT_QUEUE_SIZE: when it is full, add() raises
+# QueueFull at once rather than letting requests pile up. A request that
+# gives up after COMMENT_COMMIT_TIMEOUT seconds gets TimeoutError, but its
+# comment stays queued and may still be saved.
+
+
+class QueueFull(Exception):
+    """More comments are waiting than COMMENT_QUEUE_SIZE allows."""
+
+
+class CommentQueue:
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('COMMENT_GROUP_COMMIT', False)
+        app.config.setdefault('COMMENT_BATCH_WINDOW_MS', 2)
+        app.config.setdefault('COMMENT_BATCH_SIZE', 100)
+        app.config.setdefault('COMMENT_QUEUE_SIZE', 1000)
+        app.config.setdefault('COMMENT_COMMIT_TIMEOUT', 10)
+        app.extensions['comment_queue'] = _AppQueue(app)
+
+
+class _AppQueue:
+    """Per-app queue and writer thread; the thread starts on first use, so a
+    pre-forking server starts it in each worker rather than in the master."""
+
+    def __init__(self, app):
+        self.app = app
+        self.enabled = app.config['COMMENT_GROUP_COMMIT']
+        self.window = app.config['COMMENT_BATCH_WINDOW_MS'] / 1000
+        self.batch_size = app.config['COMMENT_BATCH_SIZE']
+        self.timeout = app.config['COMMENT_COMMIT_TIMEOUT']
+        self._queue = queue.Queue(maxsize=app.config['COMMENT_QUEUE_SIZE'])
+        self._thread = None
+        self._lock = threading.Lock()
+        self.submitted = self.committed = self.failed = self.rejected = self.batches = 0
+
+    def _ensure_writer(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='comment-writer', daemon=True)
+                self._thread.start()
+
+    def add(self, post_id, author_id, content):
+        """Queue a comment and block until it is committed; returns its id.
+
+        Raises QueueFull, TimeoutError, or the error its insert failed with.
+        """
+        self._ensure_writer()
+        future = Future()
+        row = {'post_id': post_id, 'author_id': author_id, 'content': content,
+               'timestamp': datetime.utcnow()}
+        try:
+            self._queue.put_nowait((row, future))
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            raise QueueFull() from None
+        with self._lock:
+            self.submitted += 1
+        return future.result(self.timeout)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._write(batch)
+                    return
+                batch.append(item)
+            self._write(batch)
+
+    def _write(self, batch):
+        try:
+            with self.app.app_context():
+                ids = self._commit([row for row, _ in batch])
+        except Exception as exc:
+            if len(batch) > 1:
+                # find the comments that fail: one transaction each
+                for item in batch:
+                    self._write([item])
+                return
+            batch[0][1].set_exception(exc)
+            with self._lock:
+                self.failed += 1
+            return
+        for (_, future), comment_id in zip(batch, ids):
+            future.set_result(comment_id)
+        with self._lock:
+            self.committed += len(batch)
+            self.batches += 1
+
+    def _commit(self, rows):
+        from app import db
+        from app.models import Comment
+        comments = [Comment(**row) for row in rows]
+        try:
+            db.session.add_all(comments)
+            db.session.flush()
+            ids = [comment.id for comment in comments]
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return ids
+
+    def stats(self):
+        with self._lock:
+            return {
+                'submitted': self.submitted,
+                'committed': self.committed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'batches': self.batches,
+                'pending': self._queue.qsize(),
+            }
+
+    def shutdown(self):
+        """Write what is queued, then stop the writer thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+
+comment_queue = CommentQueue()
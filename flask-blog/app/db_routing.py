@@ -0,0 +1,80 @@
+import sqlite3
+import time
+
+from flask import current_app, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event
+
+# app/db_routing.py
+#
+# Read/write splitting. With READ_REPLICA_URI set, the app gets a second
+# engine for it (app.extensions['read_replica']), and GET and HEAD requests
+# read from it. Other methods, every flush and CLI commands use the primary.
+# Once a request has written, the rest of it reads from the primary, and so
+# do that browser's requests for the next READ_YOUR_WRITES_SECONDS (a
+# deadline kept in the Flask session), so people see their own new post or
+# comment while the replica catches up.
+#
+# Any second SQLite file works as a local replica: `flask replica sync`
+# copies the primary into it with SQLite's online backup API.
+
+
+class RoutingSession(Session):
+    """db.session: reads go to the replica engine while ``info['read_replica']`` is set."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self.info.get('read_replica') and not self._flushing:
+            return current_app.extensions['read_replica']
+        return super().get_bind(mapper, clause, bind=bind, **kwargs)
+
+
+def mark_written(db_session):
+    """Read from the primary from now on, as after a write of this session's own."""
+    db_session.info['read_replica'] = False
+    db_session.info['wrote'] = True
+
+
+def _after_flush(db_session, flush_context):
+    mark_written(db_session)
+
+
+def init_app(app):
+    from app import db
+    app.config.setdefault('READ_REPLICA_URI', None)
+    app.config.setdefault('READ_YOUR_WRITES_SECONDS', 5)
+    if not app.config['READ_REPLICA_URI']:
+        return
+    # not a Flask-SQLAlchemy bind: binds get a MetaData of their own, and
+    # here the replica serves the default one
+    app.extensions['read_replica'] = create_engine(
+        app.config['READ_REPLICA_URI'], **app.config['SQLALCHEMY_ENGINE_OPTIONS'])
+    if not event.contains(RoutingSession, 'after_flush', _after_flush):
+        event.listen(RoutingSession, 'after_flush', _after_flush)
+
+    @app.before_request
+    def _route_reads():
+        # the session outlives a request when an app context is already pushed
+        db.session.info['wrote'] = False
+        db.session.info['read_replica'] = (request.method in ('GET', 'HEAD')
+                                           and session.get('_primary_until', 0) <= time.time())
+
+    @app.after_request
+    def _stick_to_primary(response):
+        if db.session.info.get('wrote'):
+            session['_primary_until'] = time.time() + app.config['READ_YOUR_WRITES_SECONDS']
+        return response
+
+
+def sync_replica():
+    """Copy the primary SQLite database into the replica file."""
+    from app import db
+    replica = current_app.extensions['read_replica']
+    src = sqlite3.connect(db.engine.url.database)
+    dst = sqlite3.connect(replica.url.database)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+    # pooled replica connections may still hold pages of the old file
+    replica.dispose()
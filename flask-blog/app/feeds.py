@@ -0,0 +1,125 @@
+import threading
+from collections import OrderedDict
+
+from flask import Blueprint, abort, current_app, render_template, request, url_for
+
+from app import db
+from app.http_cache import conditional
+from app.models import Post, User
+from app.page_cache import page_cache
+
+feeds = Blueprint('feeds', __name__)
+
+# app/feeds.py
+#
+# Atom and RSS feeds of the newest public posts, site-wide or per author.
+# Each request first reads only (id, updated_at) of the feed's posts, an
+# index range scan of FEED_SIZE rows. That list is the feed's version: it
+# builds the ETag, so pollers with a current copy get a 304, and it keys
+# the generated XML, kept per process in FeedCache. The XML is rebuilt only
+# when a public post is added, edited, hidden or deleted. Entry bodies come
+# from the Markdown render cache and the stored excerpts.
+
+CONTENT_TYPES = {
+    'atom': 'application/atom+xml; charset=utf-8',
+    'rss': 'application/rss+xml; charset=utf-8',
+}
+
+
+class FeedCache:
+    """Generated feed documents by (host, format, author), each with the version it was built from."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # (host, format, author) -> (version, xml)
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key, version):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None and item[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            self.misses += 1
+            return None
+
+    def set(self, key, version, xml):
+        with self._lock:
+            self._entries[key] = (version, xml)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self._entries),
+                'maxsize': self.maxsize,
+            }
+
+
+@feeds.record_once
+def _init(state):
+    state.app.config.setdefault('FEED_SIZE', 20)
+    state.app.config.setdefault('FEED_CACHE_SIZE', 256)
+    state.app.extensions['feed_cache'] = FeedCache(state.app.config['FEED_CACHE_SIZE'])
+
+
+def _public_posts(author):
+    q = db.select(Post.id, Post.timestamp, Post.updated_at).where(Post.is_private == False)  # noqa: E712
+    if author is not None:
+        q = q.where(Post.author_id == author.id)
+    # newest first along ix_post_public_timestamp_id / ix_post_author_timestamp_id
+    return q.order_by(Post.timestamp.desc(), Post.id.desc()).limit(current_app.config['FEED_SIZE'])
+
+
+def _build(kind, author, ids):
+    posts = {p.id: p for p in Post.query.filter(Post.id.in_(ids)).options(db.joinedload(Post.author), db.undefer(Post.content))}
+    entries = [posts[i] for i in ids if i in posts]
+    return render_template(f'feeds/{kind}.xml', posts=entries, author=author,
+                           updated=max((p.updated_at or p.timestamp for p in entries), default=None),
+                           self_url=url_for(request.endpoint, _external=True, **request.view_args))
+
+
+def _feed(kind, username=None):
+    author = None
+    if username is not None:
+        author = User.query.filter_by(username=username).first()
+        if author is None:
+            abort(404)
+    rows = db.session.execute(_public_posts(author)).all()
+    version = tuple((row.id, row.updated_at or row.timestamp) for row in rows)
+
+    # new public posts, and any change to a listed one, bump these tags
+    page_cache.tag('feed', 'feed:head', *(f'post:{row.id}' for row in rows))
+
+    def render():
+        cache = current_app.extensions['feed_cache']
+        key = (request.host_url, kind, username)
+        xml = cache.get(key, version)
+        if xml is None:
+            xml = _build(kind, author, [row.id for row in rows])
+            cache.set(key, version, xml)
+        return current_app.response_class(xml, content_type=CONTENT_TYPES[kind])
+
+    # no Last-Modified: a post hidden or deleted drops out of the feed without
+    # leaving a newer updated_at behind, so only the ETag can tell
+    return conditional(('feed', kind, username, version), None, render)
+
+
+@feeds.route('/feed.<any(atom, rss):kind>')
+@page_cache.cached
+def site_feed(kind):
+    return _feed(kind)
+
+
+@feeds.route('/author/<username>/feed.<any(atom, rss):kind>')
+@page_cache.cached
+def author_feed(kind, username):
+    return _feed(kind, username)
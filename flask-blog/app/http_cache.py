@@ -0,0 +1,75 @@
+import hashlib
+import os
+from datetime import timezone
+
+from flask import current_app, make_response, request, session
+from flask_login import current_user
+
+# app/http_cache.py
+#
+# HTTP conditional requests. Views describe their page by an ETag made of the
+# row versions it shows plus, where one exists, a Last-Modified time; a
+# request whose If-None-Match / If-Modified-Since still matches gets a 304
+# before the template is rendered.
+
+
+def init_app(app):
+    # Part of every ETag, so a deploy that changes templates or the Markdown
+    # renderer can't answer 304 for HTML that would now come out different.
+    if 'ETAG_SALT' not in app.config:
+        from app.markdown_utils import renderer_fingerprint
+        h = hashlib.sha256(renderer_fingerprint().encode())
+        for root, dirs, files in sorted(os.walk(os.path.join(app.root_path, 'templates'))):
+            for name in sorted(files):
+                with open(os.path.join(root, name), 'rb') as fh:
+                    h.update(fh.read())
+        app.config['ETAG_SALT'] = h.hexdigest()[:16]
+
+
+def make_etag(*parts):
+    # the page carries the viewer's name and, for authors, their private
+    # posts, so the viewer is always part of the tag
+    viewer = current_user.get_id() if current_user.is_authenticated else None
+    raw = repr((current_app.config['ETAG_SALT'], viewer) + parts)
+    return hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+
+def _as_utc(dt):
+    return dt.replace(tzinfo=timezone.utc, microsecond=0) if dt is not None else None
+
+
+def _is_fresh(etag, last_modified):
+    # If-None-Match wins over If-Modified-Since (RFC 9110 13.2.2)
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if request.if_modified_since and last_modified is not None:
+        return last_modified <= request.if_modified_since
+    return False
+
+
+def conditional(etag_parts, last_modified, render):
+    """Return ``render()`` with validators attached, or a 304 without calling it.
+
+    ``last_modified`` is a naive UTC datetime (or None); ``render`` returns
+    anything a view may return.
+    """
+    # pending flash messages end up in the page, so such a response is one-off
+    if request.method != 'GET' or session.get('_flashes'):
+        return render()
+
+    etag = make_etag(*etag_parts)
+    last_modified = _as_utc(last_modified)
+    if _is_fresh(etag, last_modified):
+        response = current_app.response_class(status=304)
+    else:
+        response = make_response(render())
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    if current_user.is_authenticated:
+        response.cache_control.private = True
+    else:
+        response.cache_control.public = True
+    response.vary.add('Cookie')
+    return response
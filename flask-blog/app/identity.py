@@ -0,0 +1,149 @@
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+
+from app import db
+
+# app/identity.py
+#
+# Cached user loader. Flask-Login calls the user loader on every
+# authenticated request; instead of a User query each time, the loader
+# returns a small detached UserSnapshot from a bounded per-process cache
+# with a TTL (USER_CACHE_TTL seconds, 0 turns it off). A commit that changes
+# or deletes a User drops that user's entry in this process; other worker
+# processes see the change when their entry expires.
+#
+# current_user is therefore a UserSnapshot, not a User: it has the id and
+# username and the Flask-Login interface, but no relationships. Views that
+# need the ORM object load it with db.session.get(User, current_user.id).
+
+
+class UserSnapshot:
+    __slots__ = ('id', 'username')
+
+    # Flask-Login interface
+    is_authenticated = True
+    is_active = True
+    is_anonymous = False
+
+    def __init__(self, id, username):
+        self.id = id
+        self.username = username
+
+    def get_id(self):
+        return str(self.id)
+
+    def __eq__(self, other):
+        return isinstance(other, UserSnapshot) and other.id == self.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __repr__(self):
+        return f'<UserSnapshot {self.username}>'
+
+
+class IdentityCache:
+    def __init__(self, ttl, maxsize):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # user id -> (expires, snapshot)
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, user_id):
+        with self._lock:
+            item = self._entries.get(user_id)
+            if item is not None and item[0] > time.monotonic():
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return item[1]
+            self._entries.pop(user_id, None)
+            self.misses += 1
+            return None
+
+    def set(self, snapshot):
+        with self._lock:
+            self._entries[snapshot.id] = (time.monotonic() + self.ttl, snapshot)
+            self._entries.move_to_end(snapshot.id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self._entries),
+                'maxsize': self.maxsize,
+            }
+
+
+def _fetch(user_id):
+    from app.models import User
+    row = db.session.execute(
+        db.select(User.id, User.username).where(User.id == user_id)
+    ).first()
+    return UserSnapshot(row.id, row.username) if row else None
+
+
+def load_user(user_id):
+    """The Flask-Login user loader."""
+    cache = current_app.extensions.get('user_cache')
+    if cache is None:
+        return _fetch(user_id)
+    snapshot = cache.get(user_id)
+    if snapshot is None:
+        snapshot = _fetch(user_id)
+        if snapshot is not None:
+            cache.set(snapshot)
+    return snapshot
+
+
+def init_app(app, login_manager):
+    app.config.setdefault('USER_CACHE_TTL', 60)
+    app.config.setdefault('USER_CACHE_SIZE', 4096)
+    if app.config['USER_CACHE_TTL'] > 0:
+        app.extensions['user_cache'] = IdentityCache(app.config['USER_CACHE_TTL'], app.config['USER_CACHE_SIZE'])
+    login_manager.user_loader(lambda user_id: load_user(int(user_id)))
+
+    if not event.contains(db.session, 'after_flush', _collect_users):
+        event.listen(db.session, 'after_flush', _collect_users)
+        event.listen(db.session, 'after_commit', _invalidate_users)
+        event.listen(db.session, 'after_rollback', _discard_users)
+
+
+# drop cached snapshots of users changed in a committed transaction
+
+def _collect_users(session, flush_context):
+    from app.models import User
+    changed = session.info.setdefault('identity_changed', set())
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User):
+            changed.add(obj.id)
+
+
+def _invalidate_users(session):
+    changed = session.info.pop('identity_changed', None)
+    if changed and has_app_context():
+        cache = current_app.extensions.get('user_cache')
+        if cache is not None:
+            cache.invalidate(*changed)
+
+
+def _discard_users(session):
+    session.info.pop('identity_changed', None)
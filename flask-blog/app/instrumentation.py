@@ -0,0 +1,227 @@
+import cProfile
+import os
+import threading
+import time
+from collections import defaultdict
+
+from flask import Response, current_app, g, has_request_context, request
+from flask.signals import before_render_template, template_rendered
+from sqlalchemy import event
+
+from app import db
+
+# app/instrumentation.py
+#
+# Opt-in (INSTRUMENTATION_ENABLED) per-request timing. For every request it
+# records wall time, SQL query count and time, template render time and
+# Markdown render time. These go out as a Server-Timing header and into
+# per-endpoint histograms served at /metrics in Prometheus text format.
+# Metrics are per process; scrape every worker or aggregate upstream.
+#
+# With PROFILE_SLOW_REQUEST_MS set, requests also run under cProfile and the
+# profile of any request slower than the threshold is dumped to PROFILE_DIR
+# (open with `python -m pstats` or snakeviz). Only one profiler can be active
+# per process, so one request at a time is profiled; requests that overlap
+# it are served unprofiled.
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+# held by the request being profiled
+_profiling = threading.Lock()
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, n in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += n
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_sum{{{labels}}} {self.sum}'
+        yield f'{name}_count{{{labels}}} {self.count}'
+
+
+def add_timing(name, seconds):
+    """Add ``seconds`` to the current request's ``name`` timer, if one is running."""
+    if has_request_context():
+        timings = g.get('timings')
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + seconds
+
+
+class Metrics:
+    """Per-app request metrics."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.durations = defaultdict(lambda: Histogram(DURATION_BUCKETS))
+        self.queries = defaultdict(lambda: Histogram(QUERY_BUCKETS))
+        self.totals = defaultdict(float)  # (metric, endpoint) -> seconds
+
+
+class Instrumentation:
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('INSTRUMENTATION_ENABLED', False)
+        app.config.setdefault('PROFILE_SLOW_REQUEST_MS', None)
+        app.config.setdefault('PROFILE_DIR', os.path.join(app.instance_path, 'profiles'))
+        if not app.config['INSTRUMENTATION_ENABLED']:
+            return
+        app.extensions['instrumentation'] = Metrics()
+
+        with app.app_context():
+            engines = list(db.engines.values())
+        if 'read_replica' in app.extensions:
+            engines.append(app.extensions['read_replica'])
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+            event.listen(engine, 'handle_error', _handle_error)
+        before_render_template.connect(_before_render, app)
+        template_rendered.connect(_after_render, app)
+
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.teardown_request(_stop_profiler)
+        app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+
+    def _start(self):
+        g.timings = {'sql': 0.0, 'template': 0.0, 'markdown': 0.0}
+        g.sql_queries = 0
+        g.request_started = time.perf_counter()
+        if (current_app.config['PROFILE_SLOW_REQUEST_MS'] is not None
+                and _profiling.acquire(blocking=False)):
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    def _finish(self, response):
+        started = g.pop('request_started', None)
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        profiler = _stop_profiler()
+        if profiler is not None:
+            threshold = current_app.config['PROFILE_SLOW_REQUEST_MS']
+            if elapsed * 1000 >= threshold:
+                self._dump_profile(profiler, elapsed)
+
+        timings = g.timings
+        endpoint = request.endpoint or 'unknown'
+        response.headers['Server-Timing'] = ', '.join([
+            f'app;dur={elapsed * 1000:.1f}',
+            f'sql;desc="{g.sql_queries} queries";dur={timings["sql"] * 1000:.1f}',
+            f'tpl;dur={timings["template"] * 1000:.1f}',
+            f'md;dur={timings["markdown"] * 1000:.1f}',
+        ])
+        metrics = current_app.extensions['instrumentation']
+        with metrics.lock:
+            metrics.durations[endpoint].observe(elapsed)
+            metrics.queries[endpoint].observe(g.sql_queries)
+            for name, seconds in timings.items():
+                metrics.totals[(name, endpoint)] += seconds
+        return response
+
+    def _dump_profile(self, profiler, elapsed):
+        directory = current_app.config['PROFILE_DIR']
+        os.makedirs(directory, exist_ok=True)
+        name = f'{time.strftime("%Y%m%d-%H%M%S")}-{request.endpoint or "unknown"}-{elapsed * 1000:.0f}ms.prof'
+        path = os.path.join(directory, name)
+        profiler.dump_stats(path)
+        current_app.logger.info('slow request %s took %.0f ms, profile in %s', request.path, elapsed * 1000, path)
+
+    def render_metrics(self):
+        out = []
+        metrics = current_app.extensions['instrumentation']
+        with metrics.lock:
+            out += ['# HELP blog_request_duration_seconds Request wall time.',
+                    '# TYPE blog_request_duration_seconds histogram']
+            for endpoint, hist in sorted(metrics.durations.items()):
+                out += hist.lines('blog_request_duration_seconds', f'endpoint="{endpoint}"')
+            out += ['# HELP blog_request_sql_queries SQL statements per request.',
+                    '# TYPE blog_request_sql_queries histogram']
+            for endpoint, hist in sorted(metrics.queries.items()):
+                out += hist.lines('blog_request_sql_queries', f'endpoint="{endpoint}"')
+            for name in ('sql', 'template', 'markdown'):
+                metric = f'blog_{name}_seconds_total'
+                out += [f'# HELP {metric} Time spent in {name} rendering or execution.',
+                        f'# TYPE {metric} counter']
+                out += [f'{metric}{{endpoint="{endpoint}"}} {seconds}'
+                        for (n, endpoint), seconds in sorted(metrics.totals.items()) if n == name]
+
+        for cache in ('render_cache', 'page_cache', 'render_pool', 'login_cache', 'user_cache',
+                      'fragment_cache', 'feed_cache', 'comment_queue'):
+            ext = current_app.extensions.get(cache)
+            if ext is None:
+                continue
+            for key, value in ext.stats().items():
+                metric = f'blog_{cache}_{key}'
+                kind = 'gauge' if key in ('hit_rate', 'entries', 'maxsize', 'pending') else 'counter'
+                if kind == 'counter':
+                    metric += '_total'
+                out += [f'# TYPE {metric} {kind}', f'{metric} {value}']
+        return '\n'.join(out) + '\n'
+
+    def metrics_view(self):
+        return Response(self.render_metrics(), mimetype='text/plain; version=0.0.4')
+
+
+instrumentation = Instrumentation()
+
+
+def _stop_profiler(exc=None):
+    """Stop this request's profiler, if it has one, and let the next request profile."""
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        _profiling.release()
+    return profiler
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _count_query(conn.info['query_started'].pop())
+
+
+def _handle_error(context):
+    # a failed statement never reaches after_cursor_execute
+    stack = context.connection.info.get('query_started') if context.connection is not None else None
+    if stack:
+        _count_query(stack.pop())
+
+
+def _count_query(started):
+    if has_request_context() and 'sql_queries' in g:
+        g.sql_queries += 1
+        add_timing('sql', time.perf_counter() - started)
+
+
+def _before_render(sender, template, context, **extra):
+    g.setdefault('template_started', []).append(time.perf_counter())
+
+
+def _after_render(sender, template, context, **extra):
+    stack = g.get('template_started')
+    if stack:
+        add_timing('template', time.perf_counter() - stack.pop())
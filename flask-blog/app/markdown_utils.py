@@ -1,7 +1,13 @@
-from markdown import markdown
 from markupsafe import Markup
-import bleach
+import functools
+import hashlib
+import json
 import re
+import threading
+import time
+from importlib.metadata import version
+from app.instrumentation import add_timing
+from app.render_cache import render_cache
 
 # Allowed tags/attributes for bleach (extend as needed)
 ALLOWED_TAGS = [
@@ -15,40 +21,252 @@ ALLOWED_ATTRIBUTES = {
     'img': ['src', 'alt', 'title'],
     'code': ['class']
 }
+MARKDOWN_EXTENSIONS = ['fenced_code', 'codehilite', 'tables', 'nl2br', 'sane_lists']
+MARKDOWN_EXTENSION_CONFIGS = {
+    'codehilite': {'guess_lang': False, 'use_pygments': True}
+}
+
+# titles only allow inline formatting
+TITLE_EXTENSIONS = ['extra', 'sane_lists']
+TITLE_TAGS = ['a', 'strong', 'em', 'code', 'span', 'del', 'sup', 'sub', 'kbd']
+TITLE_ATTRIBUTES = {'a': ['href', 'title', 'target', 'rel']}
+
+@functools.lru_cache(maxsize=None)
+def renderer_fingerprint() -> str:
+    """Hash of everything that changes the rendered output.
+
+    It is part of every render cache key, so editing any of the settings
+    above invalidates old renders.
+    """
+    return hashlib.sha256(json.dumps([
+        version('Markdown'), version('bleach'), version('Pygments'),
+        ALLOWED_TAGS, ALLOWED_ATTRIBUTES, MARKDOWN_EXTENSIONS, MARKDOWN_EXTENSION_CONFIGS,
+        TITLE_EXTENSIONS, TITLE_TAGS, TITLE_ATTRIBUTES,
+    ], sort_keys=True).encode()).hexdigest()
+
+# Markdown, Pygments and bleach are imported on first use (or by warm_up()),
+# not when the app is imported.
+class Renderer:
+    """Pre-built Markdown, bleach Cleaner and Linker instances.
+
+    Building these is most of the cost of rendering a short document, so they
+    are made once and reset() between documents. A Renderer is not
+    thread-safe; use get_renderer() for the current thread's one.
+    """
+
+    def __init__(self):
+        import bleach
+        import markdown
+        from bleach.linkifier import Linker
+        self._html_md = markdown.Markdown(
+            extensions=MARKDOWN_EXTENSIONS,
+            extension_configs=MARKDOWN_EXTENSION_CONFIGS,
+            output_format='html5',
+        )
+        self._title_md = markdown.Markdown(extensions=TITLE_EXTENSIONS, output_format='html5')
+        self._html_cleaner = bleach.Cleaner(tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRIBUTES, strip=True)
+        self._title_cleaner = bleach.Cleaner(tags=TITLE_TAGS, attributes=TITLE_ATTRIBUTES, strip=True)
+        self._linker = Linker()
+
+    def html(self, text):
+        html = self._html_md.reset().convert(text)
+        return self._linker.linkify(self._html_cleaner.clean(html))
 
-# existing full-content filter (keep as-is)
+    def title(self, text):
+        # render markdown (may produce <p>...</p> for plain inline markdown)
+        html = self._title_md.reset().convert(text)
+        # strip a single enclosing <p>...</p> so titles don't become wrapped paragraphs
+        html = re.sub(r'^\s*<p>(.*)</p>\s*$', r'\1', html, flags=re.DOTALL)
+        return self._linker.linkify(self._title_cleaner.clean(html))
+
+    def render_many(self, kind, texts):
+        """Render each of ``texts``; ``kind`` is 'html' or 'title'."""
+        render_one = getattr(self, kind)
+        return [render_one(text) for text in texts]
+
+_local = threading.local()
+
+def get_renderer() -> Renderer:
+    """Return this thread's Renderer, building it on first use."""
+    renderer = getattr(_local, 'renderer', None)
+    if renderer is None:
+        renderer = _local.renderer = Renderer()
+    return renderer
+
+def warm_up():
+    """Build a renderer and render a sample so Pygments' lexer and formatter
+    modules are loaded before the first real request."""
+    renderer = get_renderer()
+    renderer.html('# warm up\n\n```python\nprint("hello")\n```\n\n| a |\n|---|\n| b |\n')
+    renderer.title('*warm* up')
+
+def render(kind: str, text: str) -> str:
+    """Render ``text`` uncached; ``kind`` is 'html' or 'title'."""
+    started = time.perf_counter()
+    html = getattr(get_renderer(), kind)(text)
+    add_timing('markdown', time.perf_counter() - started)
+    return html
+
+def render_many(kind: str, texts: list) -> list:
+    """Render a batch of texts uncached with one renderer; returns a list of str."""
+    started = time.perf_counter()
+    html = get_renderer().render_many(kind, texts)
+    add_timing('markdown', time.perf_counter() - started)
+    return html
+
+# existing full-content filter
 def markdown_to_html(text: str) -> Markup:
     if not text:
         return Markup('')
-    html = markdown(
-        text,
-        extensions=[
-            'fenced_code',
-            'codehilite',
-            'tables',
-            'nl2br',
-            'sane_lists'
-        ],
-        extension_configs={
-            'codehilite': {'guess_lang': False, 'use_pygments': True}
-        },
-        output_format='html5'
-    )
-    cleaned = bleach.clean(html, tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRIBUTES, strip=True)
-    linked = bleach.linkify(cleaned)
-    return Markup(linked)
-
-# new: a lightweight title filter that only allows inline formatting and removes outer <p>
+    return Markup(render_cache.get_or_render('html', text, render))
+
+def markdown_to_html_many(texts, kind: str = 'html') -> list:
+    """Batch markdown_to_html (or markdown_title, with kind='title') for
+    listings and backfills: one cache pass, misses rendered together."""
+    texts = list(texts)
+    filled = [i for i, text in enumerate(texts) if text]
+    html = [Markup('')] * len(texts)
+    rendered = render_cache.get_or_render_many(kind, [texts[i] for i in filled], render_many)
+    for i, out in zip(filled, rendered):
+        html[i] = Markup(out)
+    return html
+
+# a lightweight title filter that only allows inline formatting and removes outer <p>
 def markdown_title(text: str) -> Markup:
     if not text:
         return Markup('')
-    # render markdown (may produce <p>...</p> for plain inline markdown)
-    html = markdown(text, extensions=['extra', 'sane_lists'], output_format='html5')
-    # strip a single enclosing <p>...</p> so titles don't become wrapped paragraphs
-    html = re.sub(r'^\s*<p>(.*)</p>\s*$', r'\1', html, flags=re.DOTALL)
-    # allow only safe inline tags for titles
-    inline_tags = ['a', 'strong', 'em', 'code', 'span', 'del', 'sup', 'sub', 'kbd']
-    inline_attrs = {'a': ['href', 'title', 'target', 'rel']}
-    cleaned = bleach.clean(html, tags=inline_tags, attributes=inline_attrs, strip=True)
-    linked = bleach.linkify(cleaned)
-    return Markup(linked)
\ No newline at end of file
+    return Markup(render_cache.get_or_render('title', text, render))
+
+# Listing excerpts. The source is cut between Markdown blocks (never inside a
+# fenced code block, link, inline code span or emphasis) and rendered once, at
+# write time.
+EXCERPT_LENGTH = 300
+
+_FENCE_RE = re.compile(r'^\s*(`{3,}|~{3,})')
+
+def _markdown_blocks(text):
+    # split on blank lines, keeping fenced code blocks in one piece
+    blocks, current, fence = [], [], None
+    for line in text.splitlines():
+        if fence:
+            current.append(line)
+            if line.strip().startswith(fence):
+                fence = None
+            continue
+        m = _FENCE_RE.match(line)
+        if m:
+            fence = m.group(1)
+        elif not line.strip():
+            if current:
+                blocks.append('\n'.join(current))
+                current = []
+            continue
+        current.append(line)
+    if current:
+        blocks.append('\n'.join(current))
+    return blocks
+
+def _shorten_block(block, limit):
+    lines = block.splitlines()
+    fence = _FENCE_RE.match(lines[0])
+    if fence or lines[0].lstrip().startswith('|'):
+        # code blocks and tables are cut between lines; a code block keeps its
+        # opening line and gets its fence closed again, a table keeps its header
+        keep = 2 if not fence else 1
+        used = sum(len(l) + 1 for l in lines[:keep])
+        for line in lines[keep:]:
+            if used + len(line) > limit:
+                break
+            used += len(line) + 1
+            keep += 1
+        kept = lines[:keep]
+        if fence and keep == 1 and len(lines) > 1:
+            # even the first code line is too long: keep it, cut short
+            kept.append(lines[1][:limit])
+        if fence and not (len(kept) > 1 and kept[-1].strip().startswith(fence.group(1))):
+            kept.append(fence.group(1))
+        return '\n'.join(kept)
+
+    cut = _word_cut(block, limit)
+    # back off past anything left open: links/images, inline code, emphasis
+    while True:
+        if cut.rfind('[') > cut.rfind(']') or cut.count('](') > cut.count(')'):
+            cut = cut[:cut.rfind('[')]
+        elif cut.count('`') % 2:
+            cut = cut[:cut.rfind('`')]
+        elif (start := _open_emphasis(cut)) is not None:
+            cut = cut[:start]
+        else:
+            break
+    if not _has_text(cut):
+        # the block opens with one long link or bold run: show its text instead
+        return _plain_cut(block, limit)
+    return cut.rstrip() + ' …'
+
+# heading, quote and list markers at the start of a block
+_BLOCK_MARKER_RE = re.compile(r'^\s*(?:#+|>|[*+-]|\d+\.)(?:\s|$)')
+
+def _has_text(source):
+    return re.search(r'\w', _BLOCK_MARKER_RE.sub('', source)) is not None
+
+def _word_cut(text, limit):
+    # cut at the last space, or mid-word when that would leave no text
+    cut = text[:limit]
+    if len(text) > limit and ' ' in cut and _has_text(cut[:cut.rindex(' ')]):
+        cut = cut[:cut.rindex(' ')]
+    return cut
+
+# emphasis delimiters; bullets and intraword underscores are not
+_EMPHASIS_RE = re.compile(r'^\s*[*+-]\s|(\*+)|(?<!\w)(_+)|(_+)(?!\w)', re.MULTILINE)
+# spans whose * and _ are literal
+_LITERAL_RE = re.compile(r'`[^`]*`|\]\([^)]*\)')
+
+def _open_emphasis(cut):
+    # start of the last * or _ run when that delimiter's strong (double) or
+    # em (single) markers don't pair up
+    masked = _LITERAL_RE.sub(lambda m: ' ' * len(m.group()), cut)
+    strong, em, starts = {'*': 0, '_': 0}, {'*': 0, '_': 0}, {}
+    for m in _EMPHASIS_RE.finditer(masked):
+        run = m.group(1) or m.group(2) or m.group(3)
+        if run:
+            strong[run[0]] += len(run) // 2
+            em[run[0]] += len(run) % 2
+            starts[run[0]] = m.start(m.lastindex)
+    open_runs = [starts[c] for c in starts if strong[c] % 2 or em[c] % 2]
+    return max(open_runs) if open_runs else None
+
+# characters Markdown would read as markup, escaped by _plain_cut
+_MARKDOWN_PUNCT_RE = re.compile(r'([\\`*_{}\[\]()#+\-.!>])')
+# inline markup dropped by _plain_cut; a link keeps its text
+_INLINE_MARKUP_RE = re.compile(r'!?\[([^\]]*)\]\([^)]*\)?|[*_`\[\]]+')
+
+def _plain_cut(block, limit):
+    text = _INLINE_MARKUP_RE.sub(lambda m: m.group(1) or '', _BLOCK_MARKER_RE.sub('', block))
+    if not re.search(r'\w', text):
+        # nothing but markup characters: show them literally
+        return _MARKDOWN_PUNCT_RE.sub(r'\\\1', ' '.join(block.split())[:limit]) + ' …'
+    cut = _word_cut(' '.join(text.split()), limit)
+    # keep it a paragraph even if the text itself starts like a heading, quote or list
+    if re.match(r'\d+\.', cut):
+        cut = re.sub(r'^(\d+)\.', r'\1\\.', cut)
+    elif cut[:1] in ('#', '>', '+', '-'):
+        cut = '\\' + cut
+    return cut + ' …'
+
+def excerpt_source(text: str, limit: int = EXCERPT_LENGTH) -> str:
+    """Return the leading Markdown of ``text``, about ``limit`` characters long."""
+    kept, used = [], 0
+    for block in _markdown_blocks(text or ''):
+        if used + len(block) > limit:
+            if not kept:
+                kept.append(_shorten_block(block, limit))
+            break
+        kept.append(block)
+        used += len(block)
+    return '\n\n'.join(kept)
+
+def markdown_excerpt(text: str) -> Markup:
+    return markdown_to_html(excerpt_source(text))
+
+def markdown_excerpts(texts) -> list:
+    return markdown_to_html_many([excerpt_source(text) for text in texts])
@@ -0,0 +1,127 @@
+from sqlalchemy import event
+from app import db
+
+# app/migrations.py
+#
+# Schema migrations for existing SQLite databases. PRAGMA user_version holds
+# the number of MIGRATIONS a database file has been through; `flask
+# upgrade-db` runs the missing steps in order, bumping the version after
+# each one. db.create_all() on an empty file builds the current schema
+# outright and is stamped as up to date (_stamp below).
+#
+# Steps only add what is missing, so an upgrade that was interrupted simply
+# runs its last step again, and a database that older releases patched with
+# one-off commands upgrades cleanly too. To change the schema, change
+# the model and append a step here; never edit or reorder released steps.
+
+
+def _columns(connection, table):
+    return {row[1] for row in connection.exec_driver_sql(f'PRAGMA table_info("{table}")')}
+
+
+def _add_columns(connection, table, columns):
+    existing = _columns(connection, table)
+    for name, ddl in columns.items():
+        if name not in existing:
+            connection.exec_driver_sql(f'ALTER TABLE "{table}" ADD COLUMN {name} {ddl}')
+
+
+def recount(connection):
+    """Recompute Post.comment_count/last_comment_at and User.post_count.
+
+    Returns the number of posts and users whose counters were off.
+    """
+    from app.models import User, Post, Comment
+    posts, users, comments = Post.__table__, User.__table__, Comment.__table__
+
+    n_comments = db.select(db.func.count(comments.c.id)).where(comments.c.post_id == posts.c.id).scalar_subquery()
+    latest = db.select(db.func.max(comments.c.timestamp)).where(comments.c.post_id == posts.c.id).scalar_subquery()
+    n_posts = db.select(db.func.count(posts.c.id)).where(posts.c.author_id == users.c.id).scalar_subquery()
+
+    # one correlated UPDATE per table, touching only the rows that are off
+    fixed_posts = connection.execute(
+        posts.update()
+        .where(db.or_(posts.c.comment_count != n_comments, posts.c.last_comment_at.is_distinct_from(latest)))
+        .values(comment_count=n_comments, last_comment_at=latest)
+    ).rowcount
+    fixed_users = connection.execute(
+        users.update().where(users.c.post_count != n_posts).values(post_count=n_posts)
+    ).rowcount
+    return fixed_posts, fixed_users
+
+
+def _post_excerpt(connection):
+    # existing rows stay NULL until `flask backfill-excerpts`; listings fall back to content
+    _add_columns(connection, 'post', {'excerpt': 'TEXT'})
+
+
+def _counters(connection):
+    _add_columns(connection, 'post', {'comment_count': 'INTEGER NOT NULL DEFAULT 0', 'last_comment_at': 'DATETIME'})
+    _add_columns(connection, 'user', {'post_count': 'INTEGER NOT NULL DEFAULT 0'})
+    recount(connection)
+
+
+def _post_updated_at(connection):
+    _add_columns(connection, 'post', {'updated_at': 'DATETIME'})
+
+
+def _indexes(connection):
+    # create_all() only creates missing tables, not indexes on existing ones;
+    # tables that later steps add come with their indexes
+    existing = set(db.inspect(connection).get_table_names())
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes if table.name in existing else ():
+            index.create(connection, checkfirst=True)
+
+
+def _search_index(connection):
+    from app.search import create_search_index
+    create_search_index(connection)
+    connection.exec_driver_sql("INSERT INTO post_fts(post_fts) VALUES('rebuild')")
+    connection.exec_driver_sql("INSERT INTO comment_fts(comment_fts) VALUES('rebuild')")
+
+
+def _public_timeline(connection):
+    from app.models import PublicTimeline
+    from app.timeline import rebuild
+    PublicTimeline.__table__.create(connection, checkfirst=True)
+    rebuild(connection)
+
+
+MIGRATIONS = [
+    ('add post.excerpt', _post_excerpt),
+    ('add comment and post counters', _counters),
+    ('add post.updated_at', _post_updated_at),
+    ('add listing, feed and comment thread indexes', _indexes),
+    ('add full-text search index', _search_index),
+    ('add public timeline', _public_timeline),
+]
+
+
+def schema_version(connection):
+    return connection.exec_driver_sql('PRAGMA user_version').scalar()
+
+
+def _set_version(connection, version):
+    connection.exec_driver_sql(f'PRAGMA user_version = {int(version)}')
+
+
+def upgrade(engine):
+    """Apply the migrations ``engine``'s database is missing; returns their names."""
+    applied = []
+    with engine.connect() as connection:
+        version = schema_version(connection)
+        for number, (name, step) in enumerate(MIGRATIONS[version:], start=version + 1):
+            step(connection)
+            _set_version(connection, number)
+            connection.commit()
+            applied.append(name)
+    return applied
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _stamp(target, connection, tables=(), **kw):
+    # only a database that create_all() built from scratch is current; one
+    # that already had tables keeps its version until upgrade-db runs
+    if connection.dialect.name == 'sqlite' and len(tables) == len(target.sorted_tables):
+        _set_version(connection, len(MIGRATIONS))
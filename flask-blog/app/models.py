@@ -1,19 +1,25 @@
 from datetime import datetime
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import check_password_hash
+from sqlalchemy import event
 from app import db
+from app.markdown_utils import markdown_excerpt
+from app.passwords import hash_password
 
 class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(64), unique=True, nullable=False, index=True)
-    password_hash = db.Column(db.String(128), nullable=False)
-    
+    # long enough for scrypt's "scrypt:n:r:p$salt$hash" (about 160 chars)
+    password_hash = db.Column(db.String(256), nullable=False)
+    # maintained by the Post insert/delete listeners below
+    post_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     posts = db.relationship('Post', backref='author', lazy='dynamic')
     comments = db.relationship('Comment', backref='author', lazy='dynamic')
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        # method and cost come from PASSWORD_HASH_METHOD (app/passwords.py)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
@@ -22,23 +28,82 @@ class User(db.Model, UserMixin):
         return f'<User {self.username}>'
 
 class Post(db.Model):
+    # feeds are paginated on (timestamp, id), see app/pagination.py. The
+    # partial index holds public posts only and serves the anonymous index,
+    # /others_posts and the site feed; a signed-in index (public OR own)
+    # walks ix_post_timestamp_id. The author index serves /my_posts and the
+    # per-author feeds. Schema changes need a step in app/migrations.py;
+    # tests/test_query_plans.py checks every route query uses these.
+    __table_args__ = (
+        db.Index('ix_post_timestamp_id', 'timestamp', 'id'),
+        db.Index('ix_post_public_timestamp_id', 'timestamp', 'id', sqlite_where=db.text('is_private = 0')),
+        db.Index('ix_post_author_timestamp_id', 'author_id', 'timestamp', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(140), nullable=False)
-    content = db.Column(db.Text, nullable=False)
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    # deferred: listings never need the body, post_detail undefers it
+    content = db.deferred(db.Column(db.Text, nullable=False))
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    # moved by _touch below whenever something a reader sees changes; cached
+    # template fragments and feeds are keyed on it (NULL on rows that
+    # predate the column: fall back to timestamp)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     author_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     
     # new: allow marking a post private (only visible to owner)
     is_private = db.Column(db.Boolean, default=False, nullable=False)
-    #If you want to add is_private, recreate DB (or add a migration). For dev: delete site.db and run create_db.py.
+
+    # rendered HTML for listings, built from `content` whenever it is written
+    # (rows that predate the column are filled by `flask backfill-excerpts`)
+    excerpt = db.Column(db.Text)
+    # the body of rows without an excerpt, NULL for the rest; only set by
+    # queries that ask for it with db.with_expression()
+    content_if_no_excerpt = db.query_expression()
+
+    # kept in step with the comment table by the Comment listeners below, in
+    # the same transaction; `flask repair-counts` recomputes them in bulk
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    last_comment_at = db.Column(db.DateTime)
 
     comments = db.relationship('Comment', backref='post', lazy='dynamic')
 
     def __repr__(self):
         return f'<Post {self.title}>'
 
+@event.listens_for(Post, 'before_insert')
+@event.listens_for(Post, 'before_update')
+def _render_excerpt(mapper, connection, post):
+    state = db.inspect(post)
+    # a row without an excerpt gets one only if its body is at hand anyway;
+    # content is deferred, and `flask backfill-excerpts` fills the rest
+    if state.attrs.content.history.has_changes() or (post.excerpt is None and 'content' in state.dict):
+        post.excerpt = str(markdown_excerpt(post.content))
+
+@event.listens_for(Post, 'before_update')
+def _touch(mapper, connection, post):
+    attrs = db.inspect(post).attrs
+    if any(attrs[name].history.has_changes() for name in ('title', 'content', 'is_private', 'author_id')):
+        post.updated_at = datetime.utcnow()
+
+class PublicTimeline(db.Model):
+    # one row per public post, stored in (timestamp, post_id) order; see
+    # app/timeline.py. Derived from post by the listeners below.
+    __tablename__ = 'public_timeline'
+    __table_args__ = (
+        db.Index('ix_public_timeline_post_id', 'post_id', unique=True),
+        {'sqlite_with_rowid': False},
+    )
+
+    timestamp = db.Column(db.DateTime, primary_key=True)
+    post_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    author_id = db.Column(db.Integer, nullable=False)
+
 class Comment(db.Model):
+    # comment threads are paginated on (timestamp, id) within a post
+    __table_args__ = (db.Index('ix_comment_post_timestamp_id', 'post_id', 'timestamp', 'id'),)
+
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
@@ -47,4 +112,93 @@ class Comment(db.Model):
     author_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)  # allow anonymous None if needed
 
     def __repr__(self):
-        return f'<Comment {self.id} on post {self.post_id}>'
\ No newline at end of file
+        return f'<Comment {self.id} on post {self.post_id}>'
+
+# Denormalized counters. Each insert/delete of a row issues one UPDATE on the
+# parent row through the flush's own connection, so the counts commit or roll
+# back together with the row. Bulk query.delete()/update() skips mapper
+# events; run `flask repair-counts` after those.
+
+def _bump_post_count(connection, user_id, delta):
+    users = User.__table__
+    connection.execute(users.update().where(users.c.id == user_id)
+                       .values(post_count=users.c.post_count + delta))
+
+def _comment_added(connection, post_id, timestamp):
+    posts = Post.__table__
+    connection.execute(posts.update().where(posts.c.id == post_id).values(
+        comment_count=posts.c.comment_count + 1,
+        last_comment_at=db.case((posts.c.last_comment_at >= timestamp, posts.c.last_comment_at), else_=timestamp),
+    ))
+
+def _comment_removed(connection, post_id):
+    posts, comments = Post.__table__, Comment.__table__
+    connection.execute(posts.update().where(posts.c.id == post_id).values(
+        comment_count=posts.c.comment_count - 1,
+        last_comment_at=db.select(db.func.max(comments.c.timestamp))
+            .where(comments.c.post_id == post_id).scalar_subquery(),
+    ))
+
+def _moved(obj, attr):
+    # (old, new) if the foreign key ``attr`` changed in this flush, else None
+    history = db.inspect(obj).attrs[attr].history
+    if history.deleted and history.added and history.deleted[0] != history.added[0]:
+        return history.deleted[0], history.added[0]
+    return None
+
+@event.listens_for(Post, 'after_insert')
+def _count_new_post(mapper, connection, post):
+    _bump_post_count(connection, post.author_id, 1)
+
+@event.listens_for(Post, 'after_delete')
+def _count_deleted_post(mapper, connection, post):
+    _bump_post_count(connection, post.author_id, -1)
+
+@event.listens_for(Post, 'after_update')
+def _count_moved_post(mapper, connection, post):
+    moved = _moved(post, 'author_id')
+    if moved:
+        _bump_post_count(connection, moved[0], -1)
+        _bump_post_count(connection, moved[1], 1)
+
+# The public timeline follows posts the same way: in the flush's transaction,
+# and not for bulk query.delete()/update() (`flask timeline rebuild`).
+
+def _timeline_add(connection, post):
+    if not post.is_private:
+        connection.execute(PublicTimeline.__table__.insert().values(
+            timestamp=post.timestamp, post_id=post.id, author_id=post.author_id))
+
+def _timeline_remove(connection, post_id):
+    timeline = PublicTimeline.__table__
+    connection.execute(timeline.delete().where(timeline.c.post_id == post_id))
+
+@event.listens_for(Post, 'after_insert')
+def _publish_new_post(mapper, connection, post):
+    _timeline_add(connection, post)
+
+@event.listens_for(Post, 'after_delete')
+def _unpublish_deleted_post(mapper, connection, post):
+    _timeline_remove(connection, post.id)
+
+@event.listens_for(Post, 'after_update')
+def _republish_post(mapper, connection, post):
+    attrs = db.inspect(post).attrs
+    if any(attrs[name].history.has_changes() for name in ('is_private', 'timestamp', 'author_id')):
+        _timeline_remove(connection, post.id)
+        _timeline_add(connection, post)
+
+@event.listens_for(Comment, 'after_insert')
+def _count_new_comment(mapper, connection, comment):
+    _comment_added(connection, comment.post_id, comment.timestamp)
+
+@event.listens_for(Comment, 'after_delete')
+def _count_deleted_comment(mapper, connection, comment):
+    _comment_removed(connection, comment.post_id)
+
+@event.listens_for(Comment, 'after_update')
+def _count_moved_comment(mapper, connection, comment):
+    moved = _moved(comment, 'post_id')
+    if moved:
+        _comment_removed(connection, moved[0])
+        _comment_added(connection, moved[1], comment.timestamp)
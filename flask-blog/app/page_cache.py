@@ -0,0 +1,315 @@
+import functools
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, g, has_app_context, make_response, request, session
+from flask_login import current_user
+from sqlalchemy import event
+
+from app import db
+
+# app/page_cache.py
+#
+# Full-page cache for anonymous GETs. Every cached page records the tags it
+# depends on ('feed', 'feed:head', 'post:<id>', 'user:<id>') together with each tag's
+# generation at the time it was stored. A write bumps the generation of the
+# tags it touches, which makes exactly the pages carrying those tags stale.
+# Entries also expire after PAGE_CACHE_TTL seconds.
+
+
+class MemoryBackend:
+    """Per-process backend; LRU eviction once the stored bodies pass max_bytes."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires, size, entry = item
+            if expires < time.time():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry, ttl, size):
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.time() + ttl, size, entry)
+            self._size += size
+            while self._size > self.max_bytes and self._entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _drop(self, key):
+        self._size -= self._entries.pop(key)[1]
+
+    def generations(self, tags):
+        with self._lock:
+            return {tag: self._generations.get(tag, 0) for tag in tags}
+
+    def bump(self, tags):
+        with self._lock:
+            for tag in tags:
+                self._generations[tag] = time.time_ns()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+class FileSystemBackend:
+    """Backend shared by every worker on the host. Pages are pickled into
+    ``directory``; once they pass max_bytes the oldest files are removed."""
+
+    PRUNE_EVERY = 50
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self._writes = 0
+        os.makedirs(os.path.join(directory, 'pages'), exist_ok=True)
+        os.makedirs(os.path.join(directory, 'tags'), exist_ok=True)
+
+    def _path(self, kind, name):
+        return os.path.join(self.directory, kind, hashlib.sha1(name.encode()).hexdigest())
+
+    def _write(self, path, data):
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as fh:
+            fh.write(data)
+        os.replace(tmp, path)
+
+    def get(self, key):
+        path = self._path('pages', key)
+        try:
+            with open(path, 'rb') as fh:
+                expires, entry = pickle.load(fh)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if expires < time.time():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return entry
+
+    def set(self, key, entry, ttl, size):
+        self._write(self._path('pages', key), pickle.dumps((time.time() + ttl, entry)))
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            self._prune()
+
+    def _prune(self):
+        pages = os.path.join(self.directory, 'pages')
+        files = []
+        for name in os.listdir(pages):
+            try:
+                st = os.stat(os.path.join(pages, name))
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, name))
+        total = sum(size for _, size, _ in files)
+        for _, size, name in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(pages, name))
+            except OSError:
+                continue
+            total -= size
+            self.evictions += 1
+
+    def generations(self, tags):
+        result = {}
+        for tag in tags:
+            try:
+                with open(self._path('tags', tag)) as fh:
+                    result[tag] = int(fh.read() or 0)
+            except (OSError, ValueError):
+                result[tag] = 0
+        return result
+
+    def bump(self, tags):
+        for tag in tags:
+            self._write(self._path('tags', tag), str(time.time_ns()).encode())
+
+    def clear(self):
+        pages = os.path.join(self.directory, 'pages')
+        for name in os.listdir(pages):
+            try:
+                os.remove(os.path.join(pages, name))
+            except OSError:
+                pass
+
+
+class PageCache:
+    def __init__(self, app=None):
+        self.hits = self.misses = self.stale = self.stores = 0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PAGE_CACHE_BACKEND', None)  # None, 'memory' or 'filesystem'
+        app.config.setdefault('PAGE_CACHE_TTL', 60)
+        app.config.setdefault('PAGE_CACHE_MAX_BYTES', 64 * 1024 * 1024)
+        app.config.setdefault('PAGE_CACHE_DIR', os.path.join(app.instance_path, 'page_cache'))
+        app.extensions['page_cache'] = self
+        # the backend is built on first use, so tests can switch it after create_app
+        app.extensions['page_cache_backend'] = None
+
+        if not event.contains(db.session, 'after_flush', _collect_tags):
+            event.listen(db.session, 'after_flush', _collect_tags)
+            event.listen(db.session, 'after_commit', _bump_tags)
+            event.listen(db.session, 'after_rollback', _discard_tags)
+
+    @property
+    def backend(self):
+        backend = current_app.extensions.get('page_cache_backend')
+        kind = current_app.config['PAGE_CACHE_BACKEND']
+        if backend is None and kind:
+            if kind == 'memory':
+                backend = MemoryBackend(current_app.config['PAGE_CACHE_MAX_BYTES'])
+            elif kind == 'filesystem':
+                backend = FileSystemBackend(current_app.config['PAGE_CACHE_DIR'],
+                                            current_app.config['PAGE_CACHE_MAX_BYTES'])
+            else:
+                raise ValueError(f'unknown PAGE_CACHE_BACKEND {kind!r}')
+            current_app.extensions['page_cache_backend'] = backend
+        return backend
+
+    def tag(self, *tags):
+        """Record tags the page being rendered depends on."""
+        tags_seen = g.get('page_cache_tags')
+        if tags_seen is not None:
+            tags_seen.update(tags)
+
+    def invalidate(self, *tags):
+        backend = self.backend
+        if backend is not None and tags:
+            backend.bump(tags)
+
+    def cached(self, view):
+        """Serve ``view`` from the cache for anonymous GET requests."""
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            backend = self.backend
+            if (backend is None or request.method != 'GET'
+                    or current_user.is_authenticated or session.get('_flashes')):
+                return view(*args, **kwargs)
+
+            # pages such as the feeds carry absolute URLs, so the host is part of the key
+            key = request.host_url + request.full_path.lstrip('/')
+            entry = backend.get(key)
+            if entry is not None:
+                if backend.generations(entry['tags']) == entry['tags']:
+                    self._count('hits')
+                    response = current_app.response_class(
+                        entry['body'], status=entry['status'], headers=entry['headers'])
+                    response.headers['X-Page-Cache'] = 'HIT'
+                    return response.make_conditional(request)
+                self._count('stale')
+            self._count('misses')
+
+            g.page_cache_tags = set()
+            # generations are bump times, so a tag newer than this was
+            # written while the view rendered, maybe after it read the rows
+            render_started = time.time_ns()
+            response = make_response(view(*args, **kwargs))
+            generations = backend.generations(g.pop('page_cache_tags'))
+            if (response.status_code == 200 and not response.is_streamed and not session.get('_flashes')
+                    and all(gen < render_started for gen in generations.values())):
+                body = response.get_data()
+                entry = {
+                    'body': body,
+                    'status': response.status_code,
+                    'headers': [(k, v) for k, v in response.headers.items() if k.lower() != 'set-cookie'],
+                    # a write committing after this read bumps its tags later,
+                    # which makes the entry miss
+                    'tags': generations,
+                }
+                backend.set(key, entry, current_app.config['PAGE_CACHE_TTL'], len(body))
+                self._count('stores')
+            response.headers['X-Page-Cache'] = 'MISS'
+            return response
+        return wrapper
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            backend = current_app.extensions.get('page_cache_backend') if has_app_context() else None
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'stale': self.stale,
+                'stores': self.stores,
+                'evictions': backend.evictions if backend else 0,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = self.misses = self.stale = self.stores = 0
+
+
+page_cache = PageCache()
+
+
+# which cached pages a committed write makes stale
+
+def _collect_tags(session, flush_context):
+    from app.models import Post, Comment, _moved
+    tags = session.info.setdefault('page_cache_tags', set())
+    for obj in session.new:
+        if isinstance(obj, Post):
+            # post pages show their author's post count
+            tags.add(f'user:{obj.author_id}')
+            if not obj.is_private:
+                # a new public post only moves the top page of the anonymous feed
+                tags.add('feed:head')
+        elif isinstance(obj, Comment):
+            tags.add(f'post:{obj.post_id}')
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Post):
+            tags.add(f'post:{obj.id}')
+            if obj in session.deleted:
+                tags.add(f'user:{obj.author_id}')
+            elif moved := _moved(obj, 'author_id'):
+                tags.update(f'user:{user_id}' for user_id in moved)
+            if obj in session.deleted or db.inspect(obj).attrs.is_private.history.has_changes():
+                # appearing in or vanishing from the feed shifts every page
+                tags.add('feed')
+        elif isinstance(obj, Comment):
+            tags.add(f'post:{obj.post_id}')
+
+
+def _bump_tags(session):
+    tags = session.info.pop('page_cache_tags', None)
+    if tags and has_app_context():
+        current_app.extensions['page_cache'].invalidate(*tags)
+
+
+def _discard_tags(session):
+    session.info.pop('page_cache_tags', None)
@@ -0,0 +1,134 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from app import db
+
+# app/pagination.py
+#
+# Keyset ("cursor") pagination. Instead of OFFSET, every page is fetched with a
+# WHERE on the sort key of the last row seen, so page 1000 costs the same as
+# page 1 as long as the sort columns are backed by an index.
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor token cannot be decoded."""
+
+
+def encode_cursor(direction, values):
+    # values are the sort-key values of the boundary row, e.g. (timestamp, id)
+    payload = [direction] + [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        direction, timestamp, ident = json.loads(raw)
+        if direction not in ('next', 'prev') or not isinstance(ident, int):
+            raise ValueError(direction)
+        return direction, (datetime.fromisoformat(timestamp), ident)
+    except (binascii.Error, ValueError, TypeError) as exc:
+        raise InvalidCursor(token) from exc
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def keyset_paginate(query, columns, cursor=None, per_page=20, descending=True):
+    """Return one KeysetPage of ``query`` ordered by ``columns``.
+
+    ``columns`` is the sort key, most significant first, and must end in a
+    unique column (normally the primary key) so the order is total.
+    """
+    direction, values = decode_cursor(cursor) if cursor else ('next', None)
+    key = db.tuple_(*columns)
+
+    # walking "prev" means reading the index backwards and flipping the rows
+    forward = direction == 'next'
+    ascending = forward != descending
+    if values is not None:
+        query = query.filter(key > values if ascending else key < values)
+    order = [c.asc() if ascending else c.desc() for c in columns]
+    rows = query.order_by(*order).limit(per_page + 1).all()
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if not forward:
+        rows.reverse()
+
+    def boundary(row, d):
+        return encode_cursor(d, [getattr(row, c.key) for c in columns])
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if has_more or not forward:
+            next_cursor = boundary(rows[-1], 'next')
+        if (has_more and not forward) or (forward and values is not None):
+            prev_cursor = boundary(rows[0], 'prev')
+    return KeysetPage(rows, next_cursor, prev_cursor)
+
+
+class StreamedKeysetPage:
+    """A forward keyset page whose rows are read while they are iterated.
+
+    The query runs with yield_per, so rows arrive from the database cursor in
+    chunks instead of as one list. It is meant to be iterated once; next_cursor and
+    prev_cursor are only known after that, so templates must read them below
+    the loop.
+    """
+
+    def __init__(self, query, columns, values, per_page):
+        self._query = query
+        self._columns = columns
+        self._per_page = per_page
+        self._paged = values is not None
+        self.next_cursor = self.prev_cursor = None
+
+    def _boundary(self, row, d):
+        return encode_cursor(d, [getattr(row, c.key) for c in self._columns])
+
+    def __iter__(self):
+        last = None
+        # A streamed body is iterated after the view's app context has been
+        # torn down (stream_with_context pushes a new one), so run the query
+        # in the current session rather than the one it was built in; that
+        # one is already removed and would never give its connection back.
+        for n, row in enumerate(self._query.with_session(db.session())):
+            if n == self._per_page:
+                # the extra row only tells us there is another page
+                self.next_cursor = self._boundary(last, 'next')
+                break
+            if n == 0 and self._paged:
+                self.prev_cursor = self._boundary(row, 'prev')
+            yield row
+            last = row
+
+
+def keyset_stream(query, columns, cursor=None, per_page=20, descending=True, yield_per=100):
+    """Like keyset_paginate, but return a StreamedKeysetPage for forward pages.
+
+    'prev' cursors have to read their rows backwards and flip them, so those
+    pages still come back as a KeysetPage.
+    """
+    direction, values = decode_cursor(cursor) if cursor else ('next', None)
+    if direction != 'next':
+        return keyset_paginate(query, columns, cursor, per_page, descending)
+    if values is not None:
+        key = db.tuple_(*columns)
+        query = query.filter(key < values if descending else key > values)
+    order = [c.desc() if descending else c.asc() for c in columns]
+    rows = query.order_by(*order).limit(per_page + 1).yield_per(yield_per)
+    return StreamedKeysetPage(rows, columns, values, per_page)
@@ -0,0 +1,131 @@
+import hashlib
+import hmac
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, has_app_context
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+# app/passwords.py
+#
+# Password hashing with a configurable method and cost (PASSWORD_HASH_METHOD,
+# any werkzeug method string such as 'scrypt:16384:8:1' or
+# 'pbkdf2:sha256:600000'). A successful login re-hashes a stored hash whose
+# parameters differ from the configured ones, so changing the setting
+# migrates users as they log in.
+#
+# LOGIN_CACHE_TTL > 0 turns on a small in-process cache of recently verified
+# (user, password) pairs so repeated logins skip the KDF. It holds HMACs keyed
+# with SECRET_KEY, never passwords, and an entry dies with the stored hash
+# it was checked against. It does make a memory dump cheaper to attack than
+# the KDF hashes, which is why it is off by default.
+
+# werkzeug's defaults for a bare method name
+_METHOD_DEFAULTS = {
+    'scrypt': ['32768', '8', '1'],
+    'pbkdf2': ['sha256', str(DEFAULT_PBKDF2_ITERATIONS)],
+}
+
+
+def canonical_method(method):
+    """Spell out the defaults werkzeug fills in, e.g. 'scrypt' -> 'scrypt:32768:8:1'."""
+    name, *args = method.split(':')
+    defaults = _METHOD_DEFAULTS.get(name)
+    if defaults is None:
+        return method
+    return ':'.join([name] + args + defaults[len(args):])
+
+
+def _configured_method():
+    if has_app_context():
+        return current_app.config['PASSWORD_HASH_METHOD']
+    return 'scrypt'
+
+
+def hash_password(password):
+    return generate_password_hash(password, method=_configured_method())
+
+
+def needs_rehash(stored_hash):
+    """Whether ``stored_hash`` was made with other parameters than the configured ones."""
+    return stored_hash.split('$', 1)[0] != canonical_method(_configured_method())
+
+
+class VerifiedLoginCache:
+    """Bounded, expiring set of recently verified login HMACs."""
+
+    def __init__(self, ttl, maxsize):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    @staticmethod
+    def key(secret, user_id, stored_hash, password):
+        message = f'{user_id}\0{stored_hash}\0{password}'.encode()
+        return hmac.new(secret.encode(), message, hashlib.sha256).digest()
+
+    def __contains__(self, key):
+        with self._lock:
+            expires = self._entries.get(key)
+            if expires is not None and expires > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True
+            self._entries.pop(key, None)
+            self.misses += 1
+            return False
+
+    def add(self, key):
+        with self._lock:
+            self._entries[key] = time.monotonic() + self.ttl
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self._entries),
+                'maxsize': self.maxsize,
+            }
+
+
+def init_app(app):
+    app.config.setdefault('PASSWORD_HASH_METHOD', 'scrypt')
+    app.config.setdefault('LOGIN_CACHE_TTL', 0)
+    app.config.setdefault('LOGIN_CACHE_SIZE', 1024)
+    if app.config['LOGIN_CACHE_TTL'] > 0:
+        app.extensions['login_cache'] = VerifiedLoginCache(
+            app.config['LOGIN_CACHE_TTL'], app.config['LOGIN_CACHE_SIZE'])
+
+
+def verify_login(user, password):
+    """Check ``password`` for ``user`` at login.
+
+    On success the stored hash is upgraded if its parameters are out of
+    date; the caller commits. Uses the verified-login cache when enabled.
+    """
+    if user is None or not user.password_hash:
+        return False
+    cache = current_app.extensions.get('login_cache')
+    key = None
+    if cache is not None:
+        key = VerifiedLoginCache.key(current_app.config['SECRET_KEY'] or '', user.id, user.password_hash, password)
+        if key in cache:
+            return True
+    if not check_password_hash(user.password_hash, password):
+        return False
+    if needs_rehash(user.password_hash):
+        user.password_hash = hash_password(password)
+        if cache is not None:
+            key = VerifiedLoginCache.key(current_app.config['SECRET_KEY'] or '', user.id, user.password_hash, password)
+    if cache is not None:
+        cache.add(key)
+    return True
@@ -0,0 +1,260 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+
+from app import db
+
+# app/render_cache.py
+#
+# Two-tier cache for rendered Markdown. Keys are a hash of the renderer
+# fingerprint (allowed tags, extensions, library versions) plus the source
+# text, so changing the renderer settings makes every old entry unreachable.
+#
+#   tier 1: bounded in-process LRU
+#   tier 2: on-disk store under RENDER_CACHE_DIR, shared by all workers;
+#           once it passes RENDER_CACHE_MAX_BYTES the oldest files go, and
+#           with them renders from old fingerprints and edited-away texts
+
+
+class RenderCache:
+    PRUNE_EVERY = 50
+
+    def __init__(self, app=None):
+        self.fingerprint = ''
+        self.maxsize = 2048
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = self.disk_hits = self.misses = self.evictions = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RENDER_CACHE_SIZE', 2048)
+        app.config.setdefault('RENDER_CACHE_DIR', os.path.join(app.instance_path, 'render_cache'))
+        app.config.setdefault('RENDER_CACHE_MAX_BYTES', 256 * 1024 * 1024)
+        self.maxsize = app.config['RENDER_CACHE_SIZE']
+        from app.markdown_utils import renderer_fingerprint
+        self.fingerprint = renderer_fingerprint()
+        app.extensions['render_cache'] = self
+
+        if not event.contains(db.session, 'after_flush', _collect_renders):
+            event.listen(db.session, 'after_flush', _collect_renders)
+            event.listen(db.session, 'after_commit', _fill_renders)
+            event.listen(db.session, 'after_rollback', _discard_renders)
+
+    # -- keys and paths --
+
+    def key(self, kind, text):
+        h = hashlib.sha256()
+        for part in (self.fingerprint, kind, text):
+            h.update(part.encode('utf-8'))
+            h.update(b'\0')
+        return h.hexdigest()
+
+    def _directory(self):
+        if not has_app_context():
+            return None
+        return current_app.config.get('RENDER_CACHE_DIR')
+
+    def _path(self, directory, key):
+        # one sub-directory per fingerprint makes a full invalidation a rmtree
+        return os.path.join(directory, self.fingerprint[:16], key[:2], key + '.html')
+
+    # -- lookups --
+
+    def get(self, key):
+        with self._lock:
+            html = self._lru.get(key)
+            if html is not None:
+                self._lru.move_to_end(key)
+                self.hits += 1
+                return html
+
+        directory = self._directory()
+        if directory:
+            try:
+                with open(self._path(directory, key), encoding='utf-8') as fh:
+                    html = fh.read()
+            except OSError:
+                html = None
+            if html is not None:
+                self._remember(key, html)
+                with self._lock:
+                    self.disk_hits += 1
+                return html
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def contains(self, key):
+        """Whether ``key`` is cached in either tier; doesn't touch the stats."""
+        with self._lock:
+            if key in self._lru:
+                return True
+        directory = self._directory()
+        return bool(directory) and os.path.exists(self._path(directory, key))
+
+    def set(self, key, html):
+        self._remember(key, html)
+        directory = self._directory()
+        if not directory:
+            return
+        path = self._path(directory, key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # write to a temp file and rename so readers never see half a file
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as fh:
+                fh.write(html)
+            os.replace(tmp, path)
+        except OSError:
+            current_app.logger.warning('render cache: could not write %s', path, exc_info=True)
+            return
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % self.PRUNE_EVERY == 0
+        if prune:
+            self.prune()
+
+    def get_or_render(self, kind, text, render):
+        """Return cached HTML for ``text``, calling ``render(kind, text)`` on a miss."""
+        key = self.key(kind, text)
+        html = self.get(key)
+        if html is None:
+            html = render(kind, text)
+            self.set(key, html)
+        return html
+
+    def get_or_render_many(self, kind, texts, render_many):
+        """Batch get_or_render: all misses go to one ``render_many(kind, texts)`` call."""
+        keys = [self.key(kind, text) for text in texts]
+        results = [self.get(key) for key in keys]
+        missing = [i for i, html in enumerate(results) if html is None]
+        if missing:
+            rendered = render_many(kind, [texts[i] for i in missing])
+            for i, html in zip(missing, rendered):
+                results[i] = html
+                self.set(keys[i], html)
+        return results
+
+    def _remember(self, key, html):
+        with self._lock:
+            self._lru[key] = html
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.maxsize:
+                self._lru.popitem(last=False)
+
+    # -- maintenance --
+
+    def prune(self):
+        """Remove the oldest files until the disk tier is under RENDER_CACHE_MAX_BYTES."""
+        directory = self._directory()
+        if not directory or not os.path.isdir(directory):
+            return
+        files = []
+        for root, _, names in os.walk(directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= current_app.config['RENDER_CACHE_MAX_BYTES']:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            with self._lock:
+                self.evictions += 1
+
+    def clear(self, stale_only=False):
+        """Drop every cached render (or only those from old renderer settings).
+
+        Returns the number of fingerprint directories removed from disk.
+        """
+        if not stale_only:
+            with self._lock:
+                self._lru.clear()
+        directory = self._directory()
+        if not directory or not os.path.isdir(directory):
+            return 0
+        removed = 0
+        for name in os.listdir(directory):
+            if stale_only and name == self.fingerprint[:16]:
+                continue
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+            removed += 1
+        return removed
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                'entries': len(self._lru),
+                'maxsize': self.maxsize,
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = self.disk_hits = self.misses = self.evictions = 0
+
+
+render_cache = RenderCache()
+
+
+# fill the cache at write time, so page views never render Markdown
+
+def _collect_renders(session, flush_context):
+    from app.models import Post, Comment
+    pending = session.info.setdefault('render_cache_pending', [])
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Post):
+            attrs = db.inspect(obj).attrs
+            if attrs.title.history.has_changes():
+                pending.append(('title', obj.title))
+            # content is deferred: reading it for a title or is_private
+            # update would load the whole body
+            if attrs.content.history.has_changes():
+                pending.append(('html', obj.content))
+        elif isinstance(obj, Comment):
+            pending.append(('html', obj.content))
+
+
+def _fill_renders(session):
+    from app.markdown_utils import render_many
+    pending = session.info.pop('render_cache_pending', [])
+    if not has_app_context():
+        return
+    cache = current_app.extensions['render_cache']
+    pool = current_app.extensions.get('render_pool')
+    for kind in ('title', 'html'):
+        texts = [text for k, text in pending if k == kind and text]
+        if not texts:
+            continue
+        if pool is not None and pool.enabled:
+            # rendered by a worker; a view that gets there first renders inline
+            pool.submit(kind, texts)
+        else:
+            cache.get_or_render_many(kind, texts, render_many)
+
+
+def _discard_renders(session):
+    session.info.pop('render_cache_pending', None)
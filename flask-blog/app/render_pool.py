@@ -0,0 +1,136 @@
+import functools
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# app/render_pool.py
+#
+# Background Markdown rendering on write. With RENDER_POOL set to 'thread' or
+# 'process', the render cache fill that runs when a post or comment is
+# committed is handed to an executor instead of running in the request
+# thread. Results go into the render cache. A page viewed before its render
+# is ready simply misses the cache and renders inline, as it would with the
+# pool off.
+
+
+def render_batch(kind, texts):
+    """Render ``texts`` uncached. Runs inside a pool worker, so it has no app."""
+    from app.markdown_utils import render_many
+    return render_many(kind, texts)
+
+
+def make_executor(kind, workers=None):
+    """Build a thread or process executor for render_batch()."""
+    if kind == 'thread':
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix='render')
+    if kind == 'process':
+        # spawn, not fork: the parent has threads (and maybe open sqlite
+        # connections) that a forked child must not inherit
+        return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+    raise ValueError(f'unknown RENDER_POOL {kind!r}; use None, "thread" or "process"')
+
+
+class RenderPool:
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RENDER_POOL', None)
+        app.config.setdefault('RENDER_POOL_WORKERS', None)
+        app.extensions['render_pool'] = _AppPool(app)
+
+
+class _AppPool:
+    """Per-app executor state; the executor is built on first use, so a
+    pre-forking server creates it in each worker rather than in the master."""
+
+    def __init__(self, app):
+        self.app = app
+        self.kind = app.config['RENDER_POOL']
+        self.workers = app.config['RENDER_POOL_WORKERS']
+        self._executor = None
+        self._pending = {}  # cache key -> future
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self.submitted = self.completed = self.failed = 0
+
+    @property
+    def enabled(self):
+        return self.kind is not None
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = make_executor(self.kind, self.workers)
+            return self._executor
+
+    def submit(self, kind, texts):
+        """Render ``texts`` in the background and store them in the render cache.
+
+        Texts already cached or already queued are skipped. Returns the
+        future, or None if there was nothing to do.
+        """
+        cache = self.app.extensions['render_cache']
+        todo = {}
+        with self.app.app_context():
+            for text in texts:
+                key = cache.key(kind, text)
+                if key not in todo and key not in self._pending and not cache.contains(key):
+                    todo[key] = text
+        if not todo:
+            return None
+        future = self._get_executor().submit(render_batch, kind, list(todo.values()))
+        keys = list(todo)
+        with self._lock:
+            for key in keys:
+                self._pending[key] = future
+            self.submitted += len(keys)
+        future.add_done_callback(functools.partial(self._store, keys))
+        return future
+
+    def _store(self, keys, future):
+        try:
+            results = future.result()
+        except Exception:
+            self.app.logger.exception('render pool: background render failed')
+            results = None
+        if results is not None:
+            cache = self.app.extensions['render_cache']
+            with self.app.app_context():
+                for key, html in zip(keys, results):
+                    cache.set(key, html)
+        with self._lock:
+            for key in keys:
+                self._pending.pop(key, None)
+            if results is None:
+                self.failed += len(keys)
+            else:
+                self.completed += len(keys)
+            self._idle.notify_all()
+
+    def wait(self, timeout=None):
+        """Block until every queued render is stored (tests, shutdown).
+
+        Returns False if ``timeout`` ran out first.
+        """
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._pending, timeout)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'pending': len(self._pending),
+            }
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+render_pool = RenderPool()
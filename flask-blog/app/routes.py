@@ -1,6 +1,14 @@
-from flask import Blueprint, render_template, redirect, request, url_for, flash, abort
+from flask import Blueprint, render_template, stream_template, redirect, request, url_for, flash, abort, current_app, jsonify, session
 from app import db
-from app.models import Post, Comment
+from app.models import User, Post, Comment, PublicTimeline
+from app.markdown_utils import markdown_to_html
+from app.pagination import keyset_paginate, keyset_stream, InvalidCursor, StreamedKeysetPage
+from app.search import search as search_posts
+from app import timeline
+from app.comment_queue import QueueFull
+from app.db_routing import mark_written
+from app.http_cache import conditional
+from app.page_cache import page_cache
 from app.forms import PostForm
 from flask_login import login_required, current_user
 # from . import main
@@ -9,48 +17,144 @@ main = Blueprint('main', __name__)
 
 #app/routes.py
 
+def _streaming():
+    # flashes are popped from the session while the template renders, and a
+    # streamed response has sent its session cookie by then
+    return current_app.config['STREAM_LISTINGS'] and not session.get('_flashes')
+
+def _listing_query():
+    # Listings get plain rows of just the columns index.html shows, not Post
+    # instances: no identity map, no ORM state, and no `content`, which is
+    # only read for old rows whose excerpt hasn't been backfilled yet.
+    return db.session.query(
+        Post.id, Post.title, Post.timestamp, Post.updated_at, Post.author_id,
+        User.username.label('author_name'), Post.is_private, Post.excerpt,
+        db.case((Post.excerpt.is_(None), Post.content)).label('content'),
+        Post.comment_count, Post.last_comment_at,
+    ).join(User, User.id == Post.author_id)
+
+def _feed_page(query, page_size_key, key=(Post.timestamp, Post.id)):
+    # one keyset page of a post feed, newest first
+    cursor = request.args.get('cursor')
+    per_page = current_app.config[page_size_key]
+    try:
+        if _streaming():
+            return keyset_stream(query, key, cursor=cursor, per_page=per_page,
+                                 yield_per=current_app.config['STREAM_YIELD_PER'])
+        return keyset_paginate(query, key, cursor=cursor, per_page=per_page)
+    except InvalidCursor:
+        abort(400)
+
+def _buffered(chunks, size):
+    # Jinja yields many tiny strings; send them in blocks of about `size` bytes
+    buffer, length = [], 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield ''.join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+def _stream_page(template, **context):
+    chunks = stream_template(template, **context)
+    return current_app.response_class(_buffered(chunks, current_app.config['STREAM_FLUSH_BYTES']),
+                                      mimetype='text/html')
+
+def _comment_page(post, cursor):
+    # one keyset page of a post's comments, oldest first
+    try:
+        return keyset_paginate(
+            Comment.query.filter_by(post_id=post.id).options(db.joinedload(Comment.author)),
+            (Comment.timestamp, Comment.id),
+            cursor=cursor,
+            per_page=current_app.config['COMMENTS_PAGE_SIZE'],
+            descending=False,
+        )
+    except InvalidCursor:
+        abort(400)
+
+def _visible_post(post_id):
+    # content stays deferred: a 304 never needs it, and a render loads it on access
+    post = Post.query.options(db.joinedload(Post.author)).get_or_404(post_id)
+    # deny access if the post is marked private and current user is not the author
+    if getattr(post, 'is_private', False) and (not current_user.is_authenticated or post.author_id != current_user.id):
+        abort(404)
+    return post
+
+def _render_feed(page, view):
+    if isinstance(page, StreamedKeysetPage):
+        # rows are read while the page is sent, so there are no validators to
+        # check up front and nothing for the page cache to store
+        return _stream_page('index.html', posts=page, page=page, view=view)
+
+    # only the top page moves when a post is added; every page shows comment counts
+    page_cache.tag('feed', *(f'post:{p.id}' for p in page.items))
+    if page.prev_cursor is None:
+        page_cache.tag('feed:head')
+
+    # the page changes when any row on it, its comment counts or the links change;
+    # counts come from the denormalized Post.comment_count, so no aggregate query
+    etag_parts = (view, page.next_cursor, page.prev_cursor, [
+        (p.id, p.timestamp, p.title, p.excerpt, p.is_private, p.author_name, p.comment_count)
+        for p in page.items
+    ])
+    # no Last-Modified: a post edited into private or deleted drops off the
+    # page without leaving a newer timestamp behind, so only the ETag can tell
+    return conditional(etag_parts, None, lambda: render_template(
+        'index.html', posts=page.items, page=page, view=view))
+
 @main.route('/')
+@page_cache.cached
 def index():
     # show all public posts (exclude private posts by others if using is_private)
+    key = (Post.timestamp, Post.id)
     if current_user.is_authenticated:
-        # posts = Post.query.order_by(Post.timestamp.desc()).all()
-        posts = Post.query.filter(
+        q = _listing_query().filter(
             db.or_(
                 Post.is_private == False,
                 Post.author_id == current_user.id
             )
-        ).order_by(Post.timestamp.desc()).all()
+        )
+    elif current_app.config['PUBLIC_TIMELINE']:
+        q, key = timeline.timeline_listing(_listing_query()), timeline.KEY
     else:
         # for anonymous users, hide private posts
-        posts = Post.query.filter_by(is_private=False).order_by(Post.timestamp.desc()).all() if hasattr(Post, 'is_private') else Post.query.order_by(Post.timestamp.desc()).all()
-    return render_template('index.html', posts=posts, view='all')
+        q = _listing_query().filter(Post.is_private == False)
+    page = _feed_page(q, 'INDEX_PAGE_SIZE', key)
+    return _render_feed(page, 'all')
 
 @main.route('/my_posts')
 @login_required
 def my_posts():
-    posts = Post.query.filter_by(author_id=current_user.id).order_by(Post.timestamp.desc()).all()
-    return render_template('index.html', posts=posts, view='mine')
+    page = _feed_page(_listing_query().filter(Post.author_id == current_user.id), 'MY_POSTS_PAGE_SIZE')
+    return _render_feed(page, 'mine')
 
 @main.route('/others_posts')
 @login_required
 def others_posts():
-    # exclude current user's posts and (optionally) exclude private posts
-    q = Post.query.filter(Post.author_id != current_user.id)
-    if hasattr(Post, 'is_private'):
-        q = q.filter_by(is_private=False)
-    posts = q.order_by(Post.timestamp.desc()).all()
-    return render_template('index.html', posts=posts, view='others')
+    # exclude current user's posts and private posts
+    if current_app.config['PUBLIC_TIMELINE']:
+        q = timeline.timeline_listing(_listing_query()).filter(PublicTimeline.author_id != current_user.id)
+        page = _feed_page(q, 'OTHERS_POSTS_PAGE_SIZE', timeline.KEY)
+    else:
+        q = _listing_query().filter(Post.author_id != current_user.id, Post.is_private == False)
+        page = _feed_page(q, 'OTHERS_POSTS_PAGE_SIZE')
+    return _render_feed(page, 'others')
+
+@main.route('/search')
+def search():
+    q = request.args.get('q', '').strip()
+    viewer_id = current_user.id if current_user.is_authenticated else None
+    post_hits, comment_hits = search_posts(q, viewer_id, limit=current_app.config['SEARCH_RESULTS'])
+    return render_template('search.html', q=q, post_hits=post_hits, comment_hits=comment_hits)
 
 @main.route('/post/<int:post_id>', methods=['GET', 'POST'])
+@page_cache.cached
 def post_detail(post_id):
-    post = Post.query.get_or_404(post_id)
-    # comments = post.comments
-
-    # deny access if the post is marked private and current user is not the author
-    if getattr(post, 'is_private', False) and (not current_user.is_authenticated or post.author_id != current_user.id):
-        abort(404)
+    post = _visible_post(post_id)
 
-    comments = post.comments.order_by(Comment.timestamp.asc()).all() if hasattr(post.comments, 'order_by') else post.comments
     if request.method == 'POST':
         if current_user.is_authenticated:
             content = request.form.get('content').strip()
@@ -58,15 +162,73 @@ def post_detail(post_id):
                 flash('Comment cannot be empty.', 'warning')
                 # return redirect(url_for('main.post_detail', post_id=post.id))
             else:
-                comment = Comment(content=content, post_id=post.id, author_id=current_user.id)
-                db.session.add(comment)
-                db.session.commit()
+                post_id = post.id
+                queue = current_app.extensions['comment_queue']
+                if queue.enabled:
+                    # end this request's read transaction first: without WAL
+                    # it would keep the writer thread from committing
+                    db.session.rollback()
+                    try:
+                        # batched with concurrent comments; returns once committed
+                        queue.add(post_id, current_user.id, content)
+                    except (QueueFull, TimeoutError):
+                        abort(503)
+                    mark_written(db.session())
+                else:
+                    comment = Comment(content=content, post_id=post_id, author_id=current_user.id)
+                    db.session.add(comment)
+                    db.session.commit()
                 flash('Comment added successfully!', 'success')
-                return redirect(url_for('main.post_detail', post_id=post.id))
+                return redirect(url_for('main.post_detail', post_id=post_id))
         else:
             flash('You must be logged in to comment.', 'danger')
             return redirect(url_for('auth.login'))
-    return render_template('post_detail.html', post=post, comments=comments)
+
+    page_cache.tag(f'post:{post.id}', f'user:{post.author_id}')
+
+    # validators come from the post and author rows' versions and counters
+    # (updated_at moves on every edit), so a 304 reads neither the body nor
+    # the comment table
+    cursor = request.args.get('comments')
+    etag_parts = (post.id, post.timestamp, post.updated_at,
+                  post.author.username, post.author.post_count, post.comment_count,
+                  post.last_comment_at, cursor)
+
+    def render():
+        # only the first page of comments is inlined (or the page named by
+        # ?comments=, for browsers without JS); the rest comes from post_comments
+        page = _comment_page(post, cursor)
+        return render_template('post_detail.html', post=post, comments=page.items, page=page)
+    # no Last-Modified: the author's post count moves without any time on
+    # this page's rows moving with it, so only the ETag can tell
+    return conditional(etag_parts, None, render)
+
+@main.route('/post/<int:post_id>/comments')
+@page_cache.cached
+def post_comments(post_id):
+    """One page of a post's comments, as an HTML fragment or, with
+    ?format=json, as JSON, for the "load more" link on post_detail."""
+    post = _visible_post(post_id)
+    page_cache.tag(f'post:{post.id}')
+    cursor = request.args.get('cursor')
+    as_json = request.args.get('format') == 'json'
+    etag_parts = ('comments', post.id, post.comment_count, post.last_comment_at, cursor, as_json)
+
+    def render():
+        page = _comment_page(post, cursor)
+        if not as_json:
+            return render_template('comments/comment_list.html', post=post, comments=page.items, page=page)
+        return jsonify(
+            comments=[{
+                'id': c.id,
+                'author': c.author.username if c.author else None,
+                'timestamp': c.timestamp.isoformat(),
+                'html': str(markdown_to_html(c.content)),
+            } for c in page.items],
+            next_cursor=page.next_cursor,
+            html=render_template('comments/comment_list.html', post=post, comments=page.items, page=page),
+        )
+    return conditional(etag_parts, post.last_comment_at, render)
 
 @main.route('/new_post', methods=['GET', 'POST'])
 @login_required
@@ -0,0 +1,125 @@
+import re
+from markupsafe import Markup, escape
+from sqlalchemy import event
+from app import db
+
+# app/search.py
+#
+# Full-text search over posts and comments with SQLite FTS5. The FTS tables
+# are external-content indexes over `post` and `comment`; triggers keep them
+# in sync on every insert, update and delete, including bulk inserts that
+# bypass the ORM.
+
+SCHEMA = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS post_fts USING fts5(
+        title, content, content='post', content_rowid='id', tokenize='porter unicode61')""",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS comment_fts USING fts5(
+        content, content='comment', content_rowid='id', tokenize='porter unicode61')""",
+    """CREATE TRIGGER IF NOT EXISTS post_fts_ai AFTER INSERT ON post BEGIN
+        INSERT INTO post_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS post_fts_ad AFTER DELETE ON post BEGIN
+        INSERT INTO post_fts(post_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS post_fts_au AFTER UPDATE OF title, content ON post BEGIN
+        INSERT INTO post_fts(post_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO post_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS comment_fts_ai AFTER INSERT ON comment BEGIN
+        INSERT INTO comment_fts(rowid, content) VALUES (new.id, new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS comment_fts_ad AFTER DELETE ON comment BEGIN
+        INSERT INTO comment_fts(comment_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS comment_fts_au AFTER UPDATE OF content ON comment BEGIN
+        INSERT INTO comment_fts(comment_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        INSERT INTO comment_fts(rowid, content) VALUES (new.id, new.content);
+    END""",
+]
+
+# snippet() markers; they can't appear in text typed into a form, so the
+# snippet can be HTML-escaped first and the markers swapped for <mark> after
+_HL_START, _HL_END = '\x02', '\x03'
+
+POST_SEARCH = f"""
+    SELECT p.id AS post_id,
+           highlight(post_fts, 0, '{_HL_START}', '{_HL_END}') AS title,
+           snippet(post_fts, 1, '{_HL_START}', '{_HL_END}', '…', 24) AS snippet
+    FROM post_fts JOIN post p ON p.id = post_fts.rowid
+    WHERE post_fts MATCH :query AND (p.is_private = 0 OR p.author_id = :viewer)
+    ORDER BY bm25(post_fts, 10.0, 1.0)
+    LIMIT :limit
+"""
+
+COMMENT_SEARCH = f"""
+    SELECT c.post_id AS post_id, p.title AS title,
+           snippet(comment_fts, 0, '{_HL_START}', '{_HL_END}', '…', 24) AS snippet
+    FROM comment_fts
+    JOIN comment c ON c.id = comment_fts.rowid
+    JOIN post p ON p.id = c.post_id
+    WHERE comment_fts MATCH :query AND (p.is_private = 0 OR p.author_id = :viewer)
+    ORDER BY bm25(comment_fts)
+    LIMIT :limit
+"""
+
+
+def create_search_index(connection):
+    for statement in SCHEMA:
+        connection.exec_driver_sql(statement)
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _after_create(target, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        create_search_index(connection)
+
+
+@event.listens_for(db.metadata, 'before_drop')
+def _before_drop(target, connection, **kw):
+    # the triggers go with their tables, the FTS tables have to be dropped by hand
+    if connection.dialect.name == 'sqlite':
+        connection.exec_driver_sql('DROP TABLE IF EXISTS post_fts')
+        connection.exec_driver_sql('DROP TABLE IF EXISTS comment_fts')
+
+
+def rebuild_search_index():
+    """(Re)create the FTS tables and triggers and reindex every row."""
+    connection = db.session.connection()
+    create_search_index(connection)
+    connection.exec_driver_sql("INSERT INTO post_fts(post_fts) VALUES('rebuild')")
+    connection.exec_driver_sql("INSERT INTO comment_fts(comment_fts) VALUES('rebuild')")
+    db.session.commit()
+
+
+def to_match_query(text):
+    """Turn free text into a safe FTS5 query: every word quoted, all required,
+    the last one also matching as a prefix."""
+    words = re.findall(r'\w+', text or '')
+    if not words:
+        return None
+    terms = ['"%s"' % w for w in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def _highlight(text):
+    return Markup(str(escape(text)).replace(_HL_START, '<mark>').replace(_HL_END, '</mark>'))
+
+
+def search(text, viewer_id=None, limit=20):
+    """Return ``(post_hits, comment_hits)`` for ``text``, best match first.
+
+    Private posts are only searched for their author, as on the index page.
+    """
+    query = to_match_query(text)
+    if query is None:
+        return [], []
+    params = {'query': query, 'viewer': viewer_id, 'limit': limit}
+    results = []
+    for sql in (POST_SEARCH, COMMENT_SEARCH):
+        rows = db.session.execute(db.text(sql), params).all()
+        results.append([
+            {'post_id': r.post_id, 'title': _highlight(r.title), 'snippet': _highlight(r.snippet)}
+            for r in rows
+        ])
+    return tuple(results)
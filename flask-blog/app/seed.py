@@ -0,0 +1,176 @@
+import random
+from datetime import datetime, timedelta
+
+from werkzeug.security import generate_password_hash
+
+from app import db
+from app.markdown_utils import markdown_excerpts
+from app.models import User, Post, Comment, PublicTimeline
+
+# app/seed.py
+#
+# Synthetic data at production scale for local profiling (`flask seed`).
+# Rows go in through Core bulk INSERTs in batches, bypassing the ORM unit of
+# work, so the denormalized counters (comment_count, last_comment_at,
+# post_count) and the public_timeline rows are written here rather than by
+# the mapper listeners. Post excerpts are rendered in batches unless turned
+# off (then run `flask backfill-excerpts` later). Every seeded user has the
+# same password, SEED_PASSWORD, hashed once.
+
+SEED_PASSWORD = 'password'
+
+WORDS = (
+    'flask sqlalchemy query index cache render template request response cursor '
+    'latency throughput worker thread process database migration session cookie '
+    'markdown table code block deploy rollback commit transaction benchmark page '
+    'the a of and to in is for with on that this it as we you can be will'
+).split()
+
+CODE = {
+    'python': 'def {name}(items):\n    total = 0\n    for item in items:\n        total += item.{attr}\n    return total\n',
+    'javascript': 'function {name}(items) {{\n  return items.reduce((sum, item) => sum + item.{attr}, 0);\n}}\n',
+    'sql': 'SELECT {attr}, count(*)\nFROM {name}\nGROUP BY {attr}\nORDER BY 2 DESC;\n',
+}
+
+
+def _sentence(rng, n):
+    words = rng.choices(WORDS, k=n)
+    return ' '.join(words).capitalize() + '.'
+
+
+def _paragraph(rng):
+    text = ' '.join(_sentence(rng, rng.randint(6, 16)) for _ in range(rng.randint(2, 5)))
+    if rng.random() < 0.4:
+        word = rng.choice(WORDS)
+        text += f' See [{word}](https://example.com/{word}) and `{rng.choice(WORDS)}()`.'
+    if rng.random() < 0.3:
+        text = text.replace(' ', ' **', 1).replace('.', '**.', 1)
+    return text
+
+
+def _code_block(rng):
+    lang = rng.choice(list(CODE))
+    return f'```{lang}\n' + CODE[lang].format(name=rng.choice(WORDS), attr=rng.choice(WORDS)) + '```'
+
+
+def _table(rng):
+    cols = rng.sample(WORDS[:30], 3)
+    rows = ['| ' + ' | '.join(cols) + ' |', '|' + '---|' * len(cols)]
+    rows += ['| ' + ' | '.join(str(rng.randint(0, 999)) for _ in cols) + ' |' for _ in range(rng.randint(2, 6))]
+    return '\n'.join(rows)
+
+
+def _list(rng):
+    return '\n'.join(f'- {_sentence(rng, rng.randint(3, 8))}' for _ in range(rng.randint(2, 5)))
+
+
+def post_markdown(rng):
+    """A post body: paragraphs mixed with headings, code blocks, tables and lists."""
+    blocks = [_paragraph(rng)]
+    for _ in range(rng.randint(2, 8)):
+        kind = rng.random()
+        if kind < 0.25:
+            blocks.append(_code_block(rng))
+        elif kind < 0.35:
+            blocks.append(_table(rng))
+        elif kind < 0.45:
+            blocks.append(_list(rng))
+        elif kind < 0.55:
+            blocks.append('## ' + _sentence(rng, 4).rstrip('.'))
+        else:
+            blocks.append(_paragraph(rng))
+    return '\n\n'.join(blocks)
+
+
+def comment_markdown(rng):
+    text = _sentence(rng, rng.randint(4, 25))
+    if rng.random() < 0.1:
+        text += '\n\n' + _code_block(rng)
+    return text
+
+
+def _batches(rows, size):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def seed(users, posts, comments, batch_size=2000, private_ratio=0.1, excerpts=True,
+         random_seed=0, start=None, progress=None):
+    """Insert ``users`` users, ``posts`` posts and ``comments`` comments.
+
+    Posts are spread over the users and comments over the posts, with
+    timestamps going back from ``start`` (default: now). ``progress`` is
+    called with (table, rows inserted so far). Returns the inserted counts.
+    """
+    if posts and not users or comments and not posts:
+        raise ValueError('posts need users and comments need posts')
+    rng = random.Random(random_seed)
+    start = start or datetime.utcnow()
+    progress = progress or (lambda table, done: None)
+    password_hash = generate_password_hash(SEED_PASSWORD)
+
+    first_user = (db.session.scalar(db.select(db.func.max(User.id))) or 0) + 1
+    first_post = (db.session.scalar(db.select(db.func.max(Post.id))) or 0) + 1
+    user_ids = list(range(first_user, first_user + users))
+    post_ids = list(range(first_post, first_post + posts))
+
+    # decide authorship and comment placement up front, so the counters can be
+    # written with the rows instead of recomputed afterwards
+    post_rows = []
+    post_count = dict.fromkeys(user_ids, 0)
+    for i, post_id in enumerate(post_ids):
+        author = rng.choice(user_ids)
+        post_count[author] += 1
+        post_rows.append({
+            'id': post_id,
+            'title': _sentence(rng, rng.randint(3, 9)).rstrip('.'),
+            'content': post_markdown(rng),
+            'timestamp': start - timedelta(minutes=posts - i),
+            'author_id': author,
+            'is_private': rng.random() < private_ratio,
+            'comment_count': 0,
+            'last_comment_at': None,
+        })
+
+    comment_rows = []
+    for i in range(comments):
+        # a few posts attract most comments
+        post = post_rows[min(int(rng.paretovariate(1.2)) - 1, posts - 1) if rng.random() < 0.5
+                         else rng.randrange(posts)]
+        ts = min(post['timestamp'] + timedelta(seconds=rng.randint(1, 7 * 24 * 3600)), start)
+        post['comment_count'] += 1
+        post['last_comment_at'] = max(post['last_comment_at'] or ts, ts)
+        comment_rows.append({
+            'content': comment_markdown(rng),
+            'timestamp': ts,
+            'post_id': post['id'],
+            'author_id': rng.choice(user_ids),
+        })
+
+    done = 0
+    for batch in _batches([{'id': uid, 'username': f'user{uid}', 'password_hash': password_hash,
+                            'post_count': post_count[uid]} for uid in user_ids], batch_size):
+        db.session.execute(db.insert(User), batch)
+        done += len(batch)
+        progress('user', done)
+
+    done = 0
+    for batch in _batches(post_rows, batch_size):
+        if excerpts:
+            for row, html in zip(batch, markdown_excerpts([row['content'] for row in batch])):
+                row['excerpt'] = str(html)
+        db.session.execute(db.insert(Post), batch)
+        public = [{'timestamp': row['timestamp'], 'post_id': row['id'], 'author_id': row['author_id']}
+                  for row in batch if not row['is_private']]
+        if public:
+            db.session.execute(db.insert(PublicTimeline), public)
+        done += len(batch)
+        progress('post', done)
+
+    done = 0
+    for batch in _batches(comment_rows, batch_size):
+        db.session.execute(db.insert(Comment), batch)
+        done += len(batch)
+        progress('comment', done)
+    db.session.commit()
+    return {'users': users, 'posts': posts, 'comments': comments}
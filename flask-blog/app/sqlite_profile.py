@@ -0,0 +1,60 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+from app import db
+
+# app/sqlite_profile.py
+#
+# Per-connection SQLite tuning. Every new DB-API connection gets the
+# SQLITE_PRAGMAS from config (WAL journal, synchronous=NORMAL, busy timeout,
+# mmap and page cache sizes, in-memory temp tables) so readers keep going
+# while a comment is being written instead of failing with
+# "database is locked".
+
+
+def _is_sqlite(uri):
+    return make_url(uri).get_backend_name() == 'sqlite'
+
+
+def _is_memory(uri):
+    database = make_url(uri).database
+    return not database or database == ':memory:' or 'mode=memory' in uri
+
+
+def configure_engine_options(app):
+    """Adjust SQLALCHEMY_ENGINE_OPTIONS before the engine is created.
+
+    In-memory SQLite runs on a single shared connection (StaticPool), which
+    takes no pool sizing arguments, so those are dropped for it.
+    """
+    uri = app.config.get('SQLALCHEMY_DATABASE_URI')
+    options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    if uri and _is_sqlite(uri) and _is_memory(uri):
+        for name in ('pool_size', 'max_overflow', 'pool_timeout', 'pool_recycle'):
+            options.pop(name, None)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+
+def init_app(app):
+    """Install the pragma hook on every SQLite engine of ``app``, the read replica's included."""
+    pragmas = app.config.get('SQLITE_PRAGMAS') or {}
+    if not pragmas:
+        return
+    with app.app_context():
+        engines = list(db.engines.values())
+    if 'read_replica' in app.extensions:
+        engines.append(app.extensions['read_replica'])
+    for engine in engines:
+        if engine.dialect.name == 'sqlite':
+            event.listen(engine, 'connect', _pragma_hook(pragmas))
+
+
+def _pragma_hook(pragmas):
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
+    return apply_pragmas
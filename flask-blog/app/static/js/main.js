@@ -1 +1,28 @@
-// JavaScript functionality can be added here.
\ No newline at end of file
+// JavaScript functionality can be added here.
+
+// "Load more comments": fetch the next page as an HTML fragment and put it in
+// place of the link. The fragment ends with the following page's link, if any.
+// Without JS the link still works; it opens the post at that comment page.
+document.addEventListener('click', function (event) {
+    var link = event.target.closest('a.load-more');
+    if (!link || !link.dataset.fragment) {
+        return;
+    }
+    event.preventDefault();
+    link.classList.add('loading');
+    fetch(link.dataset.fragment, {credentials: 'same-origin'})
+        .then(function (response) {
+            if (!response.ok) {
+                throw new Error(response.status);
+            }
+            return response.text();
+        })
+        .then(function (html) {
+            link.insertAdjacentHTML('afterend', html);
+            link.remove();
+        })
+        .catch(function () {
+            // fall back to the plain link
+            window.location.href = link.href;
+        });
+});
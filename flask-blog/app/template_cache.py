@@ -0,0 +1,111 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, has_app_context
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+
+# app/template_cache.py
+#
+# Two caches for the template layer.
+#
+# Fragment cache: a `{% cache key[, ttl] %}...{% endcache %}` tag that stores
+# the rendered block in a bounded per-process LRU. The key is any expression
+# (usually a tuple) and must name everything the block shows, e.g. the post
+# id and its updated_at, so a changed row simply misses and the old entry
+# ages out; nothing is invalidated explicitly. Never cache output that
+# depends on who is looking unless the viewer is part of the key.
+#
+# Bytecode cache: compiled templates are written under JINJA_BYTECODE_CACHE_DIR,
+# so a freshly started worker loads them instead of compiling base.html and
+# friends again. Jinja checks each template's source mtime before use.
+
+
+class FragmentCache:
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires, html)
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None and item[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+
+    def set(self, key, html, ttl=None):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + (ttl or self.ttl), html)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self._entries),
+                'maxsize': self.maxsize,
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = self.misses = 0
+
+
+class FragmentCacheExtension(Extension):
+    """``{% cache key[, ttl] %}...{% endcache %}``"""
+
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        # the template name keeps equal keys in different templates apart
+        args = [nodes.Const(parser.name), parser.parse_expression()]
+        args.append(parser.parse_expression() if parser.stream.skip_if('comma') else nodes.Const(None))
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(self.call_method('_cached', args), [], [], body).set_lineno(lineno)
+
+    def _cached(self, template, key, ttl, caller):
+        cache = current_app.extensions.get('fragment_cache') if has_app_context() else None
+        if cache is None:
+            return caller()
+        key = repr((template, key))
+        html = cache.get(key)
+        if html is None:
+            html = caller()
+            cache.set(key, html, ttl)
+        return html
+
+
+def init_app(app):
+    app.config.setdefault('FRAGMENT_CACHE_SIZE', 10000)
+    app.config.setdefault('FRAGMENT_CACHE_TTL', 300)
+    app.config.setdefault('JINJA_BYTECODE_CACHE_DIR', os.path.join(app.instance_path, 'jinja_cache'))
+
+    # without a cache the tag still renders its body every time
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    if app.config['FRAGMENT_CACHE_SIZE'] > 0:
+        app.extensions['fragment_cache'] = FragmentCache(
+            app.config['FRAGMENT_CACHE_SIZE'], app.config['FRAGMENT_CACHE_TTL'])
+
+    directory = app.config['JINJA_BYTECODE_CACHE_DIR']
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
@@ -0,0 +1,50 @@
+from app import db
+from app.models import Post, PublicTimeline
+
+# app/timeline.py
+#
+# The public timeline: (timestamp, post_id, author_id) of every public post
+# in a WITHOUT ROWID table, so its rows are stored in timeline order. With
+# PUBLIC_TIMELINE on, the anonymous index and /others_posts page through it
+# instead of post: a page is a range read of one small-rowed table in which
+# every row is public, /others_posts drops the viewer's own posts there
+# before any post row is read, and only the listed posts are then fetched
+# by primary key.
+#
+# The listeners in app/models.py keep it in step with every ORM insert,
+# update and delete of a post. Bulk query updates and raw SQL go around
+# them; `flask timeline check` reports the drift and `flask timeline
+# rebuild` recreates the table from post.
+
+# keyset for app/pagination.py; the values match (Post.timestamp, Post.id),
+# so cursors work the same with the timeline on or off
+KEY = (PublicTimeline.timestamp, PublicTimeline.post_id)
+
+
+def timeline_listing(query):
+    """Restrict a listing query on Post to public posts, read through the timeline."""
+    return query.join(PublicTimeline, PublicTimeline.post_id == Post.id).add_columns(PublicTimeline.post_id)
+
+
+def check(connection):
+    """Count public posts missing from the timeline and timeline rows that are wrong."""
+    posts, timeline = Post.__table__, PublicTimeline.__table__
+    matches = db.and_(timeline.c.post_id == posts.c.id, timeline.c.timestamp == posts.c.timestamp,
+                      timeline.c.author_id == posts.c.author_id)
+    missing = connection.scalar(
+        db.select(db.func.count()).select_from(posts)
+        .where(posts.c.is_private == False, ~db.exists().where(matches)))  # noqa: E712
+    stale = connection.scalar(
+        db.select(db.func.count()).select_from(timeline)
+        .where(~db.exists().where(matches, posts.c.is_private == False)))  # noqa: E712
+    return {'missing': missing, 'stale': stale}
+
+
+def rebuild(connection):
+    """Refill the timeline from post; returns the number of rows."""
+    posts, timeline = Post.__table__, PublicTimeline.__table__
+    connection.execute(timeline.delete())
+    return connection.execute(timeline.insert().from_select(
+        ['timestamp', 'post_id', 'author_id'],
+        db.select(posts.c.timestamp, posts.c.id, posts.c.author_id).where(posts.c.is_private == False),  # noqa: E712
+    )).rowcount
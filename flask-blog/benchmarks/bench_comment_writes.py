@@ -0,0 +1,146 @@
+"""Comment write throughput: one commit per comment vs group commit.
+
+Seeds a throwaway database with one post, then for each mode starts a fresh
+interpreter that serves the app from a threaded local WSGI server, where
+--commenters signed-in clients each POST --comments comments to that post
+at the same time, over HTTP, every request waiting for its redirect:
+
+  direct   post_detail commits each comment itself
+  grouped  COMMENT_GROUP_COMMIT: comments are queued and written in batches
+
+both with SQLite's synchronous=NORMAL (the app default; in WAL mode commits
+are not synced) and synchronous=FULL (every commit waits for an fsync).
+Reports comments per second, request latency and, for grouped, the
+average batch size.
+
+    python benchmarks/bench_comment_writes.py [--commenters 50] [--comments 20]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app import create_app, db  # noqa: E402
+from app.seed import seed  # noqa: E402
+from config import Config  # noqa: E402
+
+PROBE = r'''
+import http.client, json, sys, threading, time
+from urllib.parse import urlencode
+from werkzeug.serving import WSGIRequestHandler, make_server
+from app import create_app
+from app.seed import SEED_PASSWORD
+from config import Config
+
+db_path, cache_dir, grouped, synchronous, commenters, comments = sys.argv[1:7]
+
+class BenchConfig(Config):
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + db_path
+    RENDER_CACHE_DIR = cache_dir
+    WTF_CSRF_ENABLED = False
+    SECRET_KEY = 'bench'
+    COMMENT_GROUP_COMMIT = grouped == '1'
+    SQLITE_PRAGMAS = dict(Config.SQLITE_PRAGMAS, synchronous=synchronous)
+
+class QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+app = create_app(BenchConfig)
+server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietHandler)
+server.request_queue_size = 128
+threading.Thread(target=server.serve_forever, daemon=True).start()
+
+def post(path, form, cookie=None):
+    conn = http.client.HTTPConnection('127.0.0.1', server.server_port)
+    headers = {'Content-Type': 'application/x-www-form-urlencoded'}
+    if cookie:
+        headers['Cookie'] = cookie
+    conn.request('POST', path, urlencode(form), headers)
+    response = conn.getresponse()
+    response.read()
+    conn.close()
+    return response
+
+cookies = []
+for uid in range(1, int(commenters) + 1):
+    response = post('/auth/login', {'username': f'user{uid}', 'password': SEED_PASSWORD})
+    cookies.append(response.getheader('Set-Cookie').split(';')[0])
+
+latencies, errors = [], []
+barrier = threading.Barrier(len(cookies) + 1)
+
+def commenter(cookie):
+    barrier.wait()
+    for i in range(int(comments)):
+        start = time.perf_counter()
+        response = post('/post/1', {'content': f'Comment {i} *from* a benchmark'}, cookie)
+        latencies.append((time.perf_counter() - start) * 1000)
+        if response.status != 302:
+            errors.append(response.status)
+
+threads = [threading.Thread(target=commenter, args=(c,)) for c in cookies]
+for t in threads:
+    t.start()
+barrier.wait()
+start = time.perf_counter()
+for t in threads:
+    t.join()
+elapsed = time.perf_counter() - start
+stats = app.extensions['comment_queue'].stats()
+server.shutdown()
+print(json.dumps({'latencies': latencies, 'seconds': elapsed, 'errors': errors, 'stats': stats}))
+'''
+
+MODES = {'direct': '0', 'grouped': '1'}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--commenters', type=int, default=50)
+    parser.add_argument('--comments', type=int, default=20, help='Comments per commenter.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_dir = os.path.join(tmp, 'render_cache')
+
+        print(f'{args.commenters} commenters x {args.comments} comments on one post')
+        print(f'  {"sync":<7} {"mode":<8} {"comments/s":>11} {"p50":>9} {"p95":>9} {"batch":>6} {"errors":>7}')
+        for synchronous in ('NORMAL', 'FULL'):
+            for mode, flag in MODES.items():
+                # a fresh copy of the data for every run
+                db_path = os.path.join(tmp, f'bench-{synchronous}-{mode}.db')
+
+                class BenchConfig(Config):
+                    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + db_path
+                    RENDER_CACHE_DIR = cache_dir
+
+                app = create_app(BenchConfig)
+                with app.app_context():
+                    db.create_all()
+                    seed(args.commenters, 1, 0, private_ratio=0)
+                    db.engine.dispose()
+
+                out = subprocess.run(
+                    [sys.executable, '-c', PROBE, db_path, cache_dir, flag, synchronous,
+                     str(args.commenters), str(args.comments)],
+                    cwd=ROOT, capture_output=True, text=True, check=True,
+                ).stdout
+                r = json.loads(out.strip().splitlines()[-1])
+                latencies = sorted(r['latencies'])
+                p50 = latencies[len(latencies) // 2]
+                p95 = latencies[int(len(latencies) * 0.95) - 1]
+                stats = r['stats']
+                batch = f'{stats["committed"] / stats["batches"]:.1f}' if stats['batches'] else '-'
+                print(f'  {synchronous:<7} {mode:<8} {len(latencies) / r["seconds"]:9.0f}/s '
+                      f'{p50:7.1f}ms {p95:7.1f}ms {batch:>6} {len(r["errors"]):>7}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""post_detail load test: every comment inline vs one keyset page of comments.
+
+Builds posts with a growing number of comments and requests each post page
+repeatedly (render cache warm, as in production):
+
+  all      COMMENTS_PAGE_SIZE large enough to inline every comment, which is
+           what post_detail did before comment pagination
+  paged    the default COMMENTS_PAGE_SIZE
+
+    python benchmarks/bench_comments.py [--sizes 10,100,1000,10000] [--repeat 20]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db  # noqa: E402
+from app.models import User, Post, Comment  # noqa: E402
+from config import Config  # noqa: E402
+
+COMMENT = 'Thanks for post {p}! Reply {i} with a [link](https://example.com/{i}) and `code`.'
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10,100,1000,10000')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(',')]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        class BenchConfig(Config):
+            SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(tmp, 'bench.db')
+            RENDER_CACHE_DIR = os.path.join(tmp, 'render_cache')
+
+        app = create_app(BenchConfig)
+        client = app.test_client()
+        with app.app_context():
+            db.create_all()
+            user = User(username='bench', password_hash='x')
+            db.session.add(user)
+            db.session.commit()
+            post_ids = {}
+            base = datetime(2020, 1, 1)
+            for n in sizes:
+                post = Post(title=f'{n} comments', content='body', author_id=user.id)
+                db.session.add(post)
+                db.session.commit()
+                # bulk insert skips the counter listeners; repair-counts fixes them below
+                db.session.execute(db.insert(Comment), [
+                    {'content': COMMENT.format(p=post.id, i=i), 'post_id': post.id,
+                     'author_id': user.id, 'timestamp': base + timedelta(seconds=i)}
+                    for i in range(n)
+                ])
+                db.session.commit()
+                post_ids[n] = post.id
+            app.test_cli_runner().invoke(args=['repair-counts'])
+
+        print(f'GET /post/<id>, median / p95 of {args.repeat} requests')
+        print(f'  {"comments":>9}  {"all":>29}  {"paged":>29}')
+        for n in sizes:
+            url = f'/post/{post_ids[n]}'
+            row = []
+            for page_size in (n + 1, Config.COMMENTS_PAGE_SIZE):
+                app.config['COMMENTS_PAGE_SIZE'] = page_size
+                size = len(client.get(url).data)  # also warms the render cache
+                p50, p95 = timed(lambda: client.get(url), args.repeat)
+                row.append(f'{p50:7.1f} / {p95:7.1f} ms {size / 1024:6.0f}K')
+            print(f'  {n:>9}  ' + '  '.join(row))
+
+
+if __name__ == '__main__':
+    main()
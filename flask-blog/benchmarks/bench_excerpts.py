@@ -0,0 +1,111 @@
+"""Index render benchmark: per-request excerpts vs stored excerpts.
+
+Renders one 500-post page of index.html three ways:
+
+  before       the old template, `post.content[:300] | markdown_to_html`,
+               with the render cache emptied before every run
+  before+cache the old template with a warm render cache
+  stored       the current template reading the stored `Post.excerpt`
+
+    python benchmarks/bench_excerpts.py [--posts 500] [--repeat 10]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import render_template  # noqa: E402
+from app import create_app, db  # noqa: E402
+from app.models import User, Post  # noqa: E402
+from app.pagination import keyset_paginate  # noqa: E402
+from app.render_cache import render_cache  # noqa: E402
+from config import Config  # noqa: E402
+
+BODY = '''Some intro text with a [link](https://example.com/{i}) and `inline code`.
+
+```python
+def handler_{i}(request):
+    return render(request, "post.html", {{"id": {i}}})
+```
+
+| col | value |
+|-----|-------|
+| a   | {i}   |
+
+Closing paragraph for post {i} with **bold** and _emphasis_.
+'''
+
+
+def timed(fn, repeat, before=None):
+    samples = []
+    for _ in range(repeat):
+        if before:
+            before()
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--posts', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        class BenchConfig(Config):
+            SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(tmp, 'bench.db')
+            RENDER_CACHE_DIR = os.path.join(tmp, 'render_cache')
+            INDEX_PAGE_SIZE = args.posts
+
+        app = create_app(BenchConfig)
+        with app.app_context():
+            db.create_all()
+            user = User(username='bench', password_hash='x')
+            db.session.add(user)
+            db.session.commit()
+            base = datetime(2020, 1, 1)
+            db.session.add_all(
+                Post(title=f'Post {i}', content=BODY.format(i=i), author_id=user.id,
+                     timestamp=base + timedelta(minutes=i))
+                for i in range(args.posts)
+            )
+            db.session.commit()
+
+            with open(os.path.join(app.root_path, 'templates', 'index.html')) as fh:
+                source = fh.read()
+            start = source.index('<div class="excerpt">')
+            end = source.index('</div>', start) + len('</div>')
+            old = app.jinja_env.from_string(
+                source[:start] + '<div class="excerpt">{{ post.content[:300] | markdown_to_html }}</div>' + source[end:]
+            )
+
+            page = keyset_paginate(Post.query, (Post.timestamp, Post.id), per_page=args.posts)
+            ctx = {'posts': page.items, 'page': page, 'view': 'all'}
+
+            def render_old():
+                context = dict(ctx)
+                app.update_template_context(context)
+                return old.render(context)
+
+            with app.test_request_context('/'):
+                before = timed(render_old, args.repeat, before=render_cache.clear)
+                render_old()
+                before_cached = timed(render_old, args.repeat)
+                stored = timed(lambda: render_template('index.html', **ctx), args.repeat)
+
+            print(f'index page with {args.posts} posts (median of {args.repeat})')
+            print(f'  before        {before:9.1f} ms')
+            print(f'  before+cache  {before_cached:9.1f} ms')
+            print(f'  stored        {stored:9.1f} ms   ({before / stored:.0f}x faster than before)')
+            db.session.remove()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""Template caching: {% cache %} fragments and the Jinja bytecode cache.
+
+Render times, warm caches as in production, with the fragment cache off
+(FRAGMENT_CACHE_SIZE = 0) and on:
+
+  index     GET / with --page-size posts
+  post      GET /post/<id> with a page of comments
+
+and the fragment hit rate over the timed requests. Then, in fresh
+interpreters, the time to compile every template with an empty bytecode
+cache directory vs loading them from a filled one.
+
+    python benchmarks/bench_fragments.py [--page-size 50] [--repeat 50] [--runs 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app import create_app, db  # noqa: E402
+from app.models import Post  # noqa: E402
+from app.seed import seed  # noqa: E402
+from config import Config  # noqa: E402
+
+PROBE = r'''
+import json, sys, time
+from app import create_app
+from config import Config
+
+class BenchConfig(Config):
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    JINJA_BYTECODE_CACHE_DIR = sys.argv[1]
+
+app = create_app(BenchConfig)
+names = [n for n in app.jinja_env.list_templates() if n.endswith(('.html', '.xml'))]
+start = time.perf_counter()
+for name in names:
+    app.jinja_env.get_template(name)
+print(json.dumps({'templates': len(names), 'seconds': time.perf_counter() - start}))
+'''
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def load_templates(cache_dir, runs):
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, '-c', PROBE, cache_dir], cwd=ROOT,
+                             capture_output=True, text=True, check=True).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        samples.append(result['seconds'] * 1000)
+    return result['templates'], statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        for size in (0, 10000):
+            class BenchConfig(Config):
+                SQLALCHEMY_DATABASE_URI = 'sqlite:///' + db_path
+                RENDER_CACHE_DIR = os.path.join(tmp, 'render_cache')
+                JINJA_BYTECODE_CACHE_DIR = os.path.join(tmp, 'jinja_cache')
+                INDEX_PAGE_SIZE = args.page_size
+                FRAGMENT_CACHE_SIZE = size
+
+            app = create_app(BenchConfig)
+            with app.app_context():
+                if size == 0:
+                    db.create_all()
+                    seed(20, args.page_size * 2, args.page_size * 20, private_ratio=0)
+                # the post with the most comments
+                post_id = db.session.scalar(db.select(Post.id).order_by(Post.comment_count.desc()).limit(1))
+
+            client = app.test_client()
+            pages = {'index': '/', 'post': f'/post/{post_id}'}
+            for url in pages.values():
+                client.get(url)
+            cache = app.extensions.get('fragment_cache')
+            if cache is not None:
+                cache.reset_stats()
+
+            label = 'fragments on' if size else 'fragments off'
+            print(f'{label}:')
+            for name, url in pages.items():
+                p50, p95 = timed(lambda: client.get(url), args.repeat)
+                print(f'  {name:<6} p50 {p50:7.2f} ms  p95 {p95:7.2f} ms')
+            if cache is not None:
+                stats = cache.stats()
+                print(f'  fragment hit rate {stats["hit_rate"]:.1%} ({stats["hits"]} hits, '
+                      f'{stats["misses"]} misses, {stats["entries"]} entries)')
+
+        # every compile run gets an empty directory; the bytecode runs share a filled one
+        filled = os.path.join(tmp, 'jinja_cache_filled')
+        n, _ = load_templates(filled, 1)
+        cold = statistics.median(load_templates(tempfile.mkdtemp(dir=tmp), 1)[1] for _ in range(args.runs))
+        _, warm = load_templates(filled, args.runs)
+        print(f'loading {n} templates in a fresh interpreter (median of {args.runs}):')
+        print(f'  compile           {cold:7.2f} ms')
+        print(f'  bytecode cache    {warm:7.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""Listing memory: full Post objects vs the column-projected listing rows.
+
+Builds a throwaway database of --posts posts with --body-kb KB bodies (rows
+inserted directly, sharing one pre-rendered excerpt), then, each in a fresh
+interpreter, materializes one listing of every post:
+
+  orm   Post objects with content loaded and authors joined, as the
+        listings did before content was deferred
+  rows  the listing query from app/routes.py: plain rows, no content
+
+and reports wall time, the growth of peak RSS (ru_maxrss) over the
+interpreter's baseline, and, from a second traced run, the peak of Python
+allocations and the memory blocks still held by the listing.
+
+Peak RSS includes the database pages SQLite touches through mmap
+(SQLITE_PRAGMAS mmap_size). Those are file-backed and reclaimable. Reading
+the listing columns still walks each body's overflow pages, because
+`content` sits before them in the row, so the rows mode shows file pages
+in RSS even though its heap stays small.
+
+    python benchmarks/bench_listing_memory.py [--posts 10000] [--body-kb 50]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app import create_app, db  # noqa: E402
+from app.markdown_utils import markdown_excerpt  # noqa: E402
+from app.models import User, Post  # noqa: E402
+from config import Config  # noqa: E402
+
+PROBE = r'''
+import gc, json, resource, sys, time, tracemalloc
+from app import create_app, db
+from app.models import Post
+from app.routes import _listing_query
+from config import Config
+
+db_path, mode = sys.argv[1:3]
+
+class BenchConfig(Config):
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + db_path
+
+def listing(limit):
+    if mode == 'orm':
+        q = Post.query.options(db.joinedload(Post.author), db.undefer(Post.content))
+    else:
+        q = _listing_query()
+    return q.order_by(Post.timestamp.desc(), Post.id.desc()).limit(limit).all()
+
+app = create_app(BenchConfig)
+with app.test_request_context('/'):
+    listing(10)
+    db.session.remove()
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    items = listing(-1)
+    elapsed = time.perf_counter() - start
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    n = len(items)
+    del items
+    db.session.remove()
+    gc.collect()
+
+    blocks = sys.getallocatedblocks()
+    tracemalloc.start()
+    items = listing(-1)
+    held_blocks = sys.getallocatedblocks() - blocks
+    heap_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+print(json.dumps({'items': n, 'seconds': elapsed, 'rss_kb': peak_rss - baseline,
+                  'heap_peak': heap_peak, 'blocks': held_blocks}))
+'''
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--posts', type=int, default=10000)
+    parser.add_argument('--body-kb', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+
+        class BenchConfig(Config):
+            SQLALCHEMY_DATABASE_URI = 'sqlite:///' + db_path
+            RENDER_CACHE_DIR = os.path.join(tmp, 'render_cache')
+
+        app = create_app(BenchConfig)
+        with app.app_context():
+            db.create_all()
+            started = time.perf_counter()
+            paragraph = ('Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * 16).strip() + '\n\n'
+            body = paragraph * (args.body_kb * 1024 // len(paragraph) + 1)
+            excerpt = str(markdown_excerpt(body))
+            users = [{'id': i + 1, 'username': f'user{i}', 'password_hash': 'x'} for i in range(100)]
+            db.session.execute(db.insert(User), users)
+            start = datetime(2024, 1, 1)
+            for first in range(0, args.posts, 500):
+                db.session.execute(db.insert(Post), [{
+                    'title': f'Post {i}',
+                    'content': f'# Post {i}\n\n' + body,
+                    'excerpt': excerpt,
+                    'timestamp': start + timedelta(minutes=i),
+                    'author_id': i % 100 + 1,
+                } for i in range(first, min(first + 500, args.posts))])
+            db.session.commit()
+            size = os.path.getsize(db_path) / 2**20
+            print(f'built {args.posts} posts with {args.body_kb} KB bodies ({size:.0f} MB) '
+                  f'in {time.perf_counter() - started:.1f}s')
+
+        print(f'  {"mode":<5} {"items":>6} {"time":>9} {"peak rss":>10} {"heap peak":>10} {"blocks held":>12}')
+        for mode in ('orm', 'rows'):
+            out = subprocess.run([sys.executable, '-c', PROBE, db_path, mode], cwd=ROOT,
+                                 capture_output=True, text=True, check=True).stdout
+            r = json.loads(out.strip().splitlines()[-1])
+            print(f'  {mode:<5} {r["items"]:>6} {r["seconds"] * 1000:7.0f}ms {r["rss_kb"] / 1024:+8.1f}MB '
+                  f'{r["heap_peak"] / 2**20:8.1f}MB {r["blocks"]:>12,}')
+
+
+if __name__ == '__main__':
+    main()
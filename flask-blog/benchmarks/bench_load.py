@@ -0,0 +1,237 @@
+"""Load generator: mixed traffic against a seeded blog, with latency percentiles.
+
+Seeds a throwaway database (app/seed.py), then runs --concurrency workers,
+each logged in as its own seeded user, for --duration seconds or --requests
+requests. Every request picks a scenario by weight:
+
+  index     GET /
+  post      GET /post/<id> (a random public post)
+  my_posts  GET /my_posts
+  login     POST /auth/login
+  comment   POST /post/<id> with a new comment
+
+--target testclient drives the app in-process through the Flask test
+client; --target wsgi serves it from a local threaded WSGI server and
+talks HTTP. Throughput and p50/p95/p99 per scenario are printed and, with
+--out, written as JSON together with the git revision and settings, so
+runs of different versions can be compared.
+
+CSRF is disabled for the run so the harness can POST forms directly.
+
+    python benchmarks/bench_load.py [--target testclient|wsgi] [--concurrency 4]
+        [--duration 10] [--users 100 --posts 2000 --comments 20000] [--out results.json]
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.serving import WSGIRequestHandler, make_server  # noqa: E402
+from app import create_app, db  # noqa: E402
+from app.models import User, Post  # noqa: E402
+from app.seed import SEED_PASSWORD, seed  # noqa: E402
+from config import Config  # noqa: E402
+
+SCENARIOS = {'index': 40, 'post': 40, 'my_posts': 10, 'login': 5, 'comment': 5}
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class TestClientSession:
+    """One simulated visitor on the in-process test client."""
+
+    def __init__(self, app, base_url=None):
+        self.client = app.test_client()
+
+    def get(self, path):
+        return self.client.get(path).status_code
+
+    def post(self, path, data):
+        return self.client.post(path, data=data).status_code
+
+
+class HTTPSession:
+    """One simulated visitor over real HTTP, with its own cookie jar."""
+
+    def __init__(self, app, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect)
+
+    def _open(self, request):
+        try:
+            with self.opener.open(request, timeout=30) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as exc:
+            exc.read()
+            return exc.code
+
+    def get(self, path):
+        return self._open(urllib.request.Request(self.base_url + path))
+
+    def post(self, path, data):
+        body = urllib.parse.urlencode(data).encode()
+        return self._open(urllib.request.Request(self.base_url + path, data=body))
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--target', choices=('testclient', 'wsgi'), default='testclient')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds to run (ignored with --requests).')
+    parser.add_argument('--requests', type=int, default=None, help='Stop after this many requests in total.')
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--posts', type=int, default=2000)
+    parser.add_argument('--comments', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help='Write results as JSON to this file.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        class BenchConfig(Config):
+            SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(tmp, 'bench.db')
+            RENDER_CACHE_DIR = os.path.join(tmp, 'render_cache')
+            WTF_CSRF_ENABLED = False
+            SECRET_KEY = 'bench'
+
+        app = create_app(BenchConfig)
+        with app.app_context():
+            db.create_all()
+            started = time.perf_counter()
+            seed(args.users, args.posts, args.comments, random_seed=args.seed)
+            print(f'seeded {args.users} users, {args.posts} posts, {args.comments} comments '
+                  f'in {time.perf_counter() - started:.1f}s')
+            usernames = [u for (u,) in db.session.query(User.username).order_by(User.id)]
+            post_ids = [p for (p,) in db.session.query(Post.id).filter_by(is_private=False)]
+            db.session.remove()
+
+        server = None
+        base_url = None
+        session_class = TestClientSession
+        if args.target == 'wsgi':
+            server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=_QuietHandler)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            base_url = f'http://127.0.0.1:{server.server_port}'
+            session_class = HTTPSession
+
+        samples = {name: [] for name in SCENARIOS}
+        errors = {name: 0 for name in SCENARIOS}
+        lock = threading.Lock()
+        budget = [args.requests]
+        deadline = time.perf_counter() + args.duration
+
+        def take_ticket():
+            if budget[0] is None:
+                return time.perf_counter() < deadline
+            with lock:
+                budget[0] -= 1
+                return budget[0] >= 0
+
+        def worker(n):
+            rng = random.Random(args.seed * 1000 + n)
+            session = session_class(app, base_url)
+            login = {'username': usernames[n % len(usernames)], 'password': SEED_PASSWORD}
+            session.post('/auth/login', login)
+            names, weights = list(SCENARIOS), list(SCENARIOS.values())
+            while take_ticket():
+                name = rng.choices(names, weights)[0]
+                start = time.perf_counter()
+                if name == 'index':
+                    status = session.get('/')
+                elif name == 'post':
+                    status = session.get(f'/post/{rng.choice(post_ids)}')
+                elif name == 'my_posts':
+                    status = session.get('/my_posts')
+                elif name == 'login':
+                    status = session.post('/auth/login', login)
+                else:
+                    status = session.post(f'/post/{rng.choice(post_ids)}',
+                                          {'content': f'load test comment {rng.random()}'})
+                elapsed = (time.perf_counter() - start) * 1000
+                with lock:
+                    samples[name].append(elapsed)
+                    if status >= 400:
+                        errors[name] += 1
+
+        run_started = time.perf_counter()
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(args.concurrency)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        wall = time.perf_counter() - run_started
+        if server is not None:
+            server.shutdown()
+
+    results = {}
+    print(f'{args.target}, {args.concurrency} workers, {wall:.1f}s')
+    print(f'  {"scenario":<10} {"requests":>8} {"errors":>6} {"req/s":>8} {"p50":>8} {"p95":>8} {"p99":>8}')
+    for name in list(SCENARIOS) + ['all']:
+        values = sorted(sum(samples.values(), []) if name == 'all' else samples[name])
+        errs = sum(errors.values()) if name == 'all' else errors[name]
+        row = {
+            'requests': len(values),
+            'errors': errs,
+            'throughput_rps': len(values) / wall,
+            'mean_ms': statistics.fmean(values) if values else 0.0,
+            'p50_ms': percentile(values, 50),
+            'p95_ms': percentile(values, 95),
+            'p99_ms': percentile(values, 99),
+        }
+        results[name] = row
+        print(f'  {name:<10} {row["requests"]:>8} {errs:>6} {row["throughput_rps"]:>8.1f} '
+              f'{row["p50_ms"]:>6.1f}ms {row["p95_ms"]:>6.1f}ms {row["p99_ms"]:>6.1f}ms')
+
+    if args.out:
+        with open(args.out, 'w') as fh:
+            json.dump({
+                'revision': git_revision(),
+                'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'settings': vars(args),
+                'wall_seconds': wall,
+                'scenarios': results,
+            }, fh, indent=2)
+        print(f'results written to {args.out}')
+
+
+if __name__ == '__main__':
+    main()
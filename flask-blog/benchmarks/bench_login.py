@@ -0,0 +1,71 @@
+"""Login throughput per core under different password hash settings.
+
+For each PASSWORD_HASH_METHOD (and once with the verified-login cache on),
+creates a user and POSTs /auth/login repeatedly from one thread, so the
+numbers are logins per second per core. "verify" is the bare
+check_password_hash cost.
+
+    python benchmarks/bench_login.py [--logins 30]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.security import check_password_hash  # noqa: E402
+from app import create_app, db  # noqa: E402
+from app.models import User  # noqa: E402
+from config import Config  # noqa: E402
+
+SETTINGS = [
+    ('scrypt (default)', 'scrypt', 0),
+    ('scrypt:16384:8:1', 'scrypt:16384:8:1', 0),
+    ('pbkdf2 (default)', 'pbkdf2', 0),
+    ('pbkdf2:sha256:600000', 'pbkdf2:sha256:600000', 0),
+    ('scrypt + login cache', 'scrypt', 60),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--logins', type=int, default=30)
+    args = parser.parse_args()
+
+    print(f'{args.logins} logins per setting, one thread')
+    print(f'  {"setting":<22} {"verify":>9} {"logins/s":>9}')
+    with tempfile.TemporaryDirectory() as tmp:
+        for i, (label, method, cache_ttl) in enumerate(SETTINGS):
+            class BenchConfig(Config):
+                SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(tmp, f'{i}.db')
+                WTF_CSRF_ENABLED = False
+                SECRET_KEY = 'bench'
+                PASSWORD_HASH_METHOD = method
+                LOGIN_CACHE_TTL = cache_ttl
+
+            app = create_app(BenchConfig)
+            with app.app_context():
+                db.create_all()
+                user = User(username='bench')
+                user.set_password('bench-password')
+                db.session.add(user)
+                db.session.commit()
+
+                start = time.perf_counter()
+                check_password_hash(user.password_hash, 'bench-password')
+                verify_ms = (time.perf_counter() - start) * 1000
+
+            client = app.test_client()
+            form = {'username': 'bench', 'password': 'bench-password'}
+            assert client.post('/auth/login', data=form).status_code == 302
+            start = time.perf_counter()
+            for _ in range(args.logins):
+                client.post('/auth/login', data=form)
+            rate = args.logins / (time.perf_counter() - start)
+            print(f'  {label:<22} {verify_ms:7.1f}ms {rate:9.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Keyset pagination benchmark.
+
+Grows a throwaway SQLite database from 1k to 1M posts and times the first,
+a middle and the last page of the anonymous index feed at each size. With
+keyset pagination the per-page latency should stay flat; the OFFSET column
+shows what the same deep page costs with LIMIT/OFFSET for comparison.
+
+    python benchmarks/bench_pagination.py [--sizes 1000,10000,100000,1000000]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db  # noqa: E402
+from app.models import User, Post  # noqa: E402
+from app.pagination import keyset_paginate, encode_cursor  # noqa: E402
+from config import Config  # noqa: E402
+
+PER_PAGE = 20
+BATCH = 50_000
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def grow(start, stop, author_id):
+    base = datetime(2020, 1, 1)
+    for lo in range(start, stop, BATCH):
+        rows = [
+            {
+                'title': f'Post {i}',
+                'content': f'Body of post {i}',
+                'timestamp': base + timedelta(seconds=i),
+                'author_id': author_id,
+                'is_private': i % 10 == 0,
+            }
+            for i in range(lo, min(lo + BATCH, stop))
+        ]
+        db.session.execute(db.insert(Post), rows)
+        db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='1000,10000,100000,1000000')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(',')]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        class BenchConfig(Config):
+            SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(tmp, 'bench.db')
+
+        app = create_app(BenchConfig)
+        with app.app_context():
+            db.create_all()
+            user = User(username='bench', password_hash='x')
+            db.session.add(user)
+            db.session.commit()
+
+            feed = Post.query.filter_by(is_private=False)
+            cols = (Post.timestamp, Post.id)
+
+            print(f"{'rows':>9} {'first ms':>9} {'middle ms':>10} {'last ms':>8} {'offset ms':>10}")
+            have = 0
+            for size in sizes:
+                grow(have, size, user.id)
+                have = size
+
+                # cursors pointing into the middle and the end of the feed
+                visible = feed.count()
+                mid_row = feed.order_by(Post.timestamp.desc(), Post.id.desc()).offset(visible // 2).first()
+                last_row = feed.order_by(Post.timestamp.asc(), Post.id.asc()).offset(PER_PAGE).first()
+                mid = encode_cursor('next', (mid_row.timestamp, mid_row.id))
+                last = encode_cursor('next', (last_row.timestamp, last_row.id))
+
+                first_ms = timed(lambda: keyset_paginate(feed, cols, per_page=PER_PAGE), args.repeat)
+                mid_ms = timed(lambda: keyset_paginate(feed, cols, cursor=mid, per_page=PER_PAGE), args.repeat)
+                last_ms = timed(lambda: keyset_paginate(feed, cols, cursor=last, per_page=PER_PAGE), args.repeat)
+                offset_ms = timed(
+                    lambda: feed.order_by(Post.timestamp.desc(), Post.id.desc())
+                    .offset(visible - PER_PAGE).limit(PER_PAGE).all(),
+                    max(1, args.repeat // 4),
+                )
+                print(f'{size:>9} {first_ms:>9.2f} {mid_ms:>10.2f} {last_ms:>8.2f} {offset_ms:>10.2f}')
+            db.session.remove()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Markdown render micro-benchmark: per-call pipeline vs reusable renderer.
+
+Renders documents of three sizes, uncached, three ways:
+
+  per-call  markdown.markdown() + bleach.clean() + bleach.linkify(), which
+            build a Markdown instance, Cleaner and Linker on every call
+  renderer  get_renderer().html(), reusing one reset() Markdown/Cleaner/Linker
+  batch     render_many('html', docs) over the whole list
+
+    python benchmarks/bench_render.py [--docs 200] [--repeat 5]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bleach  # noqa: E402
+import markdown  # noqa: E402
+from app.markdown_utils import (  # noqa: E402
+    ALLOWED_ATTRIBUTES, ALLOWED_TAGS, MARKDOWN_EXTENSION_CONFIGS, MARKDOWN_EXTENSIONS,
+    get_renderer, render_many,
+)
+
+COMMENT = 'Nice post, thanks! See https://example.com/{i} for **more**.'
+
+POST = '''Some intro text with a [link](https://example.com/{i}) and `inline code`.
+
+```python
+def handler_{i}(request):
+    return render(request, "post.html", {{"id": {i}}})
+```
+
+| col | value |
+|-----|-------|
+| a   | {i}   |
+
+Closing paragraph for post {i} with **bold** and _emphasis_.
+'''
+
+SIZES = {'comment': COMMENT, 'post': POST, 'long post': POST * 10}
+
+
+def per_call(text):
+    html = markdown.markdown(text, extensions=MARKDOWN_EXTENSIONS,
+                             extension_configs=MARKDOWN_EXTENSION_CONFIGS, output_format='html5')
+    cleaned = bleach.clean(html, tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRIBUTES, strip=True)
+    return bleach.linkify(cleaned)
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--docs', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    renderer = get_renderer()
+    print(f'per-document render cost, {args.docs} docs (median of {args.repeat})')
+    print(f'  {"size":<10} {"per-call":>10} {"renderer":>10} {"batch":>10}')
+    for name, template in SIZES.items():
+        docs = [template.format(i=i) for i in range(args.docs)]
+        assert [per_call(d) for d in docs[:5]] == [renderer.html(d) for d in docs[:5]]
+        before = timed(lambda: [per_call(d) for d in docs], args.repeat)
+        single = timed(lambda: [renderer.html(d) for d in docs], args.repeat)
+        batch = timed(lambda: render_many('html', docs), args.repeat)
+        per_doc = [t / args.docs * 1e6 for t in (before, single, batch)]
+        print(f'  {name:<10} ' + ' '.join(f'{us:8.0f}us' for us in per_doc)
+              + f'   ({before / batch:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
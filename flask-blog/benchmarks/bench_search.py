@@ -0,0 +1,86 @@
+"""Full-text search latency benchmark.
+
+Loads N posts of random prose (the FTS5 triggers index them as they go in)
+and times /search queries for common, rare, multi-word and prefix terms.
+
+    python benchmarks/bench_search.py [--posts 100000] [--repeat 20]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db  # noqa: E402
+from app.models import User, Post  # noqa: E402
+from app.search import search  # noqa: E402
+from config import Config  # noqa: E402
+
+BATCH = 10_000
+VOCABULARY = [f'word{i}' for i in range(5000)] + ['flask', 'sqlite', 'python', 'markdown', 'cache']
+QUERIES = {
+    'common term': 'flask',
+    'rare term': 'word4999',
+    'two terms': 'sqlite python',
+    'prefix': 'mark',
+    'no match': 'zzzzzz',
+}
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--posts', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    rng = random.Random(42)
+    # skew the distribution so a few words are very common
+    weights = [1.0] * (len(VOCABULARY) - 5) + [400.0] * 5
+
+    with tempfile.TemporaryDirectory() as tmp:
+        class BenchConfig(Config):
+            SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(tmp, 'bench.db')
+
+        app = create_app(BenchConfig)
+        with app.app_context():
+            db.create_all()
+            user = User(username='bench', password_hash='x')
+            db.session.add(user)
+            db.session.commit()
+
+            start = time.perf_counter()
+            for lo in range(0, args.posts, BATCH):
+                db.session.execute(db.insert(Post), [
+                    {
+                        'title': ' '.join(rng.choices(VOCABULARY, weights, k=6)),
+                        'content': ' '.join(rng.choices(VOCABULARY, weights, k=120)),
+                        'author_id': user.id,
+                        'is_private': i % 20 == 0,
+                    }
+                    for i in range(lo, min(lo + BATCH, args.posts))
+                ])
+                db.session.commit()
+            print(f'loaded and indexed {args.posts} posts in {time.perf_counter() - start:.1f} s')
+
+            print(f"{'query':<12} {'hits':>5} {'median ms':>10}")
+            for name, q in QUERIES.items():
+                hits = len(search(q)[0])
+                ms = timed(lambda: search(q), args.repeat)
+                print(f'{name:<12} {hits:>5} {ms:>10.2f}')
+            db.session.remove()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""Mixed read/write load against SQLite, with and without the tuned profile.
+
+Reader threads page through the public feed while writer threads add
+comments, for a fixed time, first with sqlite's defaults (rollback
+journal, synchronous=FULL) and then with the SQLITE_PRAGMAS profile from
+config.py. Reports reads/s, writes/s and "database is locked" errors.
+
+    python benchmarks/bench_sqlite.py [--seconds 5] [--readers 8] [--writers 2]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.exc import OperationalError  # noqa: E402
+from app import create_app, db  # noqa: E402
+from app.models import User, Post, Comment  # noqa: E402
+from app.pagination import keyset_paginate  # noqa: E402
+from config import Config  # noqa: E402
+
+# what connections got before the profile existed (pysqlite's own 5 s
+# busy timeout still applies)
+DEFAULTS = {'journal_mode': 'DELETE', 'synchronous': 'FULL'}
+
+
+def run(profile_name, pragmas, args, tmp):
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(tmp, f'{profile_name}.db')
+        SQLITE_PRAGMAS = pragmas
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+        user = User(username='bench', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        base = datetime(2020, 1, 1)
+        db.session.execute(db.insert(Post), [
+            {'title': f'Post {i}', 'content': 'Body', 'author_id': user.id,
+             'timestamp': base + timedelta(minutes=i), 'excerpt': '<p>Body</p>'}
+            for i in range(2000)
+        ])
+        db.session.commit()
+        user_id = user.id
+
+    counts = {'reads': 0, 'writes': 0, 'locked': 0}
+    lock = threading.Lock()
+    stop = time.perf_counter() + args.seconds
+
+    def bump(name):
+        with lock:
+            counts[name] += 1
+
+    def reader():
+        with app.app_context():
+            feed = Post.query.filter_by(is_private=False)
+            cursor = None
+            while time.perf_counter() < stop:
+                try:
+                    page = keyset_paginate(feed, (Post.timestamp, Post.id), cursor=cursor, per_page=20)
+                    cursor = page.next_cursor
+                    db.session.rollback()
+                    bump('reads')
+                except OperationalError:
+                    db.session.rollback()
+                    bump('locked')
+
+    def writer():
+        with app.app_context():
+            i = 0
+            while time.perf_counter() < stop:
+                i += 1
+                try:
+                    db.session.add(Comment(content=f'comment {i}', post_id=1 + i % 2000, author_id=user_id))
+                    db.session.commit()
+                    bump('writes')
+                except OperationalError:
+                    db.session.rollback()
+                    bump('locked')
+
+    threads = [threading.Thread(target=reader) for _ in range(args.readers)]
+    threads += [threading.Thread(target=writer) for _ in range(args.writers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    with app.app_context():
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+    print(f"{profile_name:<8} {counts['reads'] / args.seconds:>10.0f} {counts['writes'] / args.seconds:>10.0f} "
+          f"{counts['locked']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    args = parser.parse_args()
+
+    print(f'{args.readers} readers, {args.writers} writers, {args.seconds:g} s each')
+    print(f"{'profile':<8} {'reads/s':>10} {'writes/s':>10} {'locked':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        run('default', DEFAULTS, args, tmp)
+        run('tuned', Config.SQLITE_PRAGMAS, args, tmp)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Cold-start benchmark.
+
+Starts fresh interpreters and measures, in each:
+
+  import      `import app`
+  create_app  building the application
+  first req   the first GET / against an empty database
+
+    python benchmarks/bench_startup.py [--runs 10]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r'''
+import json, os, sys, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+from app import create_app, db
+from config import Config
+class BenchConfig(Config):
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + sys.argv[1]
+flask_app = create_app(BenchConfig)
+t2 = time.perf_counter()
+with flask_app.app_context():
+    db.create_all()
+t3 = time.perf_counter()
+response = flask_app.test_client().get('/')
+assert response.status_code == 200, response.status_code
+t4 = time.perf_counter()
+print(json.dumps({'import': t1 - t0, 'create_app': t2 - t1, 'first req': t4 - t3}))
+'''
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    samples = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(args.runs):
+            out = subprocess.run(
+                [sys.executable, '-c', PROBE, os.path.join(tmp, f'{i}.db')],
+                cwd=ROOT, capture_output=True, text=True, check=True,
+            ).stdout
+            for name, seconds in json.loads(out.strip().splitlines()[-1]).items():
+                samples.setdefault(name, []).append(seconds * 1000)
+
+    print(f'median of {args.runs} cold starts')
+    for name, values in samples.items():
+        print(f'  {name:<10} {statistics.median(values):8.1f} ms')
+    total = sum(statistics.median(v) for v in samples.values())
+    print(f'  {"total":<10} {total:8.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""Streamed vs buffered listings: time to first byte, total time and peak RSS.
+
+Seeds a throwaway database once, then for each mode starts a fresh
+interpreter that serves the app from a local WSGI server and fetches a large
+index page (INDEX_PAGE_SIZE = --page-size) --repeat times over HTTP:
+
+  buffered  render_template builds the whole page, then sends it
+  streamed  STREAM_LISTINGS: stream_template over a yield_per cursor
+
+Two memory figures per mode: "heap peak" is the peak of Python allocations
+(tracemalloc) during one extra request, "rss" the growth of the serving
+process's high-water mark (ru_maxrss) over a warmed-up baseline. Start-up
+can already have pushed the high-water mark past a single page, so at small
+sizes rss reads +0 in both modes; heap peak is the figure to compare.
+
+    python benchmarks/bench_stream.py [--posts 5000] [--page-size 2000] [--repeat 10]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app import create_app, db  # noqa: E402
+from app.seed import seed  # noqa: E402
+from config import Config  # noqa: E402
+
+PROBE = r'''
+import http.client, json, resource, sys, threading, time, tracemalloc
+from werkzeug.serving import WSGIRequestHandler, make_server
+from app import create_app
+from config import Config
+
+db_path, cache_dir, stream, page_size, repeat = sys.argv[1:6]
+
+class BenchConfig(Config):
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + db_path
+    RENDER_CACHE_DIR = cache_dir
+    STREAM_LISTINGS = stream == '1'
+    INDEX_PAGE_SIZE = int(page_size)
+
+class QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+app = create_app(BenchConfig)
+server = make_server('127.0.0.1', 0, app, request_handler=QuietHandler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+
+def fetch(path):
+    conn = http.client.HTTPConnection('127.0.0.1', server.server_port)
+    start = time.perf_counter()
+    conn.request('GET', path)
+    response = conn.getresponse()
+    response.read(1)
+    first = time.perf_counter()
+    size = 1 + len(response.read())
+    end = time.perf_counter()
+    conn.close()
+    assert response.status == 200, response.status
+    return (first - start) * 1000, (end - start) * 1000, size
+
+# warm up imports and templates on a small page before taking the baseline
+app.config['INDEX_PAGE_SIZE'] = 5
+fetch('/')
+app.config['INDEX_PAGE_SIZE'] = int(page_size)
+baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+samples = [fetch('/') for _ in range(int(repeat))]
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+tracemalloc.start()
+fetch('/')
+heap_peak = tracemalloc.get_traced_memory()[1]
+tracemalloc.stop()
+server.shutdown()
+print(json.dumps({'samples': samples, 'rss_kb': peak - baseline, 'heap_peak': heap_peak}))
+'''
+
+MODES = {'buffered': '0', 'streamed': '1'}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--posts', type=int, default=5000)
+    parser.add_argument('--page-size', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        cache_dir = os.path.join(tmp, 'render_cache')
+
+        class BenchConfig(Config):
+            SQLALCHEMY_DATABASE_URI = 'sqlite:///' + db_path
+            RENDER_CACHE_DIR = cache_dir
+
+        app = create_app(BenchConfig)
+        with app.app_context():
+            db.create_all()
+            started = time.perf_counter()
+            seed(args.users, args.posts, 0, private_ratio=0)
+            print(f'seeded {args.posts} posts in {time.perf_counter() - started:.1f}s; '
+                  f'GET / with {args.page_size} posts per page, {args.repeat} requests per mode')
+
+        print(f'  {"mode":<9} {"ttfb p50":>9} {"total p50":>10} {"size":>8} {"heap peak":>10} {"rss":>9}')
+        for mode, flag in MODES.items():
+            out = subprocess.run(
+                [sys.executable, '-c', PROBE, db_path, cache_dir, flag, str(args.page_size), str(args.repeat)],
+                cwd=ROOT, capture_output=True, text=True, check=True,
+            ).stdout
+            result = json.loads(out.strip().splitlines()[-1])
+            ttfb = statistics.median(s[0] for s in result['samples'])
+            total = statistics.median(s[1] for s in result['samples'])
+            size = result['samples'][0][2]
+            print(f'  {mode:<9} {ttfb:7.1f}ms {total:8.1f}ms {size / 1024:6.0f}KB '
+                  f'{result["heap_peak"] / 2**20:8.1f}MB {result["rss_kb"] / 1024:+7.1f}MB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""Listing queries: live post queries vs the materialized public timeline.
+
+Builds a throwaway database of --posts posts by --users authors, --private
+of them private (rows inserted directly, with one shared body and
+excerpt), plus one prolific author who wrote the newest --burst posts, and
+fills public_timeline with `flask timeline rebuild`'s rebuild(). Then times
+one page (INDEX_PAGE_SIZE rows, as the views fetch it) of:
+
+  index        anonymous /, newest public posts
+  index deep   the same, from a cursor halfway down the table
+  others       /others_posts for a typical author
+  others burst /others_posts for the prolific author, whose own posts
+               fill the top of the timeline and have to be skipped
+
+each built from app/routes.py's listing query, once against post
+(PUBLIC_TIMELINE off) and once through the timeline (on).
+
+    python benchmarks/bench_timeline.py [--posts 1000000] [--repeat 200]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app import create_app, db, timeline  # noqa: E402
+from app.models import User, Post, PublicTimeline  # noqa: E402
+from app.pagination import encode_cursor, keyset_paginate  # noqa: E402
+from app.routes import _listing_query  # noqa: E402
+from config import Config  # noqa: E402
+
+LIVE_KEY = (Post.timestamp, Post.id)
+
+
+def build(args):
+    started = time.perf_counter()
+    users = [{'id': i + 1, 'username': f'user{i + 1}', 'password_hash': 'x'} for i in range(args.users + 1)]
+    db.session.execute(db.insert(User), users)
+    prolific = args.users + 1
+    start = datetime(2024, 1, 1)
+    for first in range(0, args.posts, 10000):
+        db.session.execute(db.insert(Post), [{
+            'title': f'Post {i}',
+            'content': 'Body',
+            'excerpt': '<p>Body</p>',
+            'timestamp': start + timedelta(seconds=i),
+            'author_id': prolific if i >= args.posts - args.burst else i % args.users + 1,
+            'is_private': i % 100 < args.private * 100,
+        } for i in range(first, min(first + 10000, args.posts))])
+    db.session.commit()
+    built = time.perf_counter()
+    rows = timeline.rebuild(db.session.connection())
+    db.session.commit()
+    print(f'built {args.posts} posts in {built - started:.1f}s; '
+          f'timeline rebuilt with {rows} rows in {time.perf_counter() - built:.1f}s')
+    return prolific
+
+
+def queries(viewer, prolific, middle):
+    # name -> (live query, timeline query, cursor)
+    live, through = _listing_query(), timeline.timeline_listing(_listing_query())
+    public = Post.is_private == False  # noqa: E712
+    return {
+        'index': (live.filter(public), through, None),
+        'index deep': (live.filter(public), through, middle),
+        'others': (live.filter(public, Post.author_id != viewer),
+                   through.filter(PublicTimeline.author_id != viewer), None),
+        'others burst': (live.filter(public, Post.author_id != prolific),
+                         through.filter(PublicTimeline.author_id != prolific), None),
+    }
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--posts', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--private', type=float, default=0.1)
+    parser.add_argument('--burst', type=int, default=5000)
+    parser.add_argument('--page-size', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        class BenchConfig(Config):
+            SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(tmp, 'bench.db')
+            RENDER_CACHE_DIR = os.path.join(tmp, 'render_cache')
+
+        app = create_app(BenchConfig)
+        with app.test_request_context('/'):
+            db.create_all()
+            prolific = build(args)
+            mid = db.session.execute(db.select(Post.timestamp, Post.id).where(Post.id == args.posts // 2)).one()
+            middle = encode_cursor('next', tuple(mid))
+
+            print(f'  {"query":<13} {"live p50":>9} {"p95":>8} {"timeline p50":>13} {"p95":>8}')
+            for name, (live, through, cursor) in queries(1, prolific, middle).items():
+                def page(q, key):
+                    items = keyset_paginate(q, key, cursor=cursor, per_page=args.page_size).items
+                    db.session.rollback()
+                    return items
+                assert [r.id for r in page(live, LIVE_KEY)] == [r.id for r in page(through, timeline.KEY)], name
+                live_p50, live_p95 = timed(lambda: page(live, LIVE_KEY), args.repeat)
+                tl_p50, tl_p95 = timed(lambda: page(through, timeline.KEY), args.repeat)
+                print(f'  {name:<13} {live_p50:7.3f}ms {live_p95:6.3f}ms {tl_p50:11.3f}ms {tl_p95:6.3f}ms')
+
+
+if __name__ == '__main__':
+    main()
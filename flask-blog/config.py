@@ -1,26 +1,175 @@
 import os
-from dotenv import load_dotenv
+
+basedir = os.path.abspath(os.path.dirname(__file__))
+
 
 class Config:
-    load_dotenv()
-    basedir = os.path.abspath(os.path.dirname(__file__))
-
-    # SECRET_KEY = os.environ.get('SECRET_KEY') or 'you-will-never-guess'
-    SECRET_KEY = os.getenv('SECRET_KEY')
-    print(f"Loaded SECRET_KEY: {SECRET_KEY}")  # Debug line to verify loading
-    # SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///site.db'
-    # SQLALCHEMY_DATABASE_URI = os.getenv('SQLALCHEMY_DATABASE_URI') + os.path.join(basedir, 'site.db')
-    
-    # If environment variable contains a full URI use it, otherwise build a sqlite path.
-    env_uri = os.getenv('SQLALCHEMY_DATABASE_URI')
-    if env_uri and env_uri.strip() != '':
-        # allow providing full URI like "sqlite:///C:/path/site.db" or a prefix like "sqlite:///"
-        if env_uri.endswith('/') and env_uri.count('/') == 3:
-            SQLALCHEMY_DATABASE_URI = env_uri + os.path.join(basedir, 'site.db')
-        else:
-            SQLALCHEMY_DATABASE_URI = env_uri
-    else:
-        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(basedir, 'site.db')
-
-    print(f"Using SQLALCHEMY_DATABASE_URI: {SQLALCHEMY_DATABASE_URI}")  # Debug line to verify loading
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    # Defaults only: nothing here reads the environment. create_app() loads
+    # .env and applies Config.from_env() on top, so importing this module has
+    # no side effects and subclasses (tests, benchmarks) stay deterministic.
+    SECRET_KEY = None
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(basedir, 'site.db')
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # connection pool; sized for a threaded worker, ignored for in-memory sqlite
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': 10,
+        'max_overflow': 10,
+        'pool_timeout': 30,
+        'pool_pre_ping': False,  # sqlite connections don't go stale
+    }
+
+    # applied to every new sqlite connection (app/sqlite_profile.py); set to {} to
+    # keep sqlite's defaults (rollback journal, synchronous=FULL, no busy timeout)
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,  # negative means KiB: 64 MiB per connection
+        'temp_store': 'MEMORY',
+    }
+
+    # page sizes for the keyset-paginated post feeds
+    INDEX_PAGE_SIZE = 20
+    MY_POSTS_PAGE_SIZE = 20
+    OTHERS_POSTS_PAGE_SIZE = 20
+
+    # Page the anonymous index and /others_posts through the materialized
+    # public_timeline table instead of post (app/timeline.py). The table is
+    # kept up to date either way, so this can be switched at any time.
+    PUBLIC_TIMELINE = False
+
+    # comments inlined on a post page and returned per "load more" fragment
+    COMMENTS_PAGE_SIZE = 50
+
+    # Stream post listings (/, /my_posts, /others_posts) instead of rendering
+    # the whole page first: rows come off a server-side cursor STREAM_YIELD_PER
+    # at a time and the HTML goes out in ~STREAM_FLUSH_BYTES blocks. Streamed
+    # pages skip ETags and the page cache; worth it for large page sizes.
+    STREAM_LISTINGS = False
+    STREAM_YIELD_PER = 100
+    STREAM_FLUSH_BYTES = 4096
+
+    # /api/v1 collections: default and maximum ?limit=, and rows fetched per
+    # round trip while streaming a page
+    API_PAGE_SIZE = 50
+    API_MAX_PAGE_SIZE = 1000
+    API_FETCH_SIZE = 100
+
+    # maximum post / comment hits shown on /search
+    SEARCH_RESULTS = 20
+
+    # rendered Markdown kept on disk under RENDER_CACHE_DIR (default
+    # instance/render_cache); the oldest files are pruned past this size
+    RENDER_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+    # full-page cache for anonymous visitors: None (off), 'memory' or 'filesystem'.
+    # 'memory' keeps its pages and invalidation tags inside one process, so it
+    # is for single-process servers only: with several workers, a write seen
+    # by one leaves the others serving stale pages. Use 'filesystem' there.
+    PAGE_CACHE_BACKEND = None
+    PAGE_CACHE_TTL = 60
+    PAGE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+    # {% cache %} template fragments (app/template_cache.py): entries per
+    # process (0 = off) and the default lifetime in seconds. Compiled templates
+    # are kept under JINJA_BYTECODE_CACHE_DIR (default instance/jinja_cache).
+    FRAGMENT_CACHE_SIZE = 10000
+    FRAGMENT_CACHE_TTL = 300
+
+    # syndication feeds: entries per feed, and generated feeds kept per process
+    FEED_SIZE = 20
+    FEED_CACHE_SIZE = 256
+
+    # per-request timing: Server-Timing headers and /metrics (app/instrumentation.py)
+    INSTRUMENTATION_ENABLED = False
+    # with instrumentation on, dump a cProfile of any request slower than this
+    PROFILE_SLOW_REQUEST_MS = None
+
+    # password KDF: any werkzeug method, e.g. 'scrypt:16384:8:1' or
+    # 'pbkdf2:sha256:600000'; outdated hashes are upgraded on the next login
+    PASSWORD_HASH_METHOD = 'scrypt'
+    # seconds a verified login is remembered (0 = off), see app/passwords.py
+    LOGIN_CACHE_TTL = 0
+    LOGIN_CACHE_SIZE = 1024
+
+    # seconds a logged-in user's snapshot is served from memory (0 = query
+    # every request), see app/identity.py
+    USER_CACHE_TTL = 60
+    USER_CACHE_SIZE = 4096
+
+    # Optional read replica (app/db_routing.py): GET requests read from it,
+    # writes go to SQLALCHEMY_DATABASE_URI, and whoever wrote keeps reading
+    # the primary for READ_YOUR_WRITES_SECONDS, which should cover the lag.
+    READ_REPLICA_URI = None
+    READ_YOUR_WRITES_SECONDS = 5
+
+    # render Markdown for new posts/comments in the background: None (inline
+    # at commit), 'thread' or 'process'; workers default to the executor's own
+    RENDER_POOL = None
+    RENDER_POOL_WORKERS = None
+
+    # Group commit for comments (app/comment_queue.py): a writer thread inserts
+    # the comments that arrive within COMMENT_BATCH_WINDOW_MS of each other in
+    # one transaction; each POST still waits for its own commit. At most
+    # COMMENT_QUEUE_SIZE comments wait; beyond that a comment POST gets a 503.
+    COMMENT_GROUP_COMMIT = False
+    COMMENT_BATCH_WINDOW_MS = 2
+    COMMENT_BATCH_SIZE = 100
+    COMMENT_QUEUE_SIZE = 1000
+    COMMENT_COMMIT_TIMEOUT = 10
+
+    # build and exercise the Markdown/Pygments/bleach pipeline inside create_app
+    # (e.g. before gunicorn forks) instead of on the first request that needs it
+    MARKDOWN_WARMUP = False
+
+    # settings whose default is None, so their type can't be read off the default
+    _ENV_TYPES = {'PROFILE_SLOW_REQUEST_MS': float, 'RENDER_POOL_WORKERS': int}
+    # env vars that set a key inside one of the dicts above
+    _ENV_NESTED = {
+        'DB_POOL_SIZE': ('SQLALCHEMY_ENGINE_OPTIONS', 'pool_size'),
+        'DB_MAX_OVERFLOW': ('SQLALCHEMY_ENGINE_OPTIONS', 'max_overflow'),
+        'DB_POOL_TIMEOUT': ('SQLALCHEMY_ENGINE_OPTIONS', 'pool_timeout'),
+        'SQLITE_BUSY_TIMEOUT_MS': ('SQLITE_PRAGMAS', 'busy_timeout'),
+    }
+
+    @classmethod
+    def from_env(cls, environ=None):
+        """Return the settings the environment overrides, as a dict.
+
+        Every upper-case setting can be overridden by an env var of the same
+        name, unless a subclass sets it explicitly.
+        """
+        environ = os.environ if environ is None else environ
+        overridden = {name for klass in cls.__mro__ if klass is not Config and issubclass(klass, Config)
+                      for name in vars(klass)}
+        overrides = {}
+        for name in dir(Config):
+            if name.startswith('_') or not name.isupper() or name not in environ or name in overridden:
+                continue
+            raw = environ[name]
+            default = getattr(Config, name)
+            if isinstance(default, dict):
+                continue
+            if isinstance(default, bool):
+                value = raw.lower() in ('1', 'true', 'yes', 'on')
+            elif default is None:
+                value = cls._ENV_TYPES.get(name, str)(raw) if raw.strip() else None
+            else:
+                value = type(default)(raw)
+            overrides[name] = value
+
+        # a bare "sqlite:///" prefix means "the default file under that prefix"
+        uri = overrides.get('SQLALCHEMY_DATABASE_URI')
+        if uri is not None:
+            uri = uri.strip()
+            if not uri:
+                del overrides['SQLALCHEMY_DATABASE_URI']
+            elif uri.endswith('/') and uri.count('/') == 3:
+                overrides['SQLALCHEMY_DATABASE_URI'] = uri + os.path.join(basedir, 'site.db')
+
+        for env_name, (setting, key) in cls._ENV_NESTED.items():
+            if env_name in environ and setting not in overridden:
+                overrides.setdefault(setting, dict(getattr(cls, setting)))[key] = int(environ[env_name])
+        return overrides
@@ -1,7 +1,10 @@
 from app import create_app, db
+from app.migrations import upgrade
 
 app = create_app()
 
 with app.app_context():
     db.create_all()
-    print('Database tables created (or already exist).')
\ No newline at end of file
+    # a new file is already current; an existing one gets any missing migrations
+    applied = upgrade(db.engine)
+    print(f'Database tables created (or already exist); {len(applied)} migration(s) applied.')
@@ -1,27 +1,72 @@
 import pytest
+from contextlib import contextmanager
+from sqlalchemy import event
 from app import create_app, db
-from app.models import User
+from config import Config
 
 
-@pytest.fixture(scope='session')
-def app():
-    """Create application for testing."""
-    app = create_app()
-    app.config.update({
-        'TESTING': True,
-        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
-        'WTF_CSRF_ENABLED': False,
-        'SECRET_KEY': 'test-secret-key'
-    })
-    
-    yield app
+@pytest.fixture
+def make_app(tmp_path):
+    """Return ``make_app(**overrides)``, which builds a test app from a config class.
+
+    The settings are in place before create_app() binds the engine, so the
+    database is in memory unless overridden, and every on-disk cache lives
+    under tmp_path rather than instance/.
+    """
+    def factory(**overrides):
+        settings = {
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'WTF_CSRF_ENABLED': False,
+            'SECRET_KEY': 'test-secret-key',
+            'RENDER_CACHE_DIR': str(tmp_path / 'render_cache'),
+            'JINJA_BYTECODE_CACHE_DIR': str(tmp_path / 'jinja_cache'),
+            'PAGE_CACHE_DIR': str(tmp_path / 'page_cache'),
+            'PROFILE_DIR': str(tmp_path / 'profiles'),
+        }
+        settings.update(overrides)
+        return create_app(type('TestConfig', (Config,), settings))
+    return factory
 
 
 @pytest.fixture
-def _db(app):
-    """Create database for testing."""
+def config_overrides():
+    """Settings a test module needs on top of the defaults; override it in the module."""
+    return {}
+
+
+@pytest.fixture
+def app(make_app, config_overrides):
+    """Create a test app with its tables, inside a pushed app context."""
+    app = make_app(**config_overrides)
     with app.app_context():
         db.create_all()
-        yield db
+        yield app
         db.session.remove()
         db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    """Create a test client."""
+    return app.test_client()
+
+
+@pytest.fixture
+def query_counter(app):
+    """Count the SQL statements run inside a ``with query_counter() as q:`` block."""
+    @contextmanager
+    def counter():
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', record)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, 'before_cursor_execute', record)
+    return counter
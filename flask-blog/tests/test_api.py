@@ -0,0 +1,135 @@
+import base64
+from datetime import datetime, timedelta
+
+import pytest
+from app import db
+from app.models import User, Post, Comment
+
+
+@pytest.fixture
+def config_overrides():
+    """Use small API pages so a few posts span several."""
+    return {'API_PAGE_SIZE': 2, 'API_FETCH_SIZE': 1}
+
+
+@pytest.fixture
+def users(app):
+    alice, bob = User(username='alice'), User(username='bob')
+    alice.set_password('password')
+    bob.set_password('password')
+    db.session.add_all([alice, bob])
+    db.session.commit()
+    return alice, bob
+
+
+@pytest.fixture
+def posts(app, users):
+    alice, bob = users
+    start = datetime(2024, 1, 1)
+    posts = [Post(title=f'Post {i}', content=f'Body **{i}**', author_id=alice.id,
+                  timestamp=start + timedelta(minutes=i)) for i in range(3)]
+    posts.append(Post(title='Secret', content='Private body', author_id=alice.id,
+                      is_private=True, timestamp=start + timedelta(minutes=10)))
+    db.session.add_all(posts)
+    db.session.commit()
+    return posts
+
+
+def basic_auth(username, password='password'):
+    token = base64.b64encode(f'{username}:{password}'.encode()).decode()
+    return {'Authorization': f'Basic {token}'}
+
+
+def get(client, url, **kwargs):
+    # a fresh app context per request, so the user loaded for one request
+    # (kept on flask.g) doesn't leak into the next
+    with client.application.app_context():
+        return client.get(url, **kwargs)
+
+
+def test_posts_are_paginated_by_cursor(app, posts):
+    """Test that /api/v1/posts walks all public posts newest first."""
+    client = app.test_client()
+    first = client.get('/api/v1/posts').get_json()
+    assert [p['title'] for p in first['items']] == ['Post 2', 'Post 1']
+    assert first['items'][0]['author'] == 'alice'
+
+    second = client.get(f'/api/v1/posts?cursor={first["next_cursor"]}').get_json()
+    assert [p['title'] for p in second['items']] == ['Post 0']
+    assert second['next_cursor'] is None
+
+
+def test_private_posts_are_visible_to_their_author_only(app, posts):
+    """Test that private posts follow the site's visibility rules."""
+    client = app.test_client()
+    secret = posts[-1].id
+    assert get(client, f'/api/v1/posts/{secret}').status_code == 404
+    assert get(client, f'/api/v1/posts/{secret}', headers=basic_auth('bob')).status_code == 404
+    assert get(client, f'/api/v1/posts/{secret}/comments').status_code == 404
+
+    response = get(client, f'/api/v1/posts/{secret}', headers=basic_auth('alice'))
+    assert response.status_code == 200
+    assert response.get_json()['title'] == 'Secret'
+    listed = get(client, '/api/v1/posts?limit=10', headers=basic_auth('alice')).get_json()
+    assert 'Secret' in [p['title'] for p in listed['items']]
+
+    assert get(client, f'/api/v1/posts/{secret}', headers=basic_auth('alice', 'wrong')).status_code == 404
+
+
+def test_sparse_fieldsets_skip_content(app, posts, query_counter):
+    """Test that fields= limits the keys returned and the columns selected."""
+    client = app.test_client()
+    with query_counter() as statements:
+        data = client.get('/api/v1/posts?fields=id,title').get_json()
+    assert all(set(item) == {'id', 'title'} for item in data['items'])
+    assert not any('post.content' in s for s in statements)
+
+    single = client.get(f'/api/v1/posts/{posts[0].id}?fields=content_html').get_json()
+    assert single == {'content_html': '<p>Body <strong>0</strong></p>'}
+
+    response = client.get('/api/v1/posts?fields=id,password_hash')
+    assert response.status_code == 400
+    assert 'password_hash' in response.get_json()['message']
+
+
+def test_excerpt_field_reads_bodies_only_without_excerpt(app, users, posts, query_counter):
+    """Test that fields=excerpt_html selects the body only for rows lacking an excerpt."""
+    db.session.execute(db.insert(Post), [{'title': 'Old row', 'content': '**old** body',
+                                          'author_id': users[0].id, 'timestamp': datetime(2025, 1, 1)}])
+    db.session.commit()
+    client = app.test_client()
+    with query_counter() as statements:
+        data = get(client, '/api/v1/posts?fields=excerpt_html&limit=5').get_json()
+    assert data['items'][0] == {'excerpt_html': '<p><strong>old</strong> body</p>'}
+    assert data['items'][1] == {'excerpt_html': '<p>Body <strong>2</strong></p>'}
+    listing = [s for s in statements if 'FROM post' in s]
+    assert listing and all('post.content AS' not in s for s in listing)
+    assert 'CASE WHEN (post.excerpt IS NULL) THEN post.content' in listing[0]
+
+
+def test_comments_oldest_first(app, users, posts):
+    """Test that a post's comments are listed oldest first across pages."""
+    alice, bob = users
+    post = posts[0]
+    for i in range(3):
+        db.session.add(Comment(content=f'Comment {i}', post_id=post.id, author_id=bob.id,
+                               timestamp=datetime(2024, 2, 1) + timedelta(minutes=i)))
+    db.session.commit()
+
+    client = app.test_client()
+    first = client.get(f'/api/v1/posts/{post.id}/comments').get_json()
+    assert [c['content'] for c in first['items']] == ['Comment 0', 'Comment 1']
+    assert first['items'][0]['author'] == 'bob'
+    rest = client.get(f'/api/v1/posts/{post.id}/comments?cursor={first["next_cursor"]}').get_json()
+    assert [c['content'] for c in rest['items']] == ['Comment 2']
+
+
+def test_bad_requests_are_json(app, posts):
+    """Test that errors under /api/v1 are JSON."""
+    client = app.test_client()
+    for url, status in (('/api/v1/posts?cursor=nonsense', 400),
+                        ('/api/v1/posts?limit=many', 400),
+                        ('/api/v1/posts/9999', 404)):
+        response = client.get(url)
+        assert response.status_code == status
+        assert response.is_json
@@ -1,30 +1,8 @@
 import pytest
-from app import create_app, db
+from app import db
 from app.models import User
 
 
-@pytest.fixture
-def app():
-    """Create and configure a test app instance."""
-    app = create_app()
-    app.config['TESTING'] = True
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
-    app.config['WTF_CSRF_ENABLED'] = False  # Disable CSRF for testing
-    app.config['SECRET_KEY'] = 'test-secret-key'
-    
-    with app.app_context():
-        db.create_all()
-        yield app
-        db.session.remove()
-        db.drop_all()
-
-
-@pytest.fixture
-def client(app):
-    """Create a test client."""
-    return app.test_client()
-
-
 @pytest.fixture
 def runner(app):
     """Create a test CLI runner."""
@@ -164,3 +142,93 @@ def test_password_hashing(app):
         
         # Check password should fail with incorrect password
         assert user.check_password('wrongpassword') is False
+
+
+def test_hash_method_is_configurable(app):
+    """Test that set_password uses PASSWORD_HASH_METHOD."""
+    app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+    user = User(username='testuser')
+    user.set_password('mypassword')
+    assert user.password_hash.startswith('pbkdf2:sha256:1000$')
+    assert user.check_password('mypassword')
+
+
+def test_outdated_hash_is_upgraded_on_login(client, app):
+    """Test that a successful login rehashes with the configured parameters."""
+    app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+    user = User(username='testuser')
+    user.set_password('password123')
+    db.session.add(user)
+    db.session.commit()
+
+    app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:2000'
+    client.post('/auth/login', data={'username': 'testuser', 'password': 'wrong-password'})
+    assert db.session.get(User, user.id).password_hash.startswith('pbkdf2:sha256:1000$')
+
+    client.post('/auth/login', data={'username': 'testuser', 'password': 'password123'})
+    db.session.expire_all()
+    stored = db.session.get(User, user.id).password_hash
+    assert stored.startswith('pbkdf2:sha256:2000$')
+    assert db.session.get(User, user.id).check_password('password123')
+
+
+def test_canonical_method():
+    """Test that bare werkzeug method names compare equal to their full form."""
+    from app.passwords import canonical_method
+    assert canonical_method('scrypt') == 'scrypt:32768:8:1'
+    assert canonical_method('scrypt:16384') == 'scrypt:16384:8:1'
+    assert canonical_method('pbkdf2:sha256:600000') == 'pbkdf2:sha256:600000'
+
+
+def test_verified_login_cache(make_app):
+    """Test that repeated logins skip the KDF and a password change invalidates."""
+    from app.passwords import verify_login
+
+    app = make_app(LOGIN_CACHE_TTL=60)
+    with app.app_context():
+        db.create_all()
+        user = User(username='cached')
+        user.set_password('first-password')
+        db.session.add(user)
+        db.session.commit()
+        cache = app.extensions['login_cache']
+
+        assert verify_login(user, 'first-password')
+        assert verify_login(user, 'first-password')
+        assert not verify_login(user, 'wrong-password')
+        assert cache.stats()['hits'] == 1
+
+        user.set_password('second-password')
+        assert not verify_login(user, 'first-password')
+        assert verify_login(user, 'second-password')
+
+
+def test_user_loader_is_cached(client, app, query_counter):
+    """Test that authenticated requests don't query the user table each time."""
+    user = User(username='testuser')
+    user.set_password('password123')
+    db.session.add(user)
+    db.session.commit()
+    client.post('/auth/login', data={'username': 'testuser', 'password': 'password123'})
+
+    client.get('/my_posts')
+    with query_counter() as statements:
+        response = client.get('/my_posts')
+    assert b'testuser' in response.data
+    assert not [s for s in statements if 'FROM user' in s]
+
+
+def test_user_cache_invalidated_on_change(client, app):
+    """Test that committing a change to a user drops its cached snapshot."""
+    from app.identity import load_user
+    user = User(username='before')
+    user.set_password('password123')
+    db.session.add(user)
+    db.session.commit()
+
+    assert load_user(user.id).username == 'before'
+    user.username = 'after'
+    db.session.commit()
+    assert load_user(user.id).username == 'after'
+    assert load_user(user.id) == load_user(user.id)
+    assert not hasattr(load_user(user.id), '__dict__')
@@ -0,0 +1,109 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.comment_queue import QueueFull
+from app.models import User, Post, Comment
+
+
+@pytest.fixture
+def app(make_app, tmp_path):
+    """Create a test app on a database file with group commit for comments on."""
+    app = make_app(SQLALCHEMY_DATABASE_URI=f'sqlite:///{tmp_path / "blog.db"}',
+                   COMMENT_GROUP_COMMIT=True, COMMENT_BATCH_WINDOW_MS=200)
+    with app.app_context():
+        db.create_all()
+        alice = User(username='alice')
+        alice.set_password('password')
+        db.session.add(alice)
+        db.session.add(Post(title='Viral', content='Body', author=alice))
+        db.session.commit()
+    yield app
+    app.extensions['comment_queue'].shutdown()
+    with app.app_context():
+        db.engine.dispose()
+
+
+def _in_threads(fn, args):
+    results = [None] * len(args)
+
+    def run(i):
+        try:
+            results[i] = fn(*args[i])
+        except Exception as exc:
+            results[i] = exc
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(args))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_comment_post_waits_for_commit(app):
+    """Test that a queued comment is saved, counted and shown after the redirect."""
+    client = app.test_client()
+    client.post('/auth/login', data={'username': 'alice', 'password': 'password'})
+    response = client.post('/post/1', data={'content': 'Queued *hello*'}, follow_redirects=True)
+    assert response.status_code == 200
+    html = response.get_data(as_text=True)
+    assert 'Comment added successfully!' in html
+    assert 'Queued <em>hello</em>' in html
+    with app.app_context():
+        assert db.session.get(Post, 1).comment_count == 1
+    assert app.extensions['comment_queue'].stats()['committed'] == 1
+
+
+def test_concurrent_comments_share_transactions(app):
+    """Test that concurrent comments are committed in fewer transactions than comments."""
+    queue = app.extensions['comment_queue']
+    ids = _in_threads(queue.add, [(1, 1, f'Comment {i}') for i in range(20)])
+    assert all(isinstance(i, int) for i in ids) and len(set(ids)) == 20
+    assert queue.stats()['batches'] < 20
+    with app.app_context():
+        assert db.session.get(Post, 1).comment_count == 20
+
+
+def test_failed_comment_does_not_fail_its_batch(app):
+    """Test that each request gets its own result when one insert in a batch fails."""
+    queue = app.extensions['comment_queue']
+    results = _in_threads(queue.add, [(1, 1, 'Good'), (1, 1, None), (1, 1, 'Also good')])
+    assert isinstance(results[1], IntegrityError)
+    assert isinstance(results[0], int) and isinstance(results[2], int)
+    with app.app_context():
+        assert sorted(db.session.scalars(db.select(Comment.content))) == ['Also good', 'Good']
+    assert queue.stats()['failed'] == 1
+
+
+def test_full_queue_rejects_at_once(app, tmp_path):
+    """Test that comments beyond COMMENT_QUEUE_SIZE are refused while the writer is blocked."""
+    app.config.update(COMMENT_QUEUE_SIZE=1, COMMENT_BATCH_WINDOW_MS=0)
+    queue = app.extensions['comment_queue'] = type(app.extensions['comment_queue'])(app)
+    client = app.test_client()
+    client.post('/auth/login', data={'username': 'alice', 'password': 'password'})
+    blocker = sqlite3.connect(tmp_path / 'blog.db', timeout=0)
+    blocker.execute('BEGIN IMMEDIATE')  # hold the write lock
+    try:
+        first = threading.Thread(target=queue.add, args=(1, 1, 'First'))
+        first.start()
+        while queue.stats()['submitted'] < 1 or queue.stats()['pending']:
+            time.sleep(0.01)
+        time.sleep(0.1)  # the writer has taken it and waits for the lock
+        second = threading.Thread(target=queue.add, args=(1, 1, 'Second'))
+        second.start()
+        while queue.stats()['pending'] < 1:
+            time.sleep(0.01)
+        with pytest.raises(QueueFull):
+            queue.add(1, 1, 'Third')
+        assert client.post('/post/1', data={'content': 'Fourth'}).status_code == 503
+    finally:
+        blocker.rollback()
+        blocker.close()
+    first.join()
+    second.join()
+    assert queue.stats()['committed'] == 2
+    queue.shutdown()
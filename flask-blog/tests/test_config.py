@@ -0,0 +1,39 @@
+import sys
+from config import Config
+
+
+def test_from_env_coerces_types():
+    """Test that env overrides take the type of the default they replace."""
+    overrides = Config.from_env({
+        'INDEX_PAGE_SIZE': '5',
+        'INSTRUMENTATION_ENABLED': 'true',
+        'PROFILE_SLOW_REQUEST_MS': '250',
+        'DB_POOL_SIZE': '3',
+    })
+    assert overrides['INDEX_PAGE_SIZE'] == 5
+    assert overrides['INSTRUMENTATION_ENABLED'] is True
+    assert overrides['PROFILE_SLOW_REQUEST_MS'] == 250.0
+    assert overrides['SQLALCHEMY_ENGINE_OPTIONS']['pool_size'] == 3
+    assert Config.SQLALCHEMY_ENGINE_OPTIONS['pool_size'] == 10
+
+
+def test_from_env_sqlite_prefix():
+    """Test that a bare sqlite:/// prefix points at the default database file."""
+    uri = Config.from_env({'SQLALCHEMY_DATABASE_URI': 'sqlite:///'})['SQLALCHEMY_DATABASE_URI']
+    assert uri.startswith('sqlite:///') and uri.endswith('site.db')
+
+
+def test_subclass_settings_beat_env(make_app, monkeypatch):
+    """Test that settings a config subclass sets are not overridden by the env."""
+    monkeypatch.setenv('INDEX_PAGE_SIZE', '50')
+    assert make_app(INDEX_PAGE_SIZE=7).config['INDEX_PAGE_SIZE'] == 7
+
+
+def test_markdown_warmup(make_app, monkeypatch):
+    """Test that MARKDOWN_WARMUP builds the renderer inside create_app."""
+    from app import markdown_utils
+    monkeypatch.delattr(markdown_utils._local, 'renderer', raising=False)
+
+    make_app(MARKDOWN_WARMUP=True)
+    assert getattr(markdown_utils._local, 'renderer', None) is not None
+    assert 'pygments.lexers.python' in sys.modules
@@ -0,0 +1,99 @@
+import sqlite3
+
+import pytest
+from app import db
+from app.db_routing import sync_replica
+from app.models import User, Post
+
+
+@pytest.fixture
+def app(make_app, tmp_path):
+    """Create a test app with a primary and a replica SQLite file, in sync."""
+    app = make_app(SQLALCHEMY_DATABASE_URI=f'sqlite:///{tmp_path / "primary.db"}',
+                   READ_REPLICA_URI=f'sqlite:///{tmp_path / "replica.db"}')
+    with app.app_context():
+        db.create_all()
+        alice = User(username='alice')
+        alice.set_password('password')
+        db.session.add(alice)
+        db.session.add(Post(title='Synced post', content='Body', author=alice))
+        db.session.commit()
+        sync_replica()
+    yield app
+    app.extensions['read_replica'].dispose()
+    with app.app_context():
+        db.engine.dispose()
+
+
+def _add_post(app, title):
+    # written outside a request, so straight to the primary
+    with app.app_context():
+        post = Post(title=title, content='Body', author_id=1)
+        db.session.add(post)
+        db.session.commit()
+        return post.id
+
+
+def _replica_count(tmp_path, table):
+    with sqlite3.connect(tmp_path / 'replica.db') as conn:
+        return conn.execute(f'SELECT count(*) FROM "{table}"').fetchone()[0]
+
+
+def test_get_requests_read_from_replica(app):
+    """Test that listings show the replica's data until it is synced."""
+    client = app.test_client()
+    post_id = _add_post(app, 'Fresh post')
+    html = client.get('/').get_data(as_text=True)
+    assert 'Synced post' in html and 'Fresh post' not in html
+    assert client.get(f'/post/{post_id}').status_code == 404
+
+    result = app.test_cli_runner().invoke(args=['replica', 'sync'])
+    assert 'Replica synced.' in result.output
+    assert 'Fresh post' in client.get('/').get_data(as_text=True)
+
+
+def test_writer_reads_own_writes(app):
+    """Test that after a POST the same browser reads from the primary for a while."""
+    client = app.test_client()
+    client.post('/auth/login', data={'username': 'alice', 'password': 'password'})
+    response = client.post('/new_post', data={'title': 'Just written', 'content': 'Body'}, follow_redirects=True)
+    assert response.status_code == 200
+    assert 'Just written' in response.get_data(as_text=True)
+    assert 'Just written' in client.get('/').get_data(as_text=True)
+
+    # another visitor still reads the lagging replica
+    assert 'Just written' not in app.test_client().get('/').get_data(as_text=True)
+
+
+def test_without_window_writer_reads_replica(app):
+    """Test that with no read-your-writes window the redirect lands on the stale replica."""
+    app.config['READ_YOUR_WRITES_SECONDS'] = 0
+    client = app.test_client()
+    client.post('/auth/login', data={'username': 'alice', 'password': 'password'})
+    response = client.post('/new_post', data={'title': 'Just written', 'content': 'Body'})
+    assert client.get(response.headers['Location']).status_code == 404
+
+
+def test_register_writes_to_primary(app, tmp_path):
+    """Test that registration creates the user on the primary only."""
+    response = app.test_client().post('/auth/register', data={
+        'username': 'bob', 'password': 'password', 'password2': 'password'})
+    assert response.status_code == 302
+    with app.app_context():
+        assert db.session.scalar(db.select(User).filter_by(username='bob')) is not None
+    assert _replica_count(tmp_path, 'user') == 1
+
+
+def test_replica_reads_are_instrumented(make_app, tmp_path):
+    """Test that queries sent to the replica show up in Server-Timing."""
+    app = make_app(SQLALCHEMY_DATABASE_URI=f'sqlite:///{tmp_path / "primary.db"}',
+                   READ_REPLICA_URI=f'sqlite:///{tmp_path / "replica.db"}',
+                   INSTRUMENTATION_ENABLED=True)
+    with app.app_context():
+        db.create_all()
+        sync_replica()
+    header = app.test_client().get('/').headers['Server-Timing']
+    assert 'sql;desc="0 queries"' not in header
+    app.extensions['read_replica'].dispose()
+    with app.app_context():
+        db.engine.dispose()
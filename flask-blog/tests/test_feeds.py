@@ -0,0 +1,109 @@
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta
+
+import pytest
+from app import db
+from app.models import User, Post
+
+ATOM = '{http://www.w3.org/2005/Atom}'
+
+
+@pytest.fixture
+def config_overrides():
+    """Keep three entries per feed."""
+    return {'FEED_SIZE': 3}
+
+
+@pytest.fixture
+def posts(app):
+    alice, bob = User(username='alice'), User(username='bob')
+    alice.set_password('password')
+    bob.set_password('password')
+    db.session.add_all([alice, bob])
+    db.session.commit()
+    start = datetime(2024, 1, 1)
+    posts = [Post(title=f'Post *{i}*', content=f'Body **{i}**', author_id=(alice if i % 2 else bob).id,
+                  timestamp=start + timedelta(minutes=i)) for i in range(5)]
+    posts.append(Post(title='Secret', content='Hidden', author_id=alice.id, is_private=True,
+                      timestamp=start + timedelta(minutes=10)))
+    db.session.add_all(posts)
+    db.session.commit()
+    return posts
+
+
+def test_atom_feed(app, posts):
+    """Test that the Atom feed lists the newest public posts with rendered HTML."""
+    response = app.test_client().get('/feed.atom')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/atom+xml'
+    feed = ET.fromstring(response.data)
+    entries = feed.findall(f'{ATOM}entry')
+    assert [e.find(f'{ATOM}title').text for e in entries] == ['Post <em>4</em>', 'Post <em>3</em>', 'Post <em>2</em>']
+    assert entries[0].find(f'{ATOM}content').text == '<p>Body <strong>4</strong></p>'
+    assert entries[0].find(f'{ATOM}author/{ATOM}name').text == 'bob'
+
+
+def test_rss_feed_per_author(app, posts):
+    """Test that the per-author RSS feed only has that author's public posts."""
+    client = app.test_client()
+    response = client.get('/author/alice/feed.rss')
+    assert response.mimetype == 'application/rss+xml'
+    items = ET.fromstring(response.data).findall('channel/item')
+    assert [i.find('title').text for i in items] == ['Post 3', 'Post 1']
+    assert client.get('/author/nobody/feed.rss').status_code == 404
+
+
+def test_feed_is_cached_until_a_public_post_changes(app, posts):
+    """Test that the XML is reused, answered with 304, and rebuilt after an edit."""
+    client = app.test_client()
+    cache = app.extensions['feed_cache']
+    first = client.get('/feed.atom')
+    assert client.get('/feed.atom').data == first.data
+    assert cache.stats()['hits'] == 1
+    assert client.get('/feed.atom', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+
+    # a new private post doesn't change the feed
+    db.session.add(Post(title='Another secret', content='x', author_id=posts[0].author_id, is_private=True))
+    db.session.commit()
+    assert client.get('/feed.atom').headers['ETag'] == first.headers['ETag']
+
+    posts[3].content = 'Edited'
+    db.session.commit()
+    edited = client.get('/feed.atom')
+    assert edited.headers['ETag'] != first.headers['ETag']
+    assert b'Edited' in edited.data
+    assert cache.stats()['misses'] == 2
+
+
+def test_feed_queries_use_an_index(app, posts):
+    """Test that neither feed query scans the post table."""
+    from app.feeds import _public_posts
+    for author in (None, User.query.filter_by(username='alice').one()):
+        with app.test_request_context():
+            stmt = _public_posts(author)
+            compiled = stmt.compile(db.engine, compile_kwargs={'literal_binds': True})
+        plan = ' '.join(row[-1] for row in db.session.execute(db.text(f'EXPLAIN QUERY PLAN {compiled}')))
+        assert 'USING INDEX' in plan and 'TEMP B-TREE' not in plan, plan
+
+
+def test_hiding_a_post_is_never_a_304(app, posts):
+    """Test that feeds send no Last-Modified, so a hidden post can't hide behind If-Modified-Since."""
+    client = app.test_client()
+    response = client.get('/feed.atom')
+    assert 'Last-Modified' not in response.headers
+    posts[4].is_private = True
+    db.session.commit()
+    response = client.get('/feed.atom', headers={'If-Modified-Since': 'Fri, 01 Jan 2100 00:00:00 GMT'})
+    assert response.status_code == 200
+    titles = [e.find(f'{ATOM}title').text for e in ET.fromstring(response.data).findall(f'{ATOM}entry')]
+    assert 'Post <em>4</em>' not in titles
+
+
+def test_page_cache_keeps_feeds_per_host(app, posts):
+    """Test that a feed cached for one host is not served to another."""
+    app.config['PAGE_CACHE_BACKEND'] = 'memory'
+    client = app.test_client()
+    assert b'http://one.example/' in client.get('/feed.atom', base_url='http://one.example').data
+    response = client.get('/feed.atom', base_url='http://two.example')
+    assert response.headers['X-Page-Cache'] == 'MISS'
+    assert b'http://two.example/' in response.data and b'one.example' not in response.data
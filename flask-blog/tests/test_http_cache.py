@@ -0,0 +1,114 @@
+import pytest
+from datetime import datetime, timedelta
+from app import db
+from app.models import User, Post, Comment
+
+
+@pytest.fixture
+def post(app):
+    user = User(username='author')
+    user.set_password('password123')
+    db.session.add(user)
+    db.session.commit()
+    day_ago = datetime.utcnow() - timedelta(days=1)
+    post = Post(title='Cached', content='Body', author_id=user.id, timestamp=day_ago, updated_at=day_ago)
+    db.session.add(post)
+    db.session.commit()
+    return post
+
+
+def test_index_revalidates_with_etag(client, post):
+    """Test that a matching If-None-Match gets an empty 304."""
+    first = client.get('/')
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert 'Last-Modified' not in first.headers
+
+    again = client.get('/', headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.data == b''
+    assert again.headers['ETag'] == etag
+
+
+def test_new_post_changes_index_etag(client, app, post):
+    """Test that the ETag moves when the feed changes."""
+    etag = client.get('/').headers['ETag']
+    db.session.add(Post(title='Newer', content='Body', author_id=post.author_id))
+    db.session.commit()
+    response = client.get('/', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert b'Newer' in response.data
+
+
+def test_post_detail_revalidates_with_etag(client, app, post):
+    """Test ETag handling on a post page, including a new comment changing it."""
+    url = f'/post/{post.id}'
+    etag = client.get(url).headers['ETag']
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+
+    db.session.add(Comment(content='fresh', post_id=post.id, author_id=post.author_id))
+    db.session.commit()
+    response = client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert b'fresh' in response.data
+
+
+def test_post_detail_sends_no_last_modified(client, app, post):
+    """Test that an If-Modified-Since-only client sees the author's new post count."""
+    url = f'/post/{post.id}'
+    assert 'Last-Modified' not in client.get(url).headers
+    db.session.add(Post(title='Second', content='Body', author_id=post.author_id))
+    db.session.commit()
+    response = client.get(url, headers={'If-Modified-Since': 'Fri, 01 Jan 2100 00:00:00 GMT'})
+    assert response.status_code == 200
+    assert b'(2 posts)' in response.data
+
+
+def test_authors_new_post_changes_post_detail_etag(client, app, post):
+    """Test that the author's post count shown on a post page is part of its ETag."""
+    url = f'/post/{post.id}'
+    etag = client.get(url).headers['ETag']
+    db.session.add(Post(title='Second', content='Body', author_id=post.author_id))
+    db.session.commit()
+    response = client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert b'(2 posts)' in response.data
+
+
+def test_etag_varies_with_viewer(client, app, post):
+    """Test that an anonymous ETag never validates a logged-in page."""
+    anonymous = client.get(f'/post/{post.id}')
+    assert 'public' in anonymous.headers['Cache-Control']
+
+    client.post('/auth/login', data={'username': 'author', 'password': 'password123'})
+    client.get('/')  # consume the login flash message
+    response = client.get(f'/post/{post.id}', headers={'If-None-Match': anonymous.headers['ETag']})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != anonymous.headers['ETag']
+    assert 'private' in response.headers['Cache-Control']
+    assert 'Cookie' in response.headers['Vary']
+
+
+def test_pending_flash_is_never_a_304(client, app, post):
+    """Test that a page carrying a flash message is always rendered."""
+    etag = client.get('/').headers['ETag']
+    with client.session_transaction() as session:
+        session['_flashes'] = [('info', 'Hello there')]
+    response = client.get('/', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert b'Hello there' in response.data
+
+
+def test_post_detail_304_leaves_body_unread(client, app, post, query_counter):
+    """Test that revalidating a post page never loads the deferred post body."""
+    url = f'/post/{post.id}'
+    etag = client.get(url).headers['ETag']
+    with query_counter() as statements:
+        assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+    assert not [s for s in statements if 'post.content' in s]
+
+    post.content = 'Edited body'
+    db.session.commit()
+    response = client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert b'Edited body' in response.data
@@ -0,0 +1,84 @@
+import os
+import threading
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from app import db
+from app.instrumentation import _profiling
+from app.models import User, Post
+
+
+@pytest.fixture
+def config_overrides(tmp_path):
+    """Turn on instrumentation and profile every request, on a database file
+    that concurrent requests can share."""
+    return {'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "blog.db"}',
+            'INSTRUMENTATION_ENABLED': True, 'PROFILE_SLOW_REQUEST_MS': 0}
+
+
+def test_server_timing_header(client, app):
+    """Test that responses carry wall, SQL, template and Markdown timings."""
+    user = User(username='author', password_hash='x')
+    db.session.add(user)
+    db.session.commit()
+    db.session.add(Post(title='Timed', content='**body**', author_id=user.id))
+    db.session.commit()
+
+    header = client.get('/').headers['Server-Timing']
+    names = [part.split(';')[0].strip() for part in header.split(',')]
+    assert names == ['app', 'sql', 'tpl', 'md']
+    assert 'queries"' in header
+
+
+def test_metrics_endpoint(client):
+    """Test that /metrics exposes per-endpoint histograms in Prometheus format."""
+    client.get('/')
+    client.get('/')
+    body = client.get('/metrics').get_data(as_text=True)
+    assert '# TYPE blog_request_duration_seconds histogram' in body
+    assert 'blog_request_duration_seconds_count{endpoint="main.index"} 2' in body
+    assert 'blog_request_duration_seconds_bucket{endpoint="main.index",le="+Inf"} 2' in body
+    assert 'blog_render_cache_hits_total' in body
+
+
+def test_slow_requests_are_profiled(client, app):
+    """Test that a request over the threshold leaves a cProfile dump."""
+    client.get('/')
+    dumps = os.listdir(app.config['PROFILE_DIR'])
+    assert any(name.endswith('.prof') and 'main.index' in name for name in dumps)
+
+
+def test_overlapping_requests_share_one_profiler(app):
+    """Test that concurrent requests all succeed while only one at a time is profiled."""
+    statuses = []
+
+    def browse():
+        client = app.test_client()
+        for _ in range(10):
+            statuses.append(client.get('/').status_code)
+
+    threads = [threading.Thread(target=browse) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert statuses == [200] * 80
+    assert os.listdir(app.config['PROFILE_DIR'])
+    assert not _profiling.locked()
+
+
+def test_failed_query_keeps_timer_stack_balanced(app):
+    """Test that a statement that raises does not leave its start time behind."""
+    with db.engine.connect() as conn:
+        with pytest.raises(OperationalError):
+            conn.execute(text('SELECT * FROM missing_table'))
+        assert conn.info['query_started'] == []
+        conn.execute(text('SELECT 1'))
+        assert conn.info['query_started'] == []
+
+
+def test_instrumentation_is_opt_in(make_app):
+    """Test that the default config registers no /metrics route."""
+    app = make_app()
+    assert 'metrics' not in app.view_functions
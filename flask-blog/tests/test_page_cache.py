@@ -0,0 +1,125 @@
+import pytest
+from flask.signals import before_render_template
+from app import db
+from app.models import User, Post, Comment
+from app.page_cache import MemoryBackend, page_cache
+
+
+@pytest.fixture(params=['memory', 'filesystem'])
+def config_overrides(request):
+    """Run every test against both page cache backends."""
+    return {'PAGE_CACHE_BACKEND': request.param}
+
+
+@pytest.fixture
+def app(app, config_overrides):
+    """Start each test with zeroed cache stats (naming config_overrides keeps
+    its params visible through this override)."""
+    page_cache.reset_stats()
+    return app
+
+
+@pytest.fixture
+def posts(app):
+    user = User(username='author')
+    user.set_password('password123')
+    db.session.add(user)
+    db.session.commit()
+    posts = [Post(title=f'Post {i}', content='Body', author_id=user.id) for i in range(2)]
+    db.session.add_all(posts)
+    db.session.commit()
+    return posts
+
+
+def _cache_state(client, url):
+    return client.get(url).headers.get('X-Page-Cache')
+
+
+def test_anonymous_pages_are_cached(client, posts):
+    """Test that a repeated anonymous GET is served from the cache."""
+    assert _cache_state(client, '/') == 'MISS'
+    assert _cache_state(client, '/') == 'HIT'
+    assert page_cache.stats()['hit_rate'] == 0.5
+
+
+def test_logged_in_pages_are_not_cached(client, posts):
+    """Test that authenticated requests bypass the cache."""
+    client.post('/auth/login', data={'username': 'author', 'password': 'password123'})
+    client.get('/')  # consume the login flash message
+    assert _cache_state(client, '/') is None
+    assert _cache_state(client, '/') is None
+
+
+def test_cache_hit_still_answers_304(client, posts):
+    """Test that a cached page revalidates against its stored ETag."""
+    etag = client.get('/').headers['ETag']
+    response = client.get('/', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.headers['X-Page-Cache'] == 'HIT'
+
+
+def test_comment_invalidates_only_its_pages(client, posts):
+    """Test that a comment makes its post page and the feed stale, not other posts."""
+    first, second = posts
+    for url in ('/', f'/post/{first.id}', f'/post/{second.id}'):
+        client.get(url)
+
+    db.session.add(Comment(content='new comment', post_id=first.id, author_id=first.author_id))
+    db.session.commit()
+
+    assert _cache_state(client, f'/post/{first.id}') == 'MISS'
+    assert _cache_state(client, '/') == 'MISS'
+    assert _cache_state(client, f'/post/{second.id}') == 'HIT'
+
+
+def test_new_posts_invalidate_the_feed_head(client, posts):
+    """Test that public posts refresh the index and private ones don't."""
+    client.get('/')
+    client.get(f'/post/{posts[0].id}')
+
+    db.session.add(Post(title='Secret', content='Body', author_id=posts[0].author_id, is_private=True))
+    db.session.commit()
+    assert _cache_state(client, '/') == 'HIT'
+
+    db.session.add(Post(title='Fresh', content='Body', author_id=posts[0].author_id))
+    db.session.commit()
+    response = client.get('/')
+    assert response.headers['X-Page-Cache'] == 'MISS'
+    assert b'Fresh' in response.data
+    # the author's post pages show their post count
+    response = client.get(f'/post/{posts[0].id}')
+    assert response.headers['X-Page-Cache'] == 'MISS'
+    assert b'(4 posts)' in response.data
+
+
+def test_write_during_render_is_not_cached(client, app, posts):
+    """Test that a page whose tags are bumped while it renders is not stored as fresh."""
+    post_id = posts[0].id
+
+    def concurrent_write(sender, **extra):
+        # as if another request's comment committed while this page rendered
+        page_cache.invalidate(f'post:{post_id}')
+
+    with before_render_template.connected_to(concurrent_write, app):
+        assert _cache_state(client, f'/post/{post_id}') == 'MISS'
+    assert _cache_state(client, f'/post/{post_id}') == 'MISS'
+    assert _cache_state(client, f'/post/{post_id}') == 'HIT'
+
+
+def test_entries_expire(client, app, posts):
+    """Test that entries are not served past their TTL."""
+    app.config['PAGE_CACHE_TTL'] = -1
+    client.get('/')
+    assert _cache_state(client, '/') == 'MISS'
+
+
+def test_memory_backend_evicts_least_recently_used():
+    """Test that the memory backend stays under its byte budget."""
+    backend = MemoryBackend(max_bytes=100)
+    backend.set('a', 'A', ttl=60, size=40)
+    backend.set('b', 'B', ttl=60, size=40)
+    backend.get('a')
+    backend.set('c', 'C', ttl=60, size=40)
+    assert backend.get('b') is None
+    assert backend.get('a') == 'A'
+    assert backend.evictions == 1
@@ -0,0 +1,106 @@
+import pytest
+from datetime import datetime, timedelta
+from app import db
+from app.models import User, Post
+from app.pagination import keyset_paginate, keyset_stream, encode_cursor, decode_cursor, InvalidCursor
+
+
+@pytest.fixture
+def config_overrides():
+    """Use small index pages so ten posts span several."""
+    return {'INDEX_PAGE_SIZE': 3}
+
+
+@pytest.fixture
+def posts(app):
+    """Create 10 public posts, some sharing a timestamp."""
+    user = User(username='author')
+    user.set_password('password')
+    db.session.add(user)
+    db.session.commit()
+
+    base = datetime(2024, 1, 1)
+    for i in range(10):
+        db.session.add(Post(
+            title=f'Post {i}',
+            content=f'Content {i}',
+            author_id=user.id,
+            timestamp=base + timedelta(minutes=i // 2),
+        ))
+    db.session.commit()
+    return Post.query.order_by(Post.timestamp.desc(), Post.id.desc()).all()
+
+
+def test_cursor_round_trip():
+    """Test that cursors decode back to the values they were built from."""
+    ts = datetime(2024, 5, 6, 7, 8, 9, 123)
+    token = encode_cursor('next', (ts, 42))
+    assert decode_cursor(token) == ('next', (ts, 42))
+
+
+@pytest.mark.parametrize('token', ['garbage', 'e30', encode_cursor('sideways', (datetime(2024, 1, 1), 1))])
+def test_invalid_cursor(token):
+    """Test that malformed cursors are rejected."""
+    with pytest.raises(InvalidCursor):
+        decode_cursor(token)
+
+
+def test_walk_forward_and_back(app, posts):
+    """Test that next/prev cursors visit every post exactly once, in order."""
+    cols = (Post.timestamp, Post.id)
+    pages = [keyset_paginate(Post.query, cols, per_page=3)]
+    assert pages[0].prev_cursor is None
+    while pages[-1].next_cursor:
+        pages.append(keyset_paginate(Post.query, cols, cursor=pages[-1].next_cursor, per_page=3))
+
+    assert [p.id for page in pages for p in page] == [p.id for p in posts]
+    assert [len(page) for page in pages] == [3, 3, 3, 1]
+
+    # walking back from the last page returns the same pages
+    back = [pages[-1]]
+    while back[-1].prev_cursor:
+        back.append(keyset_paginate(Post.query, cols, cursor=back[-1].prev_cursor, per_page=3))
+    assert [[p.id for p in page] for page in reversed(back)] == [[p.id for p in page] for page in pages]
+
+
+def test_index_is_paginated(client, posts):
+    """Test that the index only renders one page and links to the next."""
+    response = client.get('/')
+    assert response.status_code == 200
+    assert b'Post 9' in response.data
+    assert b'Post 6' not in response.data
+    assert b'Older posts' in response.data
+
+
+def test_index_rejects_bad_cursor(client, posts):
+    """Test that an unreadable cursor is a client error."""
+    response = client.get('/?cursor=not-a-cursor')
+    assert response.status_code == 400
+
+
+def test_streamed_pages_match(app, posts):
+    """Test that streamed pages have the rows and cursors of keyset_paginate."""
+    cols = (Post.timestamp, Post.id)
+    cursor = None
+    while True:
+        expected = keyset_paginate(Post.query, cols, cursor=cursor, per_page=3)
+        streamed = keyset_stream(Post.query, cols, cursor=cursor, per_page=3, yield_per=2)
+        assert [p.id for p in streamed] == [p.id for p in expected]
+        assert (streamed.next_cursor, streamed.prev_cursor) == (expected.next_cursor, expected.prev_cursor)
+        if not expected.next_cursor:
+            break
+        cursor = expected.next_cursor
+
+
+def test_index_streams(app, client, posts):
+    """Test that STREAM_LISTINGS sends the index as a streamed response."""
+    app.config['STREAM_LISTINGS'] = True
+    app.config['STREAM_FLUSH_BYTES'] = 256
+    response = client.get('/')
+    assert response.is_streamed
+    assert response.headers.get('ETag') is None
+    chunks = list(response.response)
+    assert len(chunks) > 1
+    body = b''.join(chunks).decode()
+    assert 'Post 9' in body and 'Post 6' not in body
+    assert 'Older posts' in body and 'Newer posts' not in body
@@ -1,30 +1,9 @@
 import pytest
-from app import create_app, db
+from app import db
+from app.markdown_utils import excerpt_source
 from app.models import User, Post, Comment
 
 
-@pytest.fixture
-def app():
-    """Create and configure a test app instance."""
-    app = create_app()
-    app.config['TESTING'] = True
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
-    app.config['WTF_CSRF_ENABLED'] = False  # Disable CSRF for testing
-    app.config['SECRET_KEY'] = 'test-secret-key'
-    
-    with app.app_context():
-        db.create_all()
-        yield app
-        db.session.remove()
-        db.drop_all()
-
-
-@pytest.fixture
-def client(app):
-    """Create a test client."""
-    return app.test_client()
-
-
 @pytest.fixture
 def auth_client(client, app):
     """Create an authenticated test client."""
@@ -225,3 +204,300 @@ def test_post_markdown_rendering(client, app):
     assert response.status_code == 200
     # Check that markdown is rendered (will vary based on your markdown setup)
     assert b'Markdown Test' in response.data
+
+
+def test_post_excerpt_is_stored(client, app):
+    """Test that listings read an excerpt rendered when the post was saved."""
+    with app.app_context():
+        user = User(username='author')
+        user.set_password('password')
+        db.session.add(user)
+        db.session.commit()
+
+        content = 'Intro paragraph.\n\n```python\n' + 'print("hi")\n' * 60 + '```\n\nLast bit.'
+        post = Post(title='Excerpt Test', content=content, author_id=user.id, is_private=False)
+        db.session.add(post)
+        db.session.commit()
+
+        # the cut never lands inside the fenced code block
+        assert post.excerpt.startswith('<p>Intro paragraph.</p>')
+        assert '<pre' not in post.excerpt
+        assert 'Last bit' not in post.excerpt
+
+    response = client.get('/')
+    assert b'Intro paragraph.' in response.data
+
+
+@pytest.mark.parametrize('lead, expected', [
+    ('Read [' + 'the docs ' * 40 + '](https://example.com/a_b) now', 'Read …'),
+    ('Run `' + 'make test ' * 40 + '` first', 'Run …'),
+    ('Some **' + 'bold ' * 80 + '** text', 'Some …'),
+    ('Some __' + 'bold ' * 80 + '__ text', 'Some …'),
+    ('A **short** and *plain* lead ' + 'word ' * 80, 'A **short** and *plain* lead word'),
+])
+def test_excerpt_never_cuts_inside_markup(lead, expected):
+    """Test that a long first block is cut before any link, code span or emphasis it would split."""
+    assert excerpt_source(lead, 100).startswith(expected)
+
+
+@pytest.mark.parametrize('lead', [
+    '**' + 'bold ' * 80 + '**',
+    '__' + 'bold ' * 80 + '__',
+    '***' + 'both ' * 80 + '***',
+    '[' + 'one long link ' * 30 + '](https://example.com)',
+    '1. **' + 'bold ' * 80 + '**',
+])
+def test_excerpt_falls_back_to_plain_text(lead):
+    """Test that a block that is all one markup span becomes a plain-text excerpt."""
+    source = excerpt_source(lead, 100)
+    assert len(source) > 50 and source.endswith(' …')
+    assert not set('*_[]()') & set(source)
+    assert source[0].isalpha()
+
+
+@pytest.mark.parametrize('block, expected', [
+    ('1. ' + 'a' * 400, '1. ' + 'a' * 97),
+    ('a' * 400, 'a' * 100),
+    ('*' * 400, '\\*' * 100),
+    ('[' * 400, '\\[' * 100),
+    ('```\n' + 'x = 1; ' * 100 + '\n```', '```\n' + ('x = 1; ' * 100)[:100] + '\n```'),
+])
+def test_excerpt_is_never_empty(block, expected):
+    """Test that long words, markup-only blocks and long code lines still leave an excerpt."""
+    assert excerpt_source(block, 100).startswith(expected)
+
+
+def test_backfill_excerpts_command(app):
+    """Test that the backfill command fills excerpts missing from old rows."""
+    with app.app_context():
+        user = User(username='author')
+        user.set_password('password')
+        db.session.add(user)
+        db.session.commit()
+        db.session.execute(db.insert(Post), [
+            {'title': f'Old {i}', 'content': f'**old** post {i}', 'author_id': user.id}
+            for i in range(3)
+        ])
+        db.session.commit()
+        assert Post.query.filter(Post.excerpt.is_(None)).count() == 3
+
+    result = app.test_cli_runner().invoke(args=['backfill-excerpts'])
+    assert 'Backfilled 3 excerpts' in result.output
+
+    with app.app_context():
+        assert Post.query.filter(Post.excerpt.is_(None)).count() == 0
+        assert '<strong>old</strong>' in Post.query.first().excerpt
+
+
+def _add_posts_with_comments(user, count):
+    # every post gets its own author so an identity-map hit can't hide a lazy load
+    start = Post.query.count()
+    for i in range(start, start + count):
+        author = User(username=f'writer{i}', password_hash='x')
+        db.session.add(author)
+        db.session.flush()
+        post = Post(title=f'Post {i}', content=f'Content {i}', author_id=author.id, is_private=False)
+        db.session.add(post)
+        db.session.flush()
+        for j in range(3):
+            db.session.add(Comment(content=f'Comment {j}', post_id=post.id, author_id=user.id))
+    db.session.commit()
+
+
+def test_index_query_count_does_not_grow(client, app, query_counter):
+    """Test that the index issues the same number of queries for 2 or 12 posts."""
+    user = User(username='author')
+    user.set_password('password')
+    db.session.add(user)
+    db.session.commit()
+
+    _add_posts_with_comments(user, 2)
+    with query_counter() as few:
+        client.get('/')
+
+    _add_posts_with_comments(user, 10)
+    with query_counter() as many:
+        response = client.get('/')
+
+    assert b'3 comments' in response.data
+    assert len(many) == len(few)
+
+
+def test_post_detail_query_count_does_not_grow(client, app, query_counter):
+    """Test that comment authors are loaded with the comments, not one by one."""
+    user = User(username='author')
+    user.set_password('password')
+    db.session.add(user)
+    db.session.commit()
+    _add_posts_with_comments(user, 1)
+    post = Post.query.first()
+
+    others = []
+    for i in range(5):
+        other = User(username=f'reader{i}', password_hash='x')
+        db.session.add(other)
+        others.append(other)
+    db.session.commit()
+
+    with query_counter() as few:
+        client.get(f'/post/{post.id}')
+
+    for other in others:
+        db.session.add(Comment(content='more', post_id=post.id, author_id=other.id))
+    db.session.commit()
+    with query_counter() as many:
+        client.get(f'/post/{post.id}')
+
+    assert len(many) == len(few)
+
+
+def test_counters_follow_inserts_and_deletes(app):
+    """Test that comment and post counts are kept in the same transaction."""
+    user = User(username='author')
+    user.set_password('password')
+    db.session.add(user)
+    db.session.commit()
+    post = Post(title='Counted', content='body', author_id=user.id)
+    db.session.add(post)
+    db.session.commit()
+    assert user.post_count == 1
+    assert post.comment_count == 0 and post.last_comment_at is None
+
+    comments = [Comment(content=f'c{i}', post_id=post.id, author_id=user.id) for i in range(3)]
+    db.session.add_all(comments)
+    db.session.commit()
+    assert post.comment_count == 3
+    assert post.last_comment_at == max(c.timestamp for c in comments)
+
+    db.session.delete(comments[-1])
+    db.session.commit()
+    assert post.comment_count == 2
+    assert post.last_comment_at == max(c.timestamp for c in comments[:2])
+
+    db.session.add(Comment(content='rolled back', post_id=post.id, author_id=user.id))
+    db.session.flush()
+    db.session.rollback()
+    assert post.comment_count == 2
+
+
+def test_repair_counts_command(app):
+    """Test that repair-counts recomputes counters that drifted."""
+    user = User(username='author')
+    user.set_password('password')
+    db.session.add(user)
+    db.session.commit()
+    _add_posts_with_comments(user, 2)
+    # bulk deletes skip the mapper events, so the counters drift
+    db.session.query(Comment).filter(Comment.content == 'Comment 0').delete()
+    db.session.execute(db.update(User).values(post_count=0))
+    db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['repair-counts'])
+    assert 'Fixed counts on 2 posts and 2 users' in result.output
+    assert [p.comment_count for p in Post.query] == [2, 2]
+    assert [p.author.post_count for p in Post.query] == [1, 1]
+    assert db.session.get(User, user.id).post_count == 0
+
+
+def test_comments_are_paginated(client, app):
+    """Test that post_detail inlines one comment page and the fragment serves the rest."""
+    app.config['COMMENTS_PAGE_SIZE'] = 3
+    user = User(username='author')
+    user.set_password('password')
+    db.session.add(user)
+    db.session.commit()
+    post = Post(title='Busy', content='body', author_id=user.id)
+    db.session.add(post)
+    db.session.commit()
+    db.session.add_all(Comment(content=f'reply number {i:02d}', post_id=post.id, author_id=user.id)
+                       for i in range(7))
+    db.session.commit()
+
+    html = client.get(f'/post/{post.id}').get_data(as_text=True)
+    assert 'Comments (7)' in html
+    assert 'reply number 02' in html and 'reply number 03' not in html
+    assert 'data-fragment=' in html
+
+    seen = []
+    url = f'/post/{post.id}/comments?format=json'
+    while url:
+        data = client.get(url).get_json()
+        seen += [c['html'] for c in data['comments']]
+        assert data['html'].count('class="comment"') == len(data['comments'])
+        url = data['next_cursor'] and f'/post/{post.id}/comments?format=json&cursor={data["next_cursor"]}'
+    assert len(seen) == 7
+    assert 'reply number 06' in seen[-1]
+
+    fragment = client.get(f'/post/{post.id}/comments').get_data(as_text=True)
+    assert '<html' not in fragment and 'reply number 00' in fragment
+    assert client.get(f'/post/{post.id}/comments?cursor=garbage').status_code == 400
+
+
+def test_private_post_comments_are_hidden(client, app):
+    """Test that the comment fragment of a private post is a 404 for others."""
+    user = User(username='author')
+    user.set_password('password')
+    db.session.add(user)
+    db.session.commit()
+    post = Post(title='Secret', content='body', author_id=user.id, is_private=True)
+    db.session.add(post)
+    db.session.commit()
+    assert client.get(f'/post/{post.id}/comments').status_code == 404
+
+
+def test_listings_do_not_load_post_bodies(client, app, query_counter):
+    """Test that listings read post bodies only for rows without a stored excerpt."""
+    with app.app_context():
+        user = User(username='author')
+        user.set_password('password')
+        db.session.add(user)
+        db.session.commit()
+        db.session.add(Post(title='Stored excerpt', content='Body ' * 200, author_id=user.id))
+        # an old row from before excerpts were stored
+        db.session.execute(db.insert(Post), [{'title': 'Old row', 'content': '**old** body', 'author_id': user.id}])
+        db.session.commit()
+
+    with query_counter() as statements:
+        response = client.get('/')
+    assert b'Stored excerpt' in response.data
+    assert b'<strong>old</strong> body' in response.data
+    listing = [s for s in statements if 'FROM post' in s]
+    assert len(listing) == 1
+    assert 'CASE WHEN (post.excerpt IS NULL) THEN post.content' in listing[0]
+
+
+def test_post_content_is_deferred(app):
+    """Test that Post.content is only loaded on access or when undeferred."""
+    with app.app_context():
+        user = User(username='author')
+        user.set_password('password')
+        db.session.add(user)
+        db.session.commit()
+        db.session.add(Post(title='Deferred', content='The body', author_id=user.id))
+        db.session.commit()
+        db.session.expunge_all()
+
+        post = Post.query.first()
+        assert 'content' not in db.inspect(post).dict
+        assert post.content == 'The body'
+
+
+@pytest.mark.parametrize('excerpt', ['<p>Stored</p>', None])
+def test_metadata_update_does_not_load_content(app, query_counter, excerpt):
+    """Test that changing a post's title or privacy never reads its deferred body."""
+    with app.app_context():
+        user = User(username='author')
+        user.set_password('password')
+        db.session.add(user)
+        db.session.commit()
+        db.session.execute(db.insert(Post), [{'title': 'Old', 'content': 'Body', 'author_id': user.id,
+                                              'excerpt': excerpt}])
+        db.session.commit()
+
+        post = Post.query.first()
+        with query_counter() as statements:
+            post.title = 'New'
+            post.is_private = True
+            db.session.commit()
+        assert not [s for s in statements if s.startswith('SELECT') and 'post.content' in s]
+        assert Post.query.first().title == 'New'
@@ -0,0 +1,185 @@
+import re
+import sqlite3
+
+import pytest
+from sqlalchemy import event
+from app import db
+from app.migrations import MIGRATIONS, schema_version
+from app.models import Post
+from app.seed import seed, SEED_PASSWORD
+from app.timeline import check
+
+# Every SELECT a route runs must SEARCH an index: any SCAN or TEMP B-TREE
+# sort fails, except the newest-first walks in ORDER_WALKS. Those read an
+# index (or the public timeline, stored in key order) in ORDER BY order and
+# stop at the LIMIT, and (nearly) every row they visit is shown: both hold
+# only public posts, and a signed-in index skips just other people's
+# private posts.
+# /search is left out: FTS5 orders by bm25(), which always needs a sort.
+
+ORDER_WALKS = {
+    'SCAN post USING INDEX ix_post_public_timestamp_id',
+    'SCAN post USING INDEX ix_post_timestamp_id',
+    'SCAN public_timeline',
+}
+
+ANONYMOUS = [
+    '/',
+    '/?cursor={index}',
+    '/post/{post}',
+    '/post/{post}/comments?cursor={comments}',
+    '/feed.atom',
+    '/author/user1/feed.rss',
+    '/api/v1/posts',
+    '/api/v1/posts?author=user1&cursor={api}',
+    '/api/v1/posts/{post}',
+    '/api/v1/posts/{post}/comments',
+]
+
+SIGNED_IN = [
+    '/',
+    '/?cursor={index}',
+    '/my_posts',
+    '/others_posts',
+    '/post/{post}',
+    '/api/v1/posts',
+]
+
+
+@pytest.fixture
+def config_overrides():
+    """Use small pages so the seeded rows span several."""
+    return {'INDEX_PAGE_SIZE': 5, 'COMMENTS_PAGE_SIZE': 5, 'API_PAGE_SIZE': 5}
+
+
+@pytest.fixture
+def app(app):
+    """Seed the test app's database."""
+    seed(5, 60, 300)
+    return app
+
+
+def _cursors(client, post_id):
+    """Next-page cursors for the paginated URLs."""
+    def link(url):
+        return re.search(r'cursor=([^"&]+)', client.get(url).get_data(as_text=True)).group(1)
+    return {
+        'post': post_id,
+        'index': link('/'),
+        'comments': link(f'/post/{post_id}'),
+        'api': client.get('/api/v1/posts?author=user1').get_json()['next_cursor'],
+    }
+
+
+def _selects(client, url):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        response = client.get(url)
+        response.get_data()  # streamed bodies query while they are read
+        assert response.status_code == 200
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    return statements
+
+
+def _bad_steps(statement, parameters):
+    connection = db.session.connection().connection.driver_connection
+    plan = [row[3] for row in connection.execute(f'EXPLAIN QUERY PLAN {statement}', parameters)]
+    return [step for step in plan
+            if 'TEMP B-TREE' in step or (step.startswith('SCAN') and step not in ORDER_WALKS)]
+
+
+def _check(client, urls):
+    post_id = db.session.scalar(db.select(Post.id).where(Post.is_private == False)  # noqa: E712
+                                .order_by(Post.comment_count.desc()).limit(1))
+    values = _cursors(client, post_id)
+    for url in urls:
+        url = url.format(**values)
+        statements = _selects(client, url)
+        assert statements, url
+        for statement, parameters in statements:
+            assert not _bad_steps(statement, parameters), (url, statement, _bad_steps(statement, parameters))
+
+
+def test_anonymous_route_queries_use_indexes(app):
+    """Test that every query behind the public pages, feeds and API is index-only."""
+    _check(app.test_client(), ANONYMOUS)
+
+
+def test_signed_in_route_queries_use_indexes(app):
+    """Test that the signed-in listings (public OR own, own, others') are index-only."""
+    client = app.test_client()
+    client.post('/auth/login', data={'username': 'user1', 'password': SEED_PASSWORD})
+    _check(client, SIGNED_IN)
+
+
+def test_timeline_route_queries_use_indexes(app):
+    """Test that the listings read through the public timeline are index-only."""
+    app.config['PUBLIC_TIMELINE'] = True
+    _check(app.test_client(), ['/', '/?cursor={index}'])
+    client = app.test_client()
+    client.post('/auth/login', data={'username': 'user1', 'password': SEED_PASSWORD})
+    _check(client, ['/others_posts', '/others_posts?cursor={index}'])
+
+
+def test_public_listing_uses_partial_index(app):
+    """Test that the anonymous index walks only the public posts."""
+    q = db.select(Post.id).where(Post.is_private == False)  # noqa: E712
+    q = q.order_by(Post.timestamp.desc(), Post.id.desc()).limit(5)
+    compiled = q.compile(db.engine, compile_kwargs={'literal_binds': True})
+    plan = ' '.join(row[-1] for row in db.session.execute(db.text(f'EXPLAIN QUERY PLAN {compiled}')))
+    assert 'ix_post_public_timestamp_id' in plan, plan
+
+
+def test_create_all_stamps_schema_version(app):
+    """Test that a freshly created database needs no migrations."""
+    assert schema_version(db.session.connection()) == len(MIGRATIONS)
+
+
+def test_upgrade_db_migrates_old_database(make_app, tmp_path):
+    """Test that upgrade-db brings a database from the first release up to date."""
+    path = tmp_path / 'old.db'
+    old = sqlite3.connect(path)
+    old.executescript("""
+        CREATE TABLE user (id INTEGER PRIMARY KEY, username VARCHAR(64) NOT NULL UNIQUE,
+                           password_hash VARCHAR(128) NOT NULL);
+        CREATE INDEX ix_user_username ON user (username);
+        CREATE TABLE post (id INTEGER PRIMARY KEY, title VARCHAR(140) NOT NULL, content TEXT NOT NULL,
+                           timestamp DATETIME, author_id INTEGER NOT NULL REFERENCES user (id),
+                           is_private BOOLEAN NOT NULL);
+        CREATE INDEX ix_post_timestamp ON post (timestamp);
+        CREATE TABLE comment (id INTEGER PRIMARY KEY, content TEXT NOT NULL, timestamp DATETIME,
+                              post_id INTEGER NOT NULL REFERENCES post (id), author_id INTEGER REFERENCES user (id));
+        CREATE INDEX ix_comment_timestamp ON comment (timestamp);
+        INSERT INTO user VALUES (1, 'alice', 'x');
+        INSERT INTO post VALUES (1, 'Hello', 'Old **searchable** body', '2024-01-01 00:00:00', 1, 0);
+        INSERT INTO comment VALUES (1, 'First', '2024-01-02 00:00:00', 1, 1);
+        INSERT INTO comment VALUES (2, 'Second', '2024-01-03 00:00:00', 1, NULL);
+    """)
+    old.close()
+
+    app = make_app(SQLALCHEMY_DATABASE_URI=f'sqlite:///{path}')
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['upgrade-db'])
+    assert result.exit_code == 0, result.output
+    assert f'{len(MIGRATIONS)} migration(s) applied' in result.output
+    # a second run has nothing left to do
+    assert '0 migration(s) applied' in runner.invoke(args=['upgrade-db']).output
+
+    with app.app_context():
+        inspector = db.inspect(db.engine)
+        assert {'ix_post_public_timestamp_id', 'ix_post_author_timestamp_id'} <= \
+            {ix['name'] for ix in inspector.get_indexes('post')}
+        post = db.session.get(Post, 1)
+        assert post.comment_count == 2
+        assert post.author.post_count == 1
+        assert check(db.session.connection()) == {'missing': 0, 'stale': 0}
+        response = app.test_client().get('/search?q=searchable')
+        assert '/post/1' in response.get_data(as_text=True)
+        db.engine.dispose()
@@ -0,0 +1,118 @@
+import os
+import pytest
+from app import db
+from app.models import User, Post, Comment
+from app.markdown_utils import Renderer, get_renderer, markdown_to_html, markdown_to_html_many, render
+from app.render_cache import RenderCache, render_cache
+
+
+@pytest.fixture
+def app(app):
+    """Start each test with an empty render cache."""
+    render_cache.clear()
+    render_cache.reset_stats()
+    return app
+
+
+def test_second_render_is_a_hit(app):
+    """Test that rendering the same text twice only runs Markdown once."""
+    first = markdown_to_html('Some **unique** text for the hit test')
+    second = markdown_to_html('Some **unique** text for the hit test')
+    assert first == second
+    assert '<strong>unique</strong>' in first
+    stats = render_cache.stats()
+    assert stats['misses'] == 1
+    assert stats['hits'] == 1
+
+
+def test_disk_tier_survives_memory_eviction(app):
+    """Test that entries dropped from the LRU are still found on disk."""
+    markdown_to_html('persist me')
+    render_cache._lru.clear()
+    render_cache.reset_stats()
+    assert markdown_to_html('persist me') == markdown_to_html('persist me')
+    assert render_cache.stats()['disk_hits'] == 1
+
+
+def test_lru_is_bounded():
+    """Test that the in-process tier never grows past maxsize."""
+    cache = RenderCache()
+    cache.maxsize = 3
+    for i in range(10):
+        cache.get_or_render('html', f'text {i}', render)
+    assert len(cache._lru) == 3
+
+
+def test_fingerprint_is_part_of_the_key():
+    """Test that changing renderer settings changes every key."""
+    cache = RenderCache()
+    cache.fingerprint = 'a'
+    old = cache.key('html', 'same text')
+    cache.fingerprint = 'b'
+    assert cache.key('html', 'same text') != old
+
+
+def test_post_and_comment_writes_fill_the_cache(app):
+    """Test that committing a post or comment renders it into the cache."""
+    user = User(username='author')
+    user.set_password('password')
+    db.session.add(user)
+    db.session.commit()
+
+    post = Post(title='Cached *title*', content='Cached body', author_id=user.id)
+    db.session.add(post)
+    db.session.commit()
+    db.session.add(Comment(content='Cached comment', post_id=post.id, author_id=user.id))
+    db.session.commit()
+
+    render_cache.reset_stats()
+    markdown_to_html('Cached body')
+    markdown_to_html('Cached comment')
+    assert render_cache.stats()['misses'] == 0
+
+
+def test_clear_drops_disk_entries(app):
+    """Test that clear() removes every rendered file."""
+    markdown_to_html('to be cleared')
+    directory = app.config['RENDER_CACHE_DIR']
+    assert os.listdir(directory)
+    render_cache.clear()
+    assert not os.listdir(directory)
+    render_cache.reset_stats()
+    markdown_to_html('to be cleared')
+    assert render_cache.stats()['misses'] == 1
+
+
+def test_renderer_is_reused_and_reset():
+    """Test that a reused Renderer gives the same output as a fresh one."""
+    renderer = get_renderer()
+    assert get_renderer() is renderer
+    doc = '[^1] footnote-free text with a table\n\n| a |\n|---|\n| b |\n\n```python\nx = 1\n```'
+    first = renderer.html(doc)
+    renderer.html('# something else\n\n* a\n* b')
+    assert renderer.html(doc) == first == Renderer().html(doc)
+    assert '<script>' not in renderer.html('<script>alert(1)</script>')
+
+
+def test_batch_render_matches_single(app):
+    """Test that the batch API renders misses together and reuses hits."""
+    markdown_to_html('batch one')
+    render_cache.reset_stats()
+    html = markdown_to_html_many(['batch one', 'batch **two**', '', None])
+    assert html[0] == markdown_to_html('batch one')
+    assert '<strong>two</strong>' in html[1]
+    assert html[2] == html[3] == ''
+    assert render_cache.stats()['misses'] == 1
+
+
+def test_disk_tier_is_pruned_to_max_bytes(app):
+    """Test that the on-disk store drops its oldest files past RENDER_CACHE_MAX_BYTES."""
+    app.config['RENDER_CACHE_MAX_BYTES'] = 2048
+    render_cache._writes = 0
+    for i in range(RenderCache.PRUNE_EVERY):
+        markdown_to_html(f'disk entry {i} ' + 'x' * 100)
+    directory = app.config['RENDER_CACHE_DIR']
+    total = sum(os.path.getsize(os.path.join(root, name))
+                for root, _, names in os.walk(directory) for name in names)
+    assert total <= 2048
+    assert render_cache.stats()['evictions'] > 0
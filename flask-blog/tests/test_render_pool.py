@@ -0,0 +1,72 @@
+import pytest
+from app import db
+from app.models import User, Post, Comment
+from app.markdown_utils import markdown_to_html, render
+from app.render_cache import render_cache
+
+
+@pytest.fixture
+def config_overrides():
+    """Render new posts and comments on a thread pool."""
+    return {'RENDER_POOL': 'thread', 'RENDER_POOL_WORKERS': 2}
+
+
+@pytest.fixture
+def app(app):
+    """Start with an empty render cache; stop the pool afterwards."""
+    render_cache.clear()
+    render_cache.reset_stats()
+    yield app
+    app.extensions['render_pool'].shutdown()
+
+
+@pytest.fixture
+def author(app):
+    user = User(username='author')
+    user.set_password('password')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def test_writes_render_in_the_background(app, author):
+    """Test that a committed post and comment are rendered by the pool."""
+    # longer than an excerpt, so the excerpt render doesn't cache the body
+    body = '```python\nx = 1\n```\n\n' + 'word ' * 100
+    post = Post(title='Pooled *title*', content=body, author_id=author.id)
+    db.session.add(post)
+    db.session.commit()
+    db.session.add(Comment(content='Pooled comment', post_id=post.id, author_id=author.id))
+    db.session.commit()
+
+    pool = app.extensions['render_pool']
+    assert pool.wait(timeout=10)
+    assert pool.stats() == {'submitted': 3, 'completed': 3, 'failed': 0, 'pending': 0}
+
+    render_cache.reset_stats()
+    assert markdown_to_html(post.content) == render('html', post.content)
+    assert render_cache.stats()['misses'] == 0
+
+
+def test_cached_texts_are_not_resubmitted(app, author):
+    """Test that text already in the cache is not queued again."""
+    markdown_to_html('already rendered')
+    assert app.extensions['render_pool'].submit('html', ['already rendered']) is None
+
+
+def test_rerender_command(app, author):
+    """Test that the bulk re-render fills the cache across worker processes."""
+    for i in range(5):
+        db.session.add(Post(title=f'Bulk {i}', content=f'bulk **{i}**', author_id=author.id))
+    db.session.commit()
+    app.extensions['render_pool'].wait(timeout=10)
+    render_cache.clear()
+
+    result = app.test_cli_runner().invoke(args=['render-cache', 'rerender', '--workers', '2', '--batch-size', '2'])
+    assert result.exit_code == 0, result.output
+    assert 'Rendered 10 documents' in result.output
+    assert 'docs/s' in result.output
+
+    render_cache.reset_stats()
+    markdown_to_html('bulk **3**')
+    assert render_cache.stats()['misses'] == 0
@@ -0,0 +1,81 @@
+import pytest
+from app import db
+from app.models import User, Post, Comment
+from app.search import search, to_match_query
+
+
+@pytest.fixture
+def author(app):
+    user = User(username='author')
+    user.set_password('password')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def _post(author, title, content, is_private=False):
+    post = Post(title=title, content=content, author_id=author.id, is_private=is_private)
+    db.session.add(post)
+    db.session.commit()
+    return post
+
+
+def test_match_query_is_quoted():
+    """Test that user input can't inject FTS5 syntax."""
+    assert to_match_query('flask "OR" NEAR(') == '"flask" "OR" "NEAR"*'
+    assert to_match_query('  ') is None
+
+
+def test_search_ranks_title_matches_first(app, author):
+    """Test that bm25 ranks a title hit above a body mention."""
+    _post(author, 'Cooking pasta', 'A post that mentions sqlite once.')
+    best = _post(author, 'All about sqlite', 'sqlite sqlite and more sqlite')
+    posts, _ = search('sqlite')
+    assert [hit['post_id'] for hit in posts][0] == best.id
+    assert '<mark>sqlite</mark>' in posts[0]['title']
+
+
+def test_search_filters_private_posts(app, author):
+    """Test that private posts are only found by their author."""
+    _post(author, 'Secret plans', 'hidden treasure map', is_private=True)
+    assert search('treasure') == ([], [])
+    posts, _ = search('treasure', viewer_id=author.id)
+    assert len(posts) == 1
+
+
+def test_index_follows_updates_and_comments(app, author):
+    """Test that the triggers keep the index in sync with edits and comments."""
+    post = _post(author, 'Draft', 'original wording')
+    post.content = 'rewritten paragraph'
+    db.session.commit()
+    assert search('original') == ([], [])
+    assert len(search('rewritten')[0]) == 1
+
+    db.session.add(Comment(content='great <b>insight</b>', post_id=post.id, author_id=author.id))
+    db.session.commit()
+    _, comments = search('insight')
+    assert comments[0]['post_id'] == post.id
+    # snippets are escaped before the highlight markup goes in
+    assert '&lt;b&gt;<mark>insight</mark>&lt;/b&gt;' in comments[0]['snippet']
+
+
+def test_search_page(client, author):
+    """Test the /search endpoint."""
+    _post(author, 'Searchable title', 'body text')
+    response = client.get('/search?q=searchable')
+    assert response.status_code == 200
+    assert b'<mark>Searchable</mark>' in response.data
+
+
+def test_rebuild_command(app, author):
+    """Test that the rebuild command reindexes rows the triggers never saw."""
+    for trigger in ('post_fts_ai', 'post_fts_ad', 'post_fts_au'):
+        db.session.execute(db.text(f'DROP TRIGGER {trigger}'))
+    db.session.execute(db.text('DROP TABLE post_fts'))
+    db.session.commit()
+    db.session.execute(db.insert(Post), [{'title': 'Imported', 'content': 'bulk loaded row', 'author_id': author.id}])
+    db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['search', 'rebuild'])
+    assert 'rebuilt' in result.output
+    assert len(search('bulk')[0]) == 1
@@ -0,0 +1,36 @@
+import pytest
+from app import db
+from app.models import User, Post, Comment
+from app.seed import SEED_PASSWORD, seed
+
+
+def test_seed_inserts_consistent_rows(app):
+    """Test that seeded rows carry correct counters and rendered excerpts."""
+    assert seed(5, 20, 200) == {'users': 5, 'posts': 20, 'comments': 200}
+    assert (User.query.count(), Post.query.count(), Comment.query.count()) == (5, 20, 200)
+    assert Post.query.filter(Post.excerpt.is_(None)).count() == 0
+    assert any('```' in p.content for p in Post.query)
+
+    result = app.test_cli_runner().invoke(args=['repair-counts'])
+    assert 'Fixed counts on 0 posts and 0 users' in result.output
+
+    user = User.query.first()
+    assert user.check_password(SEED_PASSWORD)
+
+
+def test_seed_is_repeatable(app):
+    """Test that the same random seed produces the same content."""
+    seed(2, 5, 10, random_seed=7)
+    first = [p.content for p in Post.query.order_by(Post.id)]
+    db.drop_all()
+    db.create_all()
+    seed(2, 5, 10, random_seed=7)
+    assert [p.content for p in Post.query.order_by(Post.id)] == first
+
+
+def test_seed_command(app):
+    """Test that `flask seed` reports what it inserted."""
+    result = app.test_cli_runner().invoke(args=['seed', '--users', '3', '--posts', '10',
+                                                '--comments', '30', '--no-excerpts'])
+    assert 'Seeded 3 users, 10 posts and 30 comments' in result.output
+    assert Post.query.filter(Post.excerpt.is_(None)).count() == 10
@@ -0,0 +1,59 @@
+import os
+
+import pytest
+from flask import render_template_string
+from app import db
+from app.models import User, Post, Comment
+
+
+@pytest.fixture
+def post(app):
+    user = User(username='author')
+    user.set_password('password')
+    db.session.add(user)
+    db.session.commit()
+    post = Post(title='Cached', content='First version', author_id=user.id)
+    db.session.add(post)
+    db.session.commit()
+    return post
+
+
+def test_cache_tag(app):
+    """Test that a {% cache %} block renders once per key."""
+    calls = []
+    template = '{% cache ("k", n) %}{{ count() }}{% endcache %}'
+
+    def count():
+        calls.append(1)
+        return len(calls)
+
+    with app.test_request_context():
+        assert render_template_string(template, n=1, count=count) == '1'
+        assert render_template_string(template, n=1, count=count) == '1'
+        assert render_template_string(template, n=2, count=count) == '2'
+    assert app.extensions['fragment_cache'].stats()['hits'] == 1
+
+
+def test_articles_are_served_from_the_cache(app, post):
+    """Test that index articles hit the fragment cache until the post changes."""
+    client = app.test_client()
+    cache = app.extensions['fragment_cache']
+    assert b'First version' in client.get('/').data
+    cache.reset_stats()
+    assert b'First version' in client.get('/').data
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 0
+
+    post.content = 'Second version'
+    db.session.commit()
+    assert b'Second version' in client.get('/').data
+
+    db.session.add(Comment(content='A comment', post_id=post.id, author_id=post.author_id))
+    db.session.commit()
+    assert b'1 comment' in client.get('/').data
+    assert b'A comment' in client.get(f'/post/{post.id}').data
+
+
+def test_bytecode_cache_is_written(app, post):
+    """Test that compiled templates are stored for the next worker."""
+    app.test_client().get('/')
+    assert any(name.endswith('.cache') for name in os.listdir(app.config['JINJA_BYTECODE_CACHE_DIR']))
@@ -0,0 +1,89 @@
+import re
+from datetime import datetime, timedelta
+
+import pytest
+from app import db
+from app.models import User, Post, PublicTimeline
+from app.timeline import check
+
+
+@pytest.fixture
+def config_overrides():
+    """Read listings through the public timeline, in small pages."""
+    return {'PUBLIC_TIMELINE': True, 'INDEX_PAGE_SIZE': 3, 'OTHERS_POSTS_PAGE_SIZE': 3}
+
+
+@pytest.fixture
+def posts(app):
+    alice, bob = User(username='alice'), User(username='bob')
+    alice.set_password('password')
+    bob.set_password('password')
+    db.session.add_all([alice, bob])
+    db.session.commit()
+    start = datetime(2024, 1, 1)
+    posts = [Post(title=f'Post {i}', content=f'Body {i}', author_id=(alice if i % 2 else bob).id,
+                  is_private=i % 4 == 0, timestamp=start + timedelta(minutes=i)) for i in range(8)]
+    db.session.add_all(posts)
+    db.session.commit()
+    return posts
+
+
+def _timeline_ids():
+    return db.session.scalars(db.select(PublicTimeline.post_id).order_by(PublicTimeline.timestamp)).all()
+
+
+def _titles(client, url):
+    # post numbers on every page of a listing, following "Older posts"
+    numbers = []
+    while url:
+        html = client.get(url).get_data(as_text=True)
+        numbers += re.findall(r'^\s*Post (\d+)\s*$', html, re.M)
+        older = re.search(r'href="([^"]+)">Older posts', html)
+        url = older and older.group(1).replace('&amp;', '&')
+    return numbers
+
+
+def test_timeline_follows_post_writes(app, posts):
+    """Test that creating, hiding, showing and deleting posts keeps the timeline in step."""
+    public = [p.id for p in posts if not p.is_private]
+    assert _timeline_ids() == public
+
+    posts[1].is_private = True
+    posts[4].is_private = False
+    db.session.commit()
+    assert _timeline_ids() == sorted(set(public) - {posts[1].id} | {posts[4].id})
+
+    db.session.delete(posts[3])
+    db.session.commit()
+    assert posts[3].id not in _timeline_ids()
+    assert check(db.session.connection()) == {'missing': 0, 'stale': 0}
+
+
+def test_timeline_listings_match_live_queries(app, posts):
+    """Test that / and /others_posts list the same posts with the timeline on and off."""
+    client = app.test_client()
+    with_timeline = _titles(client, '/')
+    app.config['PUBLIC_TIMELINE'] = False
+    app.extensions['fragment_cache'].clear()
+    assert _titles(client, '/') == with_timeline == ['7', '6', '5', '3', '2', '1']
+
+    client.post('/auth/login', data={'username': 'alice', 'password': 'password'})
+    live = _titles(client, '/others_posts')
+    app.config['PUBLIC_TIMELINE'] = True
+    assert _titles(client, '/others_posts') == live == ['6', '2']
+
+
+def test_timeline_check_and_rebuild_commands(app, posts):
+    """Test that check reports drift from bulk updates and rebuild repairs it."""
+    db.session.execute(db.update(Post).where(Post.id == posts[1].id).values(is_private=True))
+    db.session.execute(db.delete(PublicTimeline).where(PublicTimeline.post_id == posts[2].id))
+    db.session.commit()
+
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['timeline', 'check'])
+    assert result.exit_code == 1
+    assert '1 public post(s) missing, 1 stale row(s).' in result.output
+
+    result = runner.invoke(args=['timeline', 'rebuild'])
+    assert 'rebuilt with 5 post(s)' in result.output
+    assert runner.invoke(args=['timeline', 'check']).exit_code == 0